@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+
+# System modules
+import time
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Dict, List, Any, Tuple
+
+# Third party modules
+import zmq
+
+# Relative imports
+from Hermes.Node import Node
+from Hermes.Message import Message
+from Hermes.BinaryStar import STANDBY
+from Hermes.DBP import commands
+from Hermes.Catalog import replica_key
+
+
+class RegistrationAgent(Node):
+    """
+    One connection to the catalog shared by every service running on a host. Registrations made within
+    batch_delay of each other go out as one bulk Registration, so a host coming back up with dozens of services
+    makes one round trip instead of one each. The agent then heartbeats for all of them in one message.
+
+    Every method may be called from any thread. Requests to the catalog are made one at a time. The services and
+    the pending batch are only touched under the agent's lock, and entries in services are replaced rather than
+    changed in place so snapshots of them can be sent without holding it.
+
+    Attributes
+    ----------
+    services : Dict[str, Dict[str, Any]]
+        The information of every service the catalog has approved, keyed by the name the catalog keeps it
+        under, for registering again after the catalog forgets them.
+    batch_delay : float, default=0.01
+        Seconds to wait for more registrations before sending a batch.
+    bus_timeout : int, default=5000
+        Milliseconds to wait on the catalog before looking for it again.
+    liveliness : int, default=1000
+        Milliseconds between heartbeats.
+    """
+
+    def __init__(self, name="Agent", log_level=logging.WARNING, batch_delay=0.01, bus_timeout=5000,
+                 liveliness=1000):
+        super().__init__(name=name, log_level=log_level)
+
+        self.services: Dict[str, Dict[str, Any]] = {}
+        self.batch_delay: float = batch_delay
+        self.bus_timeout: int = bus_timeout
+        self.liveliness: int = liveliness
+
+        # Registrations waiting for the next batch, and whether a thread is already gathering one. A service
+        # enrolled twice in one batch is sent once, with its latest information, and answers every caller.
+        self._pending: Dict[str, Tuple[Dict[str, Any], List[Future]]] = {}
+        self._gathering = False
+        self._lock = threading.Lock()
+
+        # Only one request may be waiting on the REQ socket at a time.
+        self._bus_lock = threading.Lock()
+
+        self._stopped = threading.Event()
+        self._beater: threading.Thread = None
+
+    def connect(self):
+        """
+        Finds the catalog by its beacon and opens the shared socket to it.
+        """
+        if "agent->bus" in self.sockets:
+            self.close_socket("agent->bus", linger=0)
+
+        rc = self.discover()
+        if rc is not None:
+            _, ip, port = rc
+            self.new_socket("agent->bus", zmq.REQ, addr=f'tcp://{ip}:{port}')
+
+    def bus_request(self, command: bytes, body: Any) -> Message:
+        """
+        Sends a request over the shared socket. If the catalog does not answer, or answers that it is standing by,
+        it is looked for again and asked once more.
+
+        Returns
+        -------
+        Message
+            The reply, or None if no catalog answered.
+        """
+        with self._bus_lock:
+            for attempt in range(2):
+                if "agent->bus" not in self.sockets:
+                    self.connect()
+                if "agent->bus" not in self.sockets:
+                    continue
+
+                msg = self.request("agent->bus", command, body, timeout=self.bus_timeout)
+                if msg is not None and not (msg.command == commands['Denied'] and msg.payload == STANDBY):
+                    return msg
+
+                self.logger.warning("Catalog did not answer. Looking for it again.")
+                if "agent->bus" in self.sockets:
+                    self.close_socket("agent->bus", linger=0)
+
+        return None
+
+    def enroll(self, info: Dict[str, Any], timeout: float = None) -> bool:
+        """
+        Registers a service along with any others enrolled around the same time.
+
+        Parameters
+        ----------
+        info : Dict[str, Any]
+            The service's registration, name included.
+        timeout : float, default=None
+            Seconds to wait for the catalog's answer.
+
+        Returns
+        -------
+        bool
+            Whether the catalog approved the service.
+        """
+        future = Future()
+
+        with self._lock:
+            key = replica_key(info['name'], info.get('instance'))
+            _, futures = self._pending.get(key, (None, []))
+            futures.append(future)
+            self._pending[key] = (info, futures)
+            gather = not self._gathering
+            self._gathering = True
+
+        # The first to enroll sends everything enrolled while it waited.
+        if gather:
+            time.sleep(self.batch_delay)
+            self.flush()
+
+        return future.result(timeout)
+
+    def flush(self) -> int:
+        """
+        Sends every pending registration in one bulk Registration.
+
+        Returns
+        -------
+        int
+            The number of registrations sent.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._gathering = False
+
+        if not pending:
+            return 0
+
+        records = [info for info, _ in pending.values()]
+        msg = self.bus_request(commands['Registration'], records)
+
+        if msg is None or msg.command != commands['Approved'] or not isinstance(msg.payload, list):
+            self.logger.error(f"Catalog did not take {len(records)} registrations.")
+            for _, futures in pending.values():
+                for future in futures:
+                    future.set_result(False)
+            return len(records)
+
+        results = list(zip(pending.items(), msg.payload))
+        with self._lock:
+            for (key, (info, _)), result in results:
+                if result['ok']:
+                    self.services[key] = info
+
+        for (key, (info, futures)), result in results:
+            if not result['ok']:
+                self.logger.error(f"Registration of {info['name']} denied: {result.get('error')}")
+            for future in futures:
+                future.set_result(result['ok'])
+
+        self.logger.info(f"Registered {len(records)} services in one request.")
+        return len(records)
+
+    def update_config(self, changes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Sends changes to any number of services' information in one bulk Update.
+
+        Parameters
+        ----------
+        changes : List[Dict[str, Any]]
+            Each service's changed fields along with its name.
+
+        Returns
+        -------
+        List[Dict[str, Any]]
+            The catalog's {'name', 'ok', 'error'} result for each change, in order. Empty if no catalog answered.
+        """
+        msg = self.bus_request(commands['Update'], changes)
+        if msg is None or msg.command != commands['Acknowledged'] or not isinstance(msg.payload, list):
+            return []
+
+        with self._lock:
+            for change, result in zip(changes, msg.payload):
+                info = self.services.get(change['name'])
+                if result['ok'] and info is not None:
+                    self.services[change['name']] = {**info, **{k: v for k, v in change.items() if k != 'name'}}
+
+        return msg.payload
+
+    def remove(self, name: str):
+        """
+        Stops heartbeating for a service. The catalog evicts it once its heartbeats run out.
+        """
+        with self._lock:
+            self.services.pop(name, None)
+
+    def heartbeat(self) -> List[str]:
+        """
+        Heartbeats for every registered service in one message and registers again any the catalog has
+        forgotten, such as after it failed over or evicted them while the host was unreachable.
+
+        Returns
+        -------
+        List[str]
+            The names the catalog did not know.
+        """
+        with self._lock:
+            names = list(self.services)
+        if not names:
+            return []
+
+        msg = self.bus_request(commands['Heartbeat'], names)
+        if msg is None or not isinstance(msg.payload, list):
+            return []
+
+        forgotten = msg.payload
+        if forgotten:
+            self.logger.warning(f"Catalog forgot {len(forgotten)} services. Registering them again.")
+            with self._lock:
+                records = [self.services[name] for name in forgotten if name in self.services]
+            self.bus_request(commands['Registration'], records)
+
+        return forgotten
+
+    def start(self):
+        """
+        Heartbeats every liveliness milliseconds on a background thread until stopped.
+        """
+        self._stopped.clear()
+        self._beater = threading.Thread(target=self._beat, name=f'{self.name}_heartbeats', daemon=True)
+        self._beater.start()
+
+    def _beat(self):
+        while not self._stopped.wait(self.liveliness / 1000):
+            try:
+                self.heartbeat()
+            except Exception:
+                self.logger.exception("Heartbeat failed.")
+
+    def stop(self):
+        self._stopped.set()
+        if self._beater is not None:
+            self._beater.join()
+            self._beater = None
+
+        self.close_ctx()
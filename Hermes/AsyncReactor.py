@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+
+# System modules
+import time
+import asyncio
+import logging
+import signal
+import threading
+from functools import partial
+from typing import Dict, Any, Callable, Set
+from uuid import uuid4
+
+# Third party modules
+import zmq
+import zmq.asyncio
+
+# Relative imports
+from Hermes.Reactor import Reactor
+from Hermes.Message import Message, AsyncMessage, Compression
+from Hermes.Cache import Recorder
+from Hermes.Timer import ScheduledTimer, FIXED_RATE, FIXED_DELAY
+from Hermes.DBP import commands
+
+SEND_ONLY = {zmq.PUB, zmq.PUSH}
+
+
+class AsyncReactor(Reactor):
+    """
+    A Reactor which runs on an asyncio event loop instead of a poller and a thread pool. Every socket gets its own
+    receiving task, `async def` handlers are run as tasks, and timers are scheduled on the loop. Plain functions
+    may still be registered as handlers but they are called on the loop itself, so they must not block.
+
+    Attributes
+    ----------
+    max_in_flight : int, default=None
+        The most coroutine handlers allowed to be running at once. Sockets stop being read from while the limit
+        is reached. Unlimited when None.
+    event_loop : asyncio.AbstractEventLoop
+        The loop the reactor is running on. Only set while running.
+    max_restarts : int
+        How many times a socket's receiving task is restarted after failing before the reactor gives up and stops.
+    """
+    context_class = zmq.asyncio.Context
+    message_class = AsyncMessage
+    max_restarts = 3
+
+    def __init__(self, socs: Dict[str, zmq.Socket], timers: Dict[str, Dict[str, Any]] = None, msg_handlers: Dict[bytes, Callable[..., Message]] = None, name=f'{uuid4().hex}_async_reactor', log_level=logging.WARN, zero_copy=False, pool_size=0, max_in_flight: int = None, compression: Compression = None):
+        self.event_loop: asyncio.AbstractEventLoop = None
+
+        self._stopped: asyncio.Event = None
+        self._in_flight: asyncio.Semaphore = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._workers: Set[asyncio.Future] = set()
+        self._restarts: Dict[str, int] = {}
+        self._display_incoming = False
+
+        super().__init__(socs, timers=timers, msg_handlers=msg_handlers, name=name, log_level=log_level,
+                         zero_copy=zero_copy, pool_size=pool_size, max_in_flight=max_in_flight,
+                         compression=compression)
+
+    def new_return_pipe(self):
+        # Handlers run on the loop thread so there is nothing to pipe back.
+        return None
+
+    def start(self, display_incoming=False):
+        """
+        Runs the reactor on a new event loop until it is stopped.
+        """
+        asyncio.run(self.run(display_incoming=display_incoming))
+
+    def call_soon(self, callback: Callable[[], Any]):
+        """
+        Runs a callback on the event loop. Called straight away when already on it or when it is not running, as
+        nothing else is using the sockets then.
+        """
+        if self.event_loop is None:
+            callback()
+            return
+
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+
+        if running is self.event_loop:
+            callback()
+        else:
+            self.event_loop.call_soon_threadsafe(callback)
+
+    async def run(self, display_incoming=False):
+        """
+        Runs the reactor on the current event loop until it is stopped. Use this instead of start when the
+        reactor is one of many things on a loop.
+        """
+        self.event_loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        self._restarts.clear()
+        self._display_incoming = display_incoming
+        self.continue_loop = True
+
+        if self.max_in_flight is not None:
+            self._in_flight = asyncio.Semaphore(self.max_in_flight)
+
+        # Used to catch Ctl-C and Ctl-Z signal interupts. Signals can only be caught on the main thread.
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                self.event_loop.add_signal_handler(signum, self._stopped.set)
+
+        if commands['Exit'] not in self.msg_handlers:
+            self.add_msg_handler(commands['Exit'], self.stop)
+
+        self.logger.info("Beginning Async Reactor...")
+
+        # Nothing ever arrives on send only sockets.
+        for soc_name, socket in self.sockets.items():
+            if socket.socket_type not in SEND_ONLY:
+                self._serve(soc_name)
+        for timer in self.timers:
+            self._schedule(timer)
+
+        try:
+            await self._stopped.wait()
+
+        finally:
+            self.continue_loop = False
+
+            workers = list(self._workers)
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            self._workers.clear()
+
+            # Handlers already running are given the chance to finish.
+            if self._tasks:
+                await asyncio.gather(*self._tasks, return_exceptions=True)
+
+            if threading.current_thread() is threading.main_thread():
+                for signum in (signal.SIGTERM, signal.SIGINT):
+                    self.event_loop.remove_signal_handler(signum)
+
+            self.close_ctx()
+            self.event_loop = None
+
+    def _serve(self, soc_name: str):
+        """
+        Starts the receiving task for a socket and watches it for failures.
+        """
+        worker = asyncio.ensure_future(self.serve(soc_name, self._display_incoming))
+        self._workers.add(worker)
+        worker.add_done_callback(partial(self._served, soc_name))
+
+    def _served(self, soc_name: str, worker: asyncio.Future):
+        """
+        Restarts a socket's receiving task if it died while the reactor is still running. Stops the reactor once
+        a socket has failed more than max_restarts times, as the socket is likely broken for good.
+        """
+        self._workers.discard(worker)
+        if worker.cancelled() or worker.exception() is None or not self.continue_loop:
+            return
+
+        self.logger.error(f"Receiving on {soc_name} failed.", exc_info=worker.exception())
+
+        restarts = self._restarts.get(soc_name, 0) + 1
+        self._restarts[soc_name] = restarts
+        if restarts > self.max_restarts:
+            self.logger.error(f"Gave up on {soc_name} after {self.max_restarts} restarts. Stopping.")
+            self.stop()
+            return
+
+        self._serve(soc_name)
+
+    def _schedule(self, timer: ScheduledTimer):
+        """
+        Starts the task which runs a timer.
+        """
+        worker = asyncio.ensure_future(self.tick(timer))
+        self._workers.add(worker)
+        worker.add_done_callback(self._workers.discard)
+
+    def add_timer(self, name: str, interval: float, closure: Callable, *args, mode=FIXED_RATE, executor=False,
+                  **kwargs) -> ScheduledTimer:
+        """
+        Adds a timer as Reactor.add_timer does. Timers added while the reactor is running are scheduled on its
+        loop straight away. Safe to call from any thread.
+        """
+        timer = super().add_timer(name, interval, closure, *args, mode=mode, executor=executor, **kwargs)
+        if self.event_loop is not None and self.continue_loop:
+            self.call_soon(partial(self._schedule, timer))
+        return timer
+
+    async def serve(self, soc_name: str, display_incoming=False):
+        """
+        Receives messages off of one socket for as long as the reactor runs and hands them to their handlers.
+        """
+        socket = self.sockets[soc_name]
+        pool = self.pools.get(soc_name)
+
+        while self.continue_loop:
+            if self._in_flight is not None:
+                await self._in_flight.acquire()
+
+            msg = pool.acquire() if pool is not None else self.message_class(
+                socket, self.logger, copy=not self.zero_copy, compression=self.compression)
+
+            try:
+                await msg.recv(display=display_incoming)
+            except BaseException:
+                self._done(None, pool, msg)
+                raise
+
+            handler = self.msg_handlers.get(msg.command)
+            metrics = self.metrics.command(msg.command)
+            metrics.received += 1
+
+            cache = self.caches.get(msg.command) if msg.valid else None
+            replies = None
+            if cache is not None:
+                key = cache.key(msg)
+                replies = cache.get(key)
+                if replies is None:
+                    msg.outlet = Recorder(partial(socket.send_multipart, copy=msg.copy),
+                                          msg.envelope_frames, cache.generation)
+
+            if not msg.valid:
+                # The sender has already been told by Message.load
+                metrics.rejected += 1
+                self._done(None, pool, msg)
+
+            elif handler is None:
+                metrics.rejected += 1
+                self.logger.debug(
+                    f"No message handler with command {msg.command}.")
+                msg.send(
+                    command=commands['Denied'],
+                    body="Error: Invalid command type. Please register command callback with the server.")
+                self._done(None, pool, msg)
+
+            elif replies is not None:
+                msg.replay(replies)
+                metrics.cached += 1
+                self._done(None, pool, msg)
+
+            elif asyncio.iscoroutinefunction(handler):
+                task = asyncio.ensure_future(self._handle_async(handler, msg, time.perf_counter_ns()))
+                self._tasks.add(task)
+                if cache is not None:
+                    task.add_done_callback(partial(self._remember, cache, key, msg.outlet))
+                task.add_done_callback(lambda task, pool=pool, msg=msg: self._done(task, pool, msg))
+
+            else:
+                try:
+                    self._handle(handler, msg, time.perf_counter_ns())
+                except Exception:
+                    self.logger.exception(f"Handler for {msg.command} failed.")
+                else:
+                    if cache is not None and msg.outlet.replies:
+                        cache.put(key, msg.outlet.replies, msg.outlet.generation)
+                finally:
+                    self._done(None, pool, msg)
+
+    async def _handle_async(self, handler: Callable[..., Message], msg: Message, queued: int):
+        """
+        Awaits a coroutine handler and times it. Queue wait is the time until the task first ran.
+        """
+        started = time.perf_counter_ns()
+        metrics = self.metrics.command(msg.command)
+        metrics.queue_wait.record(started - queued)
+
+        try:
+            return await handler(msg)
+
+        except Exception:
+            metrics.errors += 1
+            raise
+
+        finally:
+            metrics.latency.record(time.perf_counter_ns() - started)
+            metrics.handled += 1
+
+    def _done(self, task: asyncio.Task, pool, msg: Message):
+        """
+        Bookkeeping for a message that has been dealt with.
+        """
+        if task is not None:
+            self._tasks.discard(task)
+            if not task.cancelled() and task.exception() is not None:
+                self.logger.error(f"Handler for {msg.command} failed: {task.exception()!r}")
+
+        if self._in_flight is not None:
+            self._in_flight.release()
+
+        if pool is not None:
+            pool.release(msg)
+
+    async def tick(self, timer: ScheduledTimer):
+        """
+        Calls a timer's callback every interval seconds. Fixed rate deadlines are kept on a schedule so the
+        callbacks do not drift, and ticks missed while the loop was busy are skipped rather than run back to back.
+        Fixed delay timers wait a full interval after each run. Timers added with executor=True are run on the
+        loop's executor and, as ticks are awaited one at a time, never overlap.
+        """
+        interval = timer.interval
+        deadline = self.event_loop.time() + interval
+
+        while self.continue_loop and not timer.cancelled:
+            await asyncio.sleep(max(0, deadline - self.event_loop.time()))
+
+            try:
+                # Blocking timers are run on the loop's default executor so they do not hold up the sockets.
+                if timer.executor:
+                    result = await self.event_loop.run_in_executor(None, timer)
+                else:
+                    result = timer()
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception:
+                self.logger.exception("Timer callback failed.")
+
+            now = self.event_loop.time()
+            if timer.mode == FIXED_DELAY:
+                deadline = now + interval
+                continue
+
+            deadline += interval
+            if deadline < now:
+                deadline += (now - deadline) // interval * interval + interval
+
+    def stop(self, msg: Message = None):
+        """
+        Ends the reactor. Safe to call from any thread.
+        """
+        self.logger.warning(
+            "Received exit command, client will stop receiving messages")
+        if msg is not None:
+            msg.send(command=commands['Acknowledged'], body="Bye!")
+
+        self.continue_loop = False
+
+        if self.event_loop is None:
+            return
+
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+
+        if running is self.event_loop:
+            self._stopped.set()
+        else:
+            self.event_loop.call_soon_threadsafe(self._stopped.set)
+
+
+if __name__ == "__main__":
+    print("Shalom, World!")
+
+    async def respond(msg: Message):
+        await msg.send(command=commands['Acknowledged'], body='Sup.')
+
+    test = AsyncReactor(socs={'router': zmq.ROUTER})
+    test.add_msg_handler(command=b'<3', closure=respond)
+    test.start()
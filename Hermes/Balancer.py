@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+
+# System modules
+import time
+import random
+import threading
+from typing import Dict, List, Callable, Iterable
+
+################################################# RESOURCES ##########################################################
+# Power of two choices: https://www.eecs.harvard.edu/~michaelm/postscripts/mythesis.pdf
+# Peak EWMA load balancing: https://linkerd.io/2016/03/16/beyond-round-robin-load-balancing-for-latency/
+#######################################################################################################################
+
+
+class Endpoint():
+    """
+    What a Balancer knows about one replica.
+
+    Attributes
+    ----------
+    addr : str
+    in_flight : int
+        Requests sent to it which have not finished.
+    latency : float
+        A moving average of its response times in seconds. None until the first request finishes.
+    failures : int
+        Failed requests in a row.
+    ejections : int
+        Times it has been ejected in a row. Each ejection lasts twice as long as the last.
+    ejected_until : float
+        When it may be chosen again. Zero while it is healthy.
+    """
+    __slots__ = ('addr', 'in_flight', 'latency', 'failures', 'ejections', 'ejected_until')
+
+    def __init__(self, addr: str):
+        self.addr = addr
+        self.in_flight = 0
+        self.latency: float = None
+        self.failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+
+
+class Balancer():
+    """
+    Spreads requests over the replicas of a service with the power of two choices: two replicas are picked at
+    random and the request goes to the one with the lower cost, its average latency times one more than the
+    requests it already has in flight. That avoids both the herding of always picking the best replica and the
+    blind spots of round robin, while only ever looking at two replicas.
+
+    Replicas that fail eject_after times in a row are left out for eject_for seconds, doubling with every
+    ejection in a row, and are let back in to be tried again once the time is up. If every replica is ejected
+    they are all used anyway, as a failing replica is still better than none.
+
+    Every method may be called from any thread.
+
+    Attributes
+    ----------
+    endpoints : Dict[str, Endpoint]
+        Everything known about each replica, keyed by address.
+    decay : float, default=0.3
+        How much of each new latency goes into the average.
+    eject_after : int, default=3
+        Failures in a row before a replica is ejected.
+    eject_for : float, default=5.0
+        Seconds the first ejection lasts.
+    max_eject_for : float, default=60.0
+        The longest an ejection may last.
+    """
+
+    def __init__(self, decay=0.3, eject_after=3, eject_for=5.0, max_eject_for=60.0,
+                 clock: Callable[[], float] = time.monotonic, rng: random.Random = None):
+        self.endpoints: Dict[str, Endpoint] = {}
+        self.decay = decay
+        self.eject_after = eject_after
+        self.eject_for = eject_for
+        self.max_eject_for = max_eject_for
+        self.clock = clock
+        self.rng = rng if rng is not None else random.Random()
+
+        self._lock = threading.Lock()
+
+    def _endpoint(self, addr: str) -> Endpoint:
+        endpoint = self.endpoints.get(addr)
+        if endpoint is None:
+            endpoint = self.endpoints[addr] = Endpoint(addr)
+
+        return endpoint
+
+    def cost(self, endpoint: Endpoint) -> float:
+        """
+        What sending one more request to a replica is expected to cost. Replicas never measured cost nothing so
+        they are tried straight away.
+        """
+        if endpoint.latency is None:
+            return 0.0
+
+        return endpoint.latency * (endpoint.in_flight + 1)
+
+    def choose(self, addrs: Iterable[str]) -> str:
+        """
+        Picks the replica to send the next request to.
+
+        Parameters
+        ----------
+        addrs : Iterable[str]
+            The addresses of every replica of the service.
+
+        Returns
+        -------
+        str
+            The chosen address, or None when there are no replicas.
+        """
+        with self._lock:
+            now = self.clock()
+            endpoints = [self._endpoint(addr) for addr in addrs]
+            healthy = [endpoint for endpoint in endpoints if endpoint.ejected_until <= now]
+            candidates = healthy or endpoints
+
+            if not candidates:
+                return None
+            if len(candidates) == 1:
+                return candidates[0].addr
+
+            first, second = self.rng.sample(candidates, 2)
+            return (first if self.cost(first) <= self.cost(second) else second).addr
+
+    def begin(self, addr: str) -> float:
+        """
+        Counts a request as in flight to a replica.
+
+        Returns
+        -------
+        float
+            When it started, to hand to end.
+        """
+        with self._lock:
+            self._endpoint(addr).in_flight += 1
+            return self.clock()
+
+    def end(self, addr: str, started: float, ok=True):
+        """
+        Records how a request to a replica went.
+
+        Parameters
+        ----------
+        addr : str
+        started : float
+            What begin returned.
+        ok : bool, default=True
+            Whether the replica answered. Failed requests do not count towards its latency.
+        """
+        with self._lock:
+            endpoint = self._endpoint(addr)
+            endpoint.in_flight = max(0, endpoint.in_flight - 1)
+            now = self.clock()
+
+            if ok:
+                elapsed = now - started
+                if endpoint.latency is None:
+                    endpoint.latency = elapsed
+                else:
+                    endpoint.latency += self.decay * (elapsed - endpoint.latency)
+
+                endpoint.failures = 0
+                endpoint.ejections = 0
+                return
+
+            endpoint.failures += 1
+            if endpoint.failures >= self.eject_after:
+                duration = min(self.eject_for * 2 ** endpoint.ejections, self.max_eject_for)
+                endpoint.ejections += 1
+                endpoint.ejected_until = now + duration
+
+                # Let back in on probation. One more failure ejects it again.
+                endpoint.failures = self.eject_after - 1
+
+    def ejected(self) -> List[str]:
+        """
+        The addresses of the replicas which are currently left out.
+        """
+        with self._lock:
+            now = self.clock()
+            return [addr for addr, endpoint in self.endpoints.items() if endpoint.ejected_until > now]
+
+    def forget(self, addrs: Iterable[str] = None):
+        """
+        Drops what is known about some replicas, or all of them, such as once they leave the catalog.
+        """
+        with self._lock:
+            if addrs is None:
+                self.endpoints.clear()
+                return
+
+            for addr in addrs:
+                self.endpoints.pop(addr, None)
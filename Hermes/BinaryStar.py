@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+
+# System modules
+import time
+import logging
+import threading
+from typing import Dict, List, Any, Callable
+
+# Third party modules
+import zmq
+
+# Relative imports
+from Hermes.Message import Message
+from Hermes.DBP import commands
+
+################################################# RESOURCES ##########################################################
+# High availability pair, the Binary Star pattern: http://zguide.zeromq.org/page:all#High-Availability-Pair-Binary-Star-Pattern
+#######################################################################################################################
+
+# States. A node starts as the primary or the backup and settles into active or passive once it hears its peer.
+PRIMARY = 'primary'
+BACKUP = 'backup'
+ACTIVE = 'active'
+PASSIVE = 'passive'
+
+# Serving nodes answer requests. The others only keep up with their peer.
+SERVING = {PRIMARY, ACTIVE}
+
+# The event raised when a request arrives. Peer events are the peer's state.
+CLIENT_REQUEST = 'request'
+
+# The body of the Denied reply a standing by node answers requests with, so requesters know to look elsewhere.
+STANDBY = "Error: Standby catalog."
+
+
+class BinaryStar():
+    """
+    A primary/backup pair of nodes where only one serves at a time. Each node publishes its state to the other
+    every heartbeat. The primary serves once it has heard the backup is there, the backup stands by, and if the
+    active node goes quiet for two heartbeats the passive one takes over.
+
+    The zguide's Binary Star only fails over when a client asks the passive node for something, so a broken link
+    between two healthy nodes does not leave both serving. Hermes clients find the catalog by its beacon and a
+    passive node does not send one, so here the passive node also takes over once the active one has been quiet
+    for too long. If both end up active after a network split, whichever has seen fewer changes steps down when
+    they hear each other again.
+
+    Attributes
+    ----------
+    state : str
+        One of PRIMARY, BACKUP, ACTIVE, or PASSIVE.
+    primary : bool
+        Whether this node was started as the primary.
+    peer_state : str
+        The last state the peer published. None until it is heard from.
+    peer_info : Dict[str, Any]
+        Whatever else the peer published along with its state.
+    status : Callable[[], Dict[str, Any]]
+        Returns anything to publish along with this node's state. The 'version' entry, when there is one, is used
+        to decide who steps down if both nodes are active.
+    on_active : List[Callable[[], Any]]
+        Called whenever this node starts serving after standing by.
+    on_passive : List[Callable[[], Any]]
+        Called whenever this node stops serving or settles as the backup.
+    """
+
+    def __init__(self, primary: bool, bind: str, peer: str, heartbeat=1.0, ctx: zmq.Context = None, logger=None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.primary = primary
+        self.state = PRIMARY if primary else BACKUP
+        self.peer_state: str = None
+        self.peer_info: Dict[str, Any] = {}
+        self.peer_addr = peer
+        self.heartbeat = heartbeat
+        self.clock = clock
+
+        self.status: Callable[[], Dict[str, Any]] = dict
+        self.on_active: List[Callable[[], Any]] = []
+        self.on_passive: List[Callable[[], Any]] = []
+
+        # Give the peer two heartbeats to show up before deciding it is not there.
+        self.peer_expiry = clock() + 2 * heartbeat
+
+        if logger is not None:
+            self.logger: logging.Logger = logger
+        else:
+            self.logger: logging.Logger = logging.getLogger(__name__)
+
+        # Kept apart from any asyncio context so the sockets can be read without waiting.
+        self._own_ctx = ctx is None
+        self.ctx = ctx if ctx is not None else zmq.Context()
+
+        self.publisher: zmq.Socket = self.ctx.socket(zmq.PUB)
+        self.publisher.bind(bind)
+
+        self.subscriber: zmq.Socket = self.ctx.socket(zmq.SUB)
+        self.subscriber.setsockopt(zmq.SUBSCRIBE, b'')
+        self.subscriber.connect(peer)
+
+        # Requests are checked on handler threads while the loop thread reads the peer.
+        self._lock = threading.RLock()
+
+    @property
+    def serving(self) -> bool:
+        return self.state in SERVING
+
+    @property
+    def peer_host(self) -> str:
+        """
+        The host part of the peer's address.
+        """
+        return self.peer_addr.split('://', 1)[1].rsplit(':', 1)[0]
+
+    def tick(self):
+        """
+        Reads everything the peer has published, publishes this node's state, and takes over if the peer has
+        gone quiet. Meant to be run every heartbeat on the loop thread.
+        """
+        while True:
+            try:
+                frames = self.subscriber.recv_multipart(zmq.NOBLOCK)
+            except zmq.Again:
+                break
+
+            msg = Message(self.subscriber, self.logger)
+            msg.load(frames)
+
+            if msg.valid and msg.command == commands['Heartbeat'] and isinstance(msg.payload, dict):
+                info = dict(msg.payload)
+                state = info.pop('state', None)
+                with self._lock:
+                    self.peer_info = info
+                    self.peer_expiry = self.clock() + 2 * self.heartbeat
+                    self.event(state)
+
+        with self._lock:
+            if self.state == PASSIVE and self.clock() >= self.peer_expiry:
+                self.logger.warning(f"Peer has been quiet since {self.peer_expiry - 2 * self.heartbeat:.1f}.")
+                self._become(ACTIVE)
+
+        Message(self.publisher, self.logger).send(
+            command=commands['Heartbeat'], body={**self.status(), 'state': self.state})
+
+    def request(self) -> bool:
+        """
+        Whether a request that just arrived should be answered.
+        """
+        return self.event(CLIENT_REQUEST)
+
+    def event(self, event: str) -> bool:
+        """
+        Moves the state machine along.
+
+        Parameters
+        ----------
+        event : str
+            The peer's state or CLIENT_REQUEST.
+
+        Returns
+        -------
+        bool
+            False when a request arrives at a node which is standing by.
+        """
+        with self._lock:
+            if event != CLIENT_REQUEST:
+                self.peer_state = event
+
+            if self.state == PRIMARY:
+                if event == BACKUP:
+                    self.logger.info("Connected to the backup (passive), ready as active.")
+                    self._become(ACTIVE)
+                elif event == ACTIVE:
+                    self.logger.info("Connected to the backup (active), ready as passive.")
+                    self._become(PASSIVE)
+                return True
+
+            if self.state == BACKUP:
+                if event == ACTIVE:
+                    self.logger.info("Connected to the primary (active), ready as passive.")
+                    self._become(PASSIVE)
+                return event != CLIENT_REQUEST
+
+            if self.state == ACTIVE:
+                if event == ACTIVE and self._yields():
+                    self.logger.error("Both nodes are active. Standing down.")
+                    self._become(PASSIVE)
+                return True
+
+            # Passive
+            if event in (PRIMARY, BACKUP):
+                self.logger.info(f"Peer is restarting as the {event}, ready as active.")
+                self._become(ACTIVE)
+            elif event == PASSIVE and not self.primary:
+                # Neither is serving. The primary stays put and waits for the backup.
+                self.logger.error("Both nodes are passive. Taking over.")
+                self._become(ACTIVE)
+            elif event == CLIENT_REQUEST:
+                if self.clock() < self.peer_expiry:
+                    return False
+                self.logger.warning("Request arrived after the peer went quiet. Taking over.")
+                self._become(ACTIVE)
+
+            return event != CLIENT_REQUEST or self.serving
+
+    def _yields(self) -> bool:
+        """
+        Picks which of two active nodes steps down: the one behind, or the backup if neither is.
+        """
+        mine = self.status().get('version', 0)
+        theirs = self.peer_info.get('version', 0)
+        if mine != theirs:
+            return mine < theirs
+
+        return not self.primary
+
+    def _become(self, state: str):
+        was_serving = self.serving
+        self.state = state
+
+        if self.serving and not was_serving:
+            for callback in self.on_active:
+                callback()
+
+        elif not self.serving and (was_serving or state == PASSIVE):
+            for callback in self.on_passive:
+                callback()
+
+    def close(self):
+        self.publisher.close(linger=0)
+        self.subscriber.close(linger=0)
+
+        if self._own_ctx:
+            self.ctx.term()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+
+# System modules
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Any, Callable, Optional, Tuple
+
+# Relative imports
+from Hermes.Message import Message
+
+
+class ReplyCache():
+    """
+    A size bounded LRU of encoded replies for handlers whose answer depends only on the request, keyed by the
+    command and a digest of the request body. A Reactor answers hits itself on the loop thread and only hands
+    misses to the handler, recording what it sends for next time.
+
+    Anything that changes what the handler would say has to call clear or invalidate. Replies recorded by
+    handlers that were already running when the cache was cleared are thrown away.
+
+    Attributes
+    ----------
+    maxsize : int
+        The most requests to remember. The least recently used is forgotten first.
+    ttl : float
+        Seconds a reply is good for. None keeps replies until they are evicted or invalidated.
+    hits : int
+    misses : int
+    evictions : int
+    """
+
+    def __init__(self, maxsize=1024, ttl: float = 5.0, clock: Callable[[], float] = time.monotonic):
+        if maxsize < 1:
+            raise ValueError("Reply caches need room for at least one entry.")
+
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries: 'OrderedDict[bytes, Tuple[float, List[List[bytes]]]]' = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def key(msg: Message) -> bytes:
+        """
+        The cache key for a request: a digest of its command, codec, and body frames.
+        """
+        digest = hashlib.blake2b(msg.command, digest_size=16)
+        digest.update(msg.codec)
+        for frame in msg.body:
+            digest.update(frame)
+
+        return digest.digest()
+
+    @property
+    def generation(self) -> int:
+        """
+        Changes every time the cache is cleared or invalidated. Passed back to put so replies worked out before
+        the change are not stored after it.
+        """
+        return self._generation
+
+    def get(self, key: bytes) -> Optional[List[List[bytes]]]:
+        """
+        The replies recorded for a request, or None if there are none or they have expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None and (entry[0] is None or entry[0] > self.clock()):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+            if entry is not None:
+                del self._entries[key]
+
+            self.misses += 1
+            return None
+
+    def put(self, key: bytes, replies: List[List[bytes]], generation: int = None):
+        """
+        Remembers the replies sent for a request.
+
+        Parameters
+        ----------
+        key : bytes
+            From ReplyCache.key.
+        replies : List[List[bytes]]
+            The header and body frames of each reply, without their envelopes.
+        generation : int, default=current
+            The generation when the handler started. Nothing is stored if the cache has been cleared since.
+        """
+        expires = self.clock() + self.ttl if self.ttl is not None else None
+
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+
+            self._entries[key] = (expires, replies)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: bytes):
+        """
+        Forgets the replies to one request.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+            self._generation += 1
+
+    def clear(self):
+        """
+        Forgets everything.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
+
+
+class Recorder():
+    """
+    An outlet which keeps a copy of every reply a handler sends before passing it on, so it can be cached.
+
+    Attributes
+    ----------
+    replies : List[List[bytes]]
+        The header and body frames of each reply sent so far.
+    """
+    __slots__ = ('outlet', 'envelope', 'generation', 'replies')
+
+    def __init__(self, outlet: Callable[[List[bytes]], Any], envelope: int, generation: int):
+        self.outlet = outlet
+        self.envelope = envelope
+        self.generation = generation
+        self.replies: List[List[bytes]] = []
+
+    def __call__(self, frames: List[bytes]):
+        self.replies.append(frames[self.envelope:])
+        return self.outlet(frames)
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+
+# System modules
+import struct
+import threading
+from typing import Dict, List, Any, Callable, Tuple, Set, Iterable
+
+# Relative imports
+from Hermes.Message import Encoded, Compression, encode, DEFAULT_CODEC
+
+# Info replies carry the catalog version they were built at in a frame after the body.
+VERSION = struct.Struct('!Q')
+
+
+def _keys(value: Any) -> Set[Any]:
+    # Fields may hold one value, a list of them, or a dict keyed by them.
+    if value is None:
+        return set()
+    if isinstance(value, (list, tuple, set, dict)):
+        return {key for key in value if isinstance(key, (str, int, float, bool))}
+    if isinstance(value, (str, int, float, bool)):
+        return {value}
+
+    return set()
+
+
+def _hosts(info: Dict[str, Any]) -> Set[Any]:
+    interfaces = info.get('interfaces')
+    hosts = _keys(info.get('host'))
+    if isinstance(interfaces, dict):
+        hosts |= {iface['ip'] for iface in interfaces.values() if isinstance(iface, dict) and 'ip' in iface}
+
+    return hosts
+
+
+# The fields services are indexed by, and how to pull the keys for each out of a service's information. Every
+# other field can still be queried, it is just checked one service at a time.
+INDEXES: Dict[str, Callable[[Dict[str, Any]], Set[Any]]] = {
+    'topic': lambda info: _keys(info.get('topics')),
+    'interface': lambda info: _keys(info.get('interfaces')),
+    'host': _hosts,
+    'tag': lambda info: _keys(info.get('tags')),
+    'service': lambda info: _keys(info.get('service')),
+}
+
+
+def replica_key(name: str, instance: Any = None) -> str:
+    """
+    The name a service is kept under in the catalog. Each instance of a scaled out service is kept as its own
+    entry, name@instance, with the shared name in its 'service' field.
+    """
+    if instance is None:
+        return name
+
+    return f'{name}@{instance}'
+
+
+def matches(info: Dict[str, Any], where: Dict[str, Any]) -> bool:
+    """
+    Whether a service's information satisfies every predicate of a query, without using any index.
+
+    Parameters
+    ----------
+    info : Dict[str, Any]
+        The service's information.
+    where : Dict[str, Any]
+        Field to wanted value. A list of values matches any of them. Indexed fields (see INDEXES) match when the
+        service has any of the wanted keys, others when the field equals a wanted value.
+    """
+    for field, wanted in where.items():
+        wanted = wanted if isinstance(wanted, list) else [wanted]
+
+        if field in INDEXES:
+            if INDEXES[field](info).isdisjoint(_keys(wanted)):
+                return False
+        elif not any(info.get(field) == value for value in wanted):
+            return False
+
+    return True
+
+
+def project(info: Dict[str, Any], fields: Iterable[str] = None) -> Dict[str, Any]:
+    """
+    A copy of a service's information with only the given fields, or all of them when none are given.
+    """
+    if fields is None:
+        return dict(info)
+
+    return {field: info[field] for field in fields if field in info}
+
+
+class Catalog():
+    """
+    The registry of services handed out by the core catalog. Lookups are answered with bodies that were encoded
+    once, the first time they were asked for after a change, so reading the catalog costs the same no matter how
+    many services are in it.
+
+    Every change bumps the catalog's version. Each entry remembers the version it last changed at so clients can
+    ask for something only if it is newer than what they already have.
+
+    Attributes
+    ----------
+    services : Dict[str, Dict[str, Any]]
+        The registered services' information keyed by name. Change it through register, update, and remove.
+    version : int
+        Goes up by one with every change. Zero for an empty catalog that has never changed.
+    listeners : List[Callable[[str, Dict[str, Any], int], Any]]
+        Called with the name, the new information (None once removed), and the version of every change. They
+        are called in version order while the catalog is locked, so they must not block or change the catalog.
+    indexes : Dict[str, Dict[Any, Set[str]]]
+        For every field in INDEXES, the names of the services holding each key, such as
+        indexes['topic']['weather']. Kept up to date with every change. For reading only.
+    compression : Compression, default=None
+        How the encoded lookups are compressed. Never when None.
+    """
+
+    def __init__(self, codec: bytes = DEFAULT_CODEC, compression: Compression = None):
+        self.codec = codec
+        self.compression = compression
+        self.services: Dict[str, Dict[str, Any]] = {}
+        self.version = 0
+        self.listeners: List[Callable[[str, Dict[str, Any], int], Any]] = []
+        self.indexes: Dict[str, Dict[Any, Set[str]]] = {field: {} for field in INDEXES}
+
+        # The keys each service is filed under, to unfile it when it changes.
+        self._indexed: Dict[str, Dict[str, Set[Any]]] = {}
+        self._modified: Dict[str, int] = {}
+        self._entries: Dict[str, Encoded] = {}
+        self._snapshot: Encoded = None
+        self._lock = threading.Lock()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.services
+
+    def __len__(self) -> int:
+        return len(self.services)
+
+    def register(self, name: str, info: Dict[str, Any]) -> int:
+        """
+        Adds a service, replacing anything already registered under its name.
+
+        Returns
+        -------
+        int
+            The new catalog version.
+        """
+        with self._lock:
+            self.services[name] = info
+            return self._changed(name)
+
+    def update(self, name: str, changes: Dict[str, Any]) -> int:
+        """
+        Changes some of a registered service's information.
+
+        Returns
+        -------
+        int
+            The new catalog version.
+
+        Raises
+        ------
+        KeyError
+            When no service is registered under the name.
+        """
+        with self._lock:
+            self.services[name].update(changes)
+            return self._changed(name)
+
+    def remove(self, name: str) -> int:
+        """
+        Drops a service.
+
+        Returns
+        -------
+        int
+            The new catalog version.
+
+        Raises
+        ------
+        KeyError
+            When no service is registered under the name.
+        """
+        with self._lock:
+            del self.services[name]
+            version = self._changed(name)
+            del self._modified[name]
+            return version
+
+    def restore(self, services: Dict[str, Dict[str, Any]], version: int):
+        """
+        Replaces everything with a copy of another catalog at the given version, such as a replica of the one
+        this catalog is taking over from. Listeners are not called.
+        """
+        with self._lock:
+            self.services.clear()
+            self.services.update({name: dict(info) for name, info in services.items()})
+            self.version = version
+
+            # When each entry last changed is not replicated. Anything older than the copy is just as good.
+            self._modified = {name: version for name in services}
+            self._entries.clear()
+            self._snapshot = None
+
+            for index in self.indexes.values():
+                index.clear()
+            self._indexed.clear()
+            for name in self.services:
+                self._reindex(name)
+
+    def copy(self) -> Tuple[int, Dict[str, Dict[str, Any]]]:
+        """
+        The catalog's version and a copy of its services, taken together.
+        """
+        with self._lock:
+            return self.version, {name: dict(info) for name, info in self.services.items()}
+
+    def _changed(self, name: str) -> int:
+        self.version += 1
+        self._modified[name] = self.version
+        self._entries.pop(name, None)
+        self._snapshot = None
+        self._reindex(name)
+
+        for listener in self.listeners:
+            listener(name, self.services.get(name), self.version)
+
+        return self.version
+
+    def _reindex(self, name: str):
+        info = self.services.get(name)
+        old = self._indexed.pop(name, {})
+        new = {field: keys(info) for field, keys in INDEXES.items()} if info is not None else {}
+
+        for field, index in self.indexes.items():
+            before, after = old.get(field, set()), new.get(field, set())
+            for key in before - after:
+                index[key].discard(name)
+                if not index[key]:
+                    del index[key]
+            for key in after - before:
+                index.setdefault(key, set()).add(name)
+
+        if info is not None:
+            self._indexed[name] = new
+
+    def modified(self, name: str = '') -> int:
+        """
+        The version a service last changed at, or the catalog's version when no name is given.
+
+        Raises
+        ------
+        KeyError
+            When no service is registered under the name.
+        """
+        if name == '':
+            return self.version
+
+        return self._modified[name]
+
+    def lookup(self, name: str = '') -> Tuple[int, Encoded]:
+        """
+        The encoded reply body for one service, as {name: info}, or for the whole catalog when no name is given.
+        The version is put in a frame after the body.
+
+        Returns
+        -------
+        Tuple[int, Encoded]
+            The version the body was built at and the body itself.
+
+        Raises
+        ------
+        KeyError
+            When no service is registered under the name.
+        """
+        with self._lock:
+            if name == '':
+                if self._snapshot is None:
+                    self._snapshot = self._encode(self.services, self.version)
+                return self.version, self._snapshot
+
+            encoded = self._entries.get(name)
+            if encoded is None:
+                encoded = self._entries[name] = self._encode({name: self.services[name]}, self._modified[name])
+            return self._modified[name], encoded
+
+    def _encode(self, body: Any, version: int) -> Encoded:
+        encoded = encode(body, self.codec, self.compression)
+        encoded.frames.append(VERSION.pack(version))
+
+        return encoded
+
+    def match(self, where: Dict[str, Any]) -> Set[str]:
+        """
+        The names of every service satisfying a query. Indexed fields narrow the search down first so only those
+        candidates are checked against the rest.
+
+        Parameters
+        ----------
+        where : Dict[str, Any]
+            The predicates, as for matches. Empty matches everything.
+        """
+        with self._lock:
+            return self._match(where)
+
+    def _match(self, where: Dict[str, Any]) -> Set[str]:
+        candidates: Set[str] = None
+        rest = {}
+
+        for field, wanted in where.items():
+            if field not in INDEXES:
+                rest[field] = wanted
+                continue
+
+            index = self.indexes[field]
+            wanted = _keys(wanted if isinstance(wanted, list) else [wanted])
+            found = set().union(*(index.get(key, ()) for key in wanted))
+            candidates = found if candidates is None else candidates & found
+
+        if candidates is None:
+            candidates = set(self.services)
+
+        if rest:
+            candidates = {name for name in candidates if matches(self.services[name], rest)}
+
+        return candidates
+
+    def query(self, where: Dict[str, Any] = None, fields: List[str] = None) -> Tuple[int, Encoded]:
+        """
+        The encoded reply body for every service satisfying a query, as {name: info}, with only the given fields
+        of each. The catalog version is put in a frame after the body. Query replies are not kept, since there
+        is no telling which queries will come again.
+
+        Parameters
+        ----------
+        where : Dict[str, Any], default=None
+            The predicates, as for matches. None matches everything.
+        fields : List[str], default=None
+            The fields to send back for each service. None sends everything.
+
+        Returns
+        -------
+        Tuple[int, Encoded]
+            The catalog version and the body.
+        """
+        with self._lock:
+            names = self._match(where or {})
+            body = {name: project(self.services[name], fields) for name in names}
+            return self.version, self._encode(body, self.version)
@@ -2,42 +2,138 @@
 
 
 # System modules
+import time
 import logging
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Iterator, Iterable, Set, Tuple, Optional
+from concurrent.futures import Future
 from pprint import pprint
-import json
 
 # Third party modules
 import zmq
-from zmq.sugar.context import T
 
 # Relative imports
 from Hermes.Node import Node
 from Hermes.Message import Message
 from Hermes.DBP import commands
+from Hermes.Transfer import fetch_chunks, TransferError, CHUNK_SIZE, CREDIT
+from Hermes.Catalog import VERSION, matches, project
+from Hermes.Clone import Replica, read_snapshot
+from Hermes.BinaryStar import STANDBY
+from Hermes.Pool import ConnectionPool
+from Hermes.Pipeline import Pipeline
+from Hermes.Balancer import Balancer
 
 
 class Client(Node):
     """
     A LIAMb node extension to provide a client interface with the bus.
+
+    Attributes
+    ----------
+    resolve_ttl : float, default=30.0
+        Seconds a service's looked up information is reused for before asking the catalog again.
+    negative_ttl : float, default=5.0
+        Seconds to remember that a service is not registered.
+    resolutions : Dict[str, Tuple[float, Dict[str, Any]]]
+        When each looked up service's entry expires and its information, None for unknown services.
+    bus_timeout : int, default=5000
+        Milliseconds to wait for the catalog to answer before looking for it again. A catalog which has failed
+        over to its backup is found again by its beacon.
+    pool : ConnectionPool
+        The sockets to services, kept open between requests. pool_size bounds how many are open at once and
+        pool_idle is how many seconds one may go unused before it is closed.
+    pipeline : Pipeline
+        Carries requests made with request_async. Made the first time one is.
+    instance_sets : Dict[str, Tuple[float, Dict[str, Dict[str, Any]]]]
+        When each looked up service's set of instances expires and the instances, as for resolutions.
+    balancer : Balancer
+        Picks which instance of a scaled out service each request goes to, from the latencies and failures the
+        client has seen.
+    balanced : Dict[str, Set[str]]
+        The instance addresses each service was last looked up with. Addresses missing from a newer lookup are
+        dropped from the balancer.
     """
 
-    def __init__(self, name="Gondor", log_level=logging.WARNING):
+    def __init__(self, name="Gondor", log_level=logging.WARNING, resolve_ttl=30.0, negative_ttl=5.0,
+                 bus_timeout=5000, pool_size=16, pool_idle=60.0):
         super().__init__(name=name, log_level=log_level)
 
+        self.bus_timeout: int = bus_timeout
+
+        self.resolve_ttl: float = resolve_ttl
+        self.negative_ttl: float = negative_ttl
+        self.resolutions: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+
+        # One socket per service, reused until it goes quiet or is pushed out by others
+        self.pool = ConnectionPool(self, zmq.REQ, max_size=pool_size, idle=pool_idle, prefix='client->service')
+        self.pipeline: Pipeline = None
+
+        self.instance_sets: Dict[str, Tuple[float, Dict[str, Dict[str, Any]]]] = {}
+        self.balancer = Balancer()
+        self.balanced: Dict[str, Set[str]] = {}
+
         # A flag variable to determine if the client has made a connection with the broker
         self.connected = False
 
+        # The catalog version the last lookup was answered at
+        self.catalog_version: int = None
+
+        # A local copy of the catalog kept up to date by its feed. Only made by replicate, and remade after
+        # the client finds the catalog again.
+        self.replica: Replica = None
+        self.replicating = False
+        self.bus_ip: str = None
+
+        self.connect_to_bus()
+
+    def connect_to_bus(self):
+        """
+        Finds the catalog by its beacon and opens a socket to it, closing any socket to where it used to be.
+        """
+        if 'client->bus' in self.sockets:
+            self.close_socket('client->bus', linger=0)
+        self.connected = False
+
         # open a socket to the broker
         self.logger.info("Attempting to connect to the bus...")
         rc = self.discover()
 
         if rc is not None:
             header, ip, port = rc
+            self.bus_ip = ip
             self.new_socket('client->bus', zmq.REQ, addr=f'tcp://{ip}:{port}')
             self.connected = True
 
-    def get_services(self, name='') -> Dict[str, Dict[str, Any]]:
+        # The feed moves with the catalog.
+        if self.replica is not None:
+            self.close_socket('client<-catalog', linger=0)
+            self.replica = None
+
+    def bus_request(self, command: bytes, body: Any = '') -> Optional[Message]:
+        """
+        Sends a request to the catalog. If it does not answer, or answers that it is standing by, the catalog is
+        looked for again and asked once more.
+
+        Returns
+        -------
+        Message
+            The reply, or None if no catalog answered.
+        """
+        for attempt in range(2):
+            if not self.connected:
+                self.logger.warning("No established connection with CCS.")
+                return None
+
+            msg = self.request('client->bus', command, body, timeout=self.bus_timeout)
+            if msg is not None and not (msg.command == commands['Denied'] and msg.payload == STANDBY):
+                return msg
+
+            self.logger.warning("Catalog did not answer. Looking for it again.")
+            self.connect_to_bus()
+
+        return None
+
+    def get_services(self, name='', since: int = None) -> Dict[str, Dict[str, Any]]:
         """
         Get a list or entry of registered service(s) information.
 
@@ -46,68 +142,480 @@ class Client(Node):
         name : str, default=None
             A name of a desired service to get information about. If left blank then all services
             will be returned
+        since : int, default=None
+            A catalog version, usually the last catalog_version seen. When given, nothing is sent back unless
+            what was asked for has changed since then.
+
+        Returns
+        -------
+        Dict[str, Dict[str, Any]]
+            The information asked for, or None if there is no such service or nothing has changed.
         """
-        if self.connected:
-            msg = Message(socket=self.sockets["client->bus"])
-            msg.send(command=commands['Info_Req'], body=name)
-            msg.recv()
+        # Replicas answer from memory. Asking what changed since a version still goes to the catalog.
+        if self.replicating and self.replica is None and self.connected:
+            self.replicate()
+
+        if self.replica is not None and since is None:
+            try:
+                self.replica.update()
+            except TimeoutError:
+                self.connect_to_bus()
+            else:
+                self.catalog_version = self.replica.version
 
-            info = json.loads(msg.body[0].decode('utf-8'))
+                if name == '':
+                    return dict(self.replica.services)
+                else:
+                    return self.replica.services.get(name)
 
-            if 'Error' in info.keys():
+        if self.connected:
+            info = self._info_request(name, since)
+            if info is None:
                 return None
 
             if name == '':
                 return info
             else:
-                return info[name]
+                # Services with several instances are answered with all of them, see instances.
+                return info.get(name)
 
         else:
             self.logger.warning("No established connection with CCS.")
 
-    def connect_to_service(self, addr):
+    def _info_request(self, name='', since: int = None) -> Optional[Dict[str, Dict[str, Any]]]:
+        """
+        Asks the catalog about a service, or every service, and hands back the whole reply. None if there is
+        no such service, nothing has changed, or no catalog answered.
+        """
+        request = name if since is None else {'name': name, 'since': since}
+
+        msg = self.bus_request(commands['Info_Req'], request)
+        if msg is None:
+            return None
+
+        if msg.command == commands['Unchanged']:
+            return None
+
+        info = msg.payload
+
+        if 'Error' in info.keys():
+            return None
+
+        # Older catalogs do not send their version
+        if len(msg.body) > 1:
+            self.catalog_version = VERSION.unpack(msg.body[1])[0]
+
+        return info
+
+    def find_services(self, where: Dict[str, Any] = None, fields: List[str] = None,
+                      since: int = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Gets only the services matching a query, with only the fields asked for, instead of the whole catalog.
+
+        Parameters
+        ----------
+        where : Dict[str, Any], default=None
+            Field to wanted value, e.g. {'topic': 'weather', 'host': '10.0.0.2'}. A list of values matches any of
+            them. 'topic', 'interface', 'host', and 'tag' are looked up by index, other fields are compared
+            with the services' information.
+        fields : List[str], default=None
+            The fields to get back for each service. None gets everything.
+        since : int, default=None
+            A catalog version. When given, nothing is sent back unless the catalog has changed since then.
+
+        Returns
+        -------
+        Dict[str, Dict[str, Any]]
+            The matching services' information, or None if nothing has changed or no catalog answered.
+        """
+        where = where or {}
+
+        # Replicas already hold everything, so they filter it themselves.
+        if self.replicating and self.replica is None and self.connected:
+            self.replicate()
+
+        if self.replica is not None and since is None:
+            try:
+                self.replica.update()
+            except TimeoutError:
+                self.connect_to_bus()
+            else:
+                self.catalog_version = self.replica.version
+                return {name: project(info, fields)
+                        for name, info in self.replica.services.items() if matches(info, where)}
+
+        request = {'where': where, 'fields': fields}
+        if since is not None:
+            request['since'] = since
+
+        msg = self.bus_request(commands['Info_Req'], request)
+        if msg is None or msg.command == commands['Unchanged']:
+            return None
+
+        if 'Error' in msg.payload:
+            self.logger.error(msg.payload['Error'])
+            return None
+
+        if len(msg.body) > 1:
+            self.catalog_version = VERSION.unpack(msg.body[1])[0]
+
+        return msg.payload
+
+    def snapshot(self) -> Optional[Tuple[int, Dict[str, Dict[str, Any]], int]]:
+        """
+        Gets the whole catalog along with the version it is at and the port its change feed is published on.
+        None if no catalog answered.
+        """
+        msg = self.bus_request(commands['Snapshot'])
+        if msg is None:
+            return None
+
+        return read_snapshot(msg)
+
+    def _replica_snapshot(self) -> Tuple[int, Dict[str, Dict[str, Any]]]:
+        snapshot = self.snapshot()
+        if snapshot is None:
+            raise TimeoutError("No catalog answered the snapshot request.")
+
+        return snapshot[:2]
+
+    def replicate(self):
+        """
+        Subscribes to the catalog's change feed and keeps a copy of the catalog locally, so get_services
+        answers without a round trip to the catalog.
+        """
+        self.replicating = True
+
+        # The first snapshot is only for the feed's port. The replica syncs once it is subscribed.
+        snapshot = self.snapshot()
+        if snapshot is None:
+            return
+
+        self.new_socket('client<-catalog', zmq.SUB, addr=f'tcp://{self.bus_ip}:{snapshot[2]}')
+        self.sockets['client<-catalog'].setsockopt(zmq.SUBSCRIBE, b'')
+
+        self.replica = Replica(self.sockets['client<-catalog'], self._replica_snapshot, self.logger)
+
+    def resolve(self, name: str, refresh=False) -> Optional[Dict[str, Any]]:
+        """
+        A service's registered information, looked up at most once per resolve_ttl. Unknown services are
+        remembered for negative_ttl so asking for them again does not go to the catalog either. Replicas are
+        already local so they are read directly.
+
+        Parameters
+        ----------
+        name : str
+            The name of the service.
+        refresh : bool, default=False
+            Ignores anything remembered and asks the catalog.
+
+        Returns
+        -------
+        Dict[str, Any]
+            The service's information, or None if it is not registered.
+        """
+        if self.replica is not None:
+            return self.get_services(name=name)
+
+        now = time.monotonic()
+        if not refresh:
+            entry = self.resolutions.get(name)
+            if entry is not None and entry[0] > now:
+                return entry[1]
+
+        info = self.get_services(name=name)
+
+        # Without a catalog there is no telling whether the service exists.
+        if self.connected:
+            ttl = self.resolve_ttl if info is not None else self.negative_ttl
+            self.resolutions[name] = (now + ttl, info)
+
+        return info
+
+    def instances(self, name: str, refresh=False) -> Dict[str, Dict[str, Any]]:
+        """
+        Every registered instance of a service, remembered the same way as resolve. A service which has not
+        been scaled out is its own only instance.
+
+        Parameters
+        ----------
+        name : str
+            The name of the service.
+        refresh : bool, default=False
+            Ignores anything remembered and asks the catalog.
+
+        Returns
+        -------
+        Dict[str, Dict[str, Any]]
+            Each instance's information keyed by the name the catalog keeps it under. Empty if there are none.
+        """
+        if self.replica is not None:
+            services = self.get_services() or {}
+            found = {key: info for key, info in services.items() if key == name or info.get('service') == name}
+            self._prune(name, found)
+            return found
+
+        now = time.monotonic()
+        if not refresh:
+            entry = self.instance_sets.get(name)
+            if entry is not None and entry[0] > now:
+                return entry[1]
+
+            # The catalog answers a name with the service itself whenever one is registered under it, so an
+            # address already resolved is every instance there is.
+            entry = self.resolutions.get(name)
+            if entry is not None and entry[0] > now and entry[1] is not None:
+                return {name: entry[1]}
+
+        # One request covers both: a bare name is answered with the service, or with every instance of it.
+        found = self._info_request(name) or {}
+
+        if self.connected:
+            ttl = self.resolve_ttl if found else self.negative_ttl
+            self.instance_sets[name] = (now + ttl, found)
+
+            info = found.get(name)
+            self.resolutions[name] = (now + (self.resolve_ttl if info is not None else self.negative_ttl), info)
+
+            self._prune(name, found)
+
+        return found
+
+    def _prune(self, name: str, found: Dict[str, Dict[str, Any]]):
+        """
+        Drops what the balancer knows about instances of a service which are no longer registered.
+        """
+        addrs = {_router_addr(info) for info in found.values()}
+        gone = self.balanced.get(name, set()) - addrs
+        if gone:
+            self.balancer.forget(gone)
+
+        if addrs:
+            self.balanced[name] = addrs
+        else:
+            self.balanced.pop(name, None)
+
+    def choose(self, name: str, refresh=False, exclude: Iterable[str] = ()) -> Optional[str]:
+        """
+        The router address of the instance of a service the next request should go to.
+
+        Parameters
+        ----------
+        name : str
+            The name of the service.
+        refresh : bool, default=False
+            Looks the instances up again first.
+        exclude : Iterable[str], default=()
+            Addresses to pass over, such as ones which just failed, unless there is nothing else.
+
+        Returns
+        -------
+        str
+            The address, or None if the service has no instances.
+        """
+        addrs = [_router_addr(info) for info in self.instances(name, refresh=refresh).values()]
+        exclude = set(exclude)
+
+        return self.balancer.choose([addr for addr in addrs if addr not in exclude] or addrs)
+
+    def forget(self, name: str = None):
+        """
+        Drops what was resolved for a service, or for every service when no name is given, along with what the
+        balancer knows about its instances.
+        """
+        if name is None:
+            self.resolutions.clear()
+            self.instance_sets.clear()
+            self.balanced.clear()
+            self.balancer.forget()
+        else:
+            self.resolutions.pop(name, None)
+            self.instance_sets.pop(name, None)
+            self.balancer.forget(self.balanced.pop(name, ()))
+
+    def connect_to_service(self, addr) -> str:
         """
         Connects the client to a service at the specified address. One can either be provide or found
-        by asking the bus broker node.
+        by asking the bus broker node. The socket from the last time is reused if it is still open.
 
         Parameters
         ----------
         addr: str
             An address to connect the client to.
+
+        Returns
+        -------
+        str
+            The name of the socket connected to the service.
+        """
+        return self.pool.connect(addr)
+
+    def request_from_service(self, name=None, addr=None, timeout=5000) -> Dict[str, Any]:
         """
-        # TODO: Give this socket a unique name for each service.
-        self.new_socket("client->service", zmq.REQ, addr)
+        Pings a service, by address or by name. Names are resolved through the cache and, for services with
+        several instances, sent to the one the balancer picks. If the service does not answer it is looked up
+        again and another instance, if there is one, is tried.
 
-    def request_from_service(self, name=None, addr=None) -> Dict[str, Any]:
+        Parameters
+        ----------
+        name : str, default=None
+            The name of the service.
+        addr : str, default=None
+            The address of the service's router. Used instead of the name when given.
+        timeout : int, default=5000
+            Milliseconds to wait for the service to answer.
+
+        Returns
+        -------
+        Dict[str, Any]
+            The service's reply, or None if it could not be found or did not answer.
+        """
         if name is None and addr is None:
             raise ValueError(
                 "Either the name or addr parameter must have a value")
 
-        if name is not None:
-
-            # TODO: Move null service check to somewhere else
-            info = self.get_services(name=name)['interfaces']['router']
+        if addr is not None:
+            return self._ping(addr, timeout)
 
-            if info is not None:
-                self.connect_to_service(
-                    addr=f"tcp://{info['ip']}:{info['port']}")
-            else:
+        tried = []
+        for refresh in (False, True):
+            addr = self.choose(name, refresh=refresh, exclude=tried)
+            if addr is None:
                 self.logger.warning("Service does not exits.")
                 return None
 
-        if addr is not None:
-            self.connect_to_service(addr=addr)
+            started = self.balancer.begin(addr)
+            reply = self._ping(addr, timeout)
+            self.balancer.end(addr, started, ok=reply is not None)
+            if reply is not None:
+                return reply
 
-        msg = Message(self.sockets['client->service'])
-        msg.send(command=commands['Ping'], body="Hello!")
-        msg.recv()
+            tried.append(addr)
 
-        return msg.body
+            self.logger.warning(f"No answer from {name}. Looking it up again.")
+            self.forget(name)
+
+        return None
+
+    def request_async(self, command: bytes = commands['Ping'], body: Any = "Hello!", name=None, addr=None,
+                      timeout=5000) -> Future:
+        """
+        Sends a request to a service without waiting for the reply, so any number of them can be in flight at
+        once. Names are resolved through the cache.
+
+        Parameters
+        ----------
+        command : bytes, default=commands['Ping']
+            The command to send.
+        body : Any, default="Hello!"
+            The payload to send.
+        name : str, default=None
+            The name of the service.
+        addr : str, default=None
+            The address of the service's router. Used instead of the name when given.
+        timeout : int, default=5000
+            Milliseconds to wait for the service to answer.
+
+        Returns
+        -------
+        Future
+            Resolved with the reply Message. Fails with TimeoutError if the service does not answer in time, or
+            with LookupError if there is no such service.
+        """
+        if name is None and addr is None:
+            raise ValueError(
+                "Either the name or addr parameter must have a value")
+
+        if addr is None:
+            addr = self.choose(name)
+            if addr is None:
+                future = Future()
+                future.set_exception(LookupError(f"No registered service with the name {name}."))
+                return future
+
+        if self.pipeline is None:
+            self.pipeline = Pipeline(timeout=timeout, logger=self.logger, name=f'{self.name}_pipeline')
+
+        started = self.balancer.begin(addr)
+        future = self.pipeline.request(addr, command, body, timeout=timeout)
+        future.add_done_callback(lambda done: self.balancer.end(addr, started, ok=done.exception() is None))
+
+        return future
+
+    def close_ctx(self):
+        if self.pipeline is not None:
+            self.pipeline.close()
+            self.pipeline = None
+
+        super().close_ctx()
+
+    def _ping(self, addr: str, timeout: int) -> Any:
+        name = self.connect_to_service(addr=addr)
+
+        msg = self.request(name, commands['Ping'], "Hello!", timeout=timeout)
+        if msg is None:
+            self.pool.discard(addr)
+            return None
+
+        return msg.payload
+
+    def fetch_from_service(self, resource: str, name=None, addr=None, chunk_size=CHUNK_SIZE,
+                           credit=CREDIT) -> Iterator[memoryview]:
+        """
+        Streams a file or buffer a service is serving, one chunk at a time, without ever holding the whole
+        thing in memory.
+
+        Parameters
+        ----------
+        resource : str
+            The name the service is serving the file or buffer under.
+        name : str, default=None
+            The name of the service to fetch from.
+        addr : str, default=None
+            The address of the service's router if its name is not known.
+        chunk_size : int, default=CHUNK_SIZE
+            The most bytes to ask for in one request.
+        credit : int, default=CREDIT
+            The most chunk requests to have in flight at once.
+
+        Yields
+        ------
+        memoryview
+            The next chunk of the resource, in order.
+        """
+        if name is None and addr is None:
+            raise ValueError(
+                "Either the name or addr parameter must have a value")
+
+        if name is not None:
+            addr = self.choose(name)
+            if addr is None:
+                self.logger.warning("Service does not exits.")
+                return
+
+        # Kept off of the poller and the sockets dict as it only lives as long as the transfer.
+        dealer = self.ctx.socket(zmq.DEALER)
+        dealer.connect(addr)
+
+        try:
+            yield from fetch_chunks(dealer, resource, chunk_size=chunk_size, credit=credit)
+        except TransferError:
+            # The service may have moved. Look it up again next time.
+            if name is not None:
+                self.forget(name)
+            raise
+        finally:
+            dealer.close(linger=0)
 
     def sub_to_service(self, name, topic):
         pass
 
 
+def _router_addr(info: Dict[str, Any]) -> str:
+    router = info['interfaces']['router']
+    return f"tcp://{router['ip']}:{router['port']}"
+
+
 if __name__ == "__main__":
     print("Shalom, World!")
 
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+
+# System modules
+import struct
+import logging
+import threading
+from collections import deque
+from typing import Dict, List, Any, Callable, Tuple
+
+# Third party modules
+import zmq
+
+# Relative imports
+from Hermes.Message import Message, DEFAULT_CODEC
+from Hermes.Catalog import Catalog, VERSION
+from Hermes.DBP import commands
+
+################################################# RESOURCES ##########################################################
+# Reliable pub-sub, the Clone pattern: http://zguide.zeromq.org/page:all#Reliable-Pub-Sub-Clone-Pattern
+#######################################################################################################################
+
+# Snapshot replies end with the port the feed is published on so clients know where to subscribe.
+PORT = struct.Struct('!H')
+
+
+class CatalogFeed():
+    """
+    Publishes every change to a catalog as a key-value delta so subscribers can keep a replica of it without
+    asking for the whole thing again. Each delta is the service name as the subscription key, a Delta message
+    with the new information (None once the service is removed), and the catalog version it brought the catalog
+    up to. Versions go up by exactly one per delta, which is how subscribers notice ones they missed.
+
+    A Heartbeat with an empty key and the latest version is published every so often so subscribers also notice
+    when the last delta before a quiet spell was the one they missed.
+
+    ZMQ sockets are not thread safe and catalog changes are made on handler threads, so deltas are queued in
+    order as they happen and only sent by flush, which call_soon hands to the thread owning the socket.
+
+    Attributes
+    ----------
+    socket : zmq.Socket
+        The PUB socket deltas go out on. Nothing else may send on it.
+    catalog : Catalog
+        The catalog being published.
+    version : int
+        The version of the last delta published.
+    call_soon : Callable[[Callable], Any], default=None
+        Runs a callback on the thread owning the socket, such as Reactor.call_soon. Deltas are sent straight
+        away when None, which is only safe when the catalog is changed on that same thread.
+    """
+
+    def __init__(self, socket: zmq.Socket, catalog: Catalog, codec: bytes = DEFAULT_CODEC, logger=None,
+                 call_soon: Callable[[Callable[[], Any]], Any] = None):
+        self.socket = socket
+        self.catalog = catalog
+        self.codec = codec
+        self.version = catalog.version
+        self.call_soon = call_soon
+
+        if logger is not None:
+            self.logger: logging.Logger = logger
+        else:
+            self.logger: logging.Logger = logging.getLogger(__name__)
+
+        # Frames waiting to go out. The lock keeps them in version order.
+        self._queue: deque = deque()
+        self._lock = threading.Lock()
+
+        catalog.listeners.append(self.publish)
+
+    def publish(self, name: str, info: Dict[str, Any], version: int):
+        """
+        Catalog listener which queues a delta for one change and has it sent.
+        """
+        self._queue_frames(bytes(name, 'utf-8'), commands['Delta'], info, version)
+
+        if self.call_soon is None:
+            self.flush()
+        else:
+            self.call_soon(self.flush)
+
+    def heartbeat(self):
+        """
+        Sends the version of the last delta. Meant to be run on a timer on the thread owning the socket.
+        """
+        self._queue_frames(b'', commands['Heartbeat'], None, None)
+        self.flush()
+
+    def _queue_frames(self, key: bytes, command: bytes, body: Any, version: int):
+        with self._lock:
+            if version is not None:
+                self.version = version
+
+            frames = Message(self.socket, self.logger).compose([key], command, body, self.codec)
+            frames.append(VERSION.pack(self.version))
+            self._queue.append(frames)
+
+    def flush(self):
+        """
+        Sends every queued delta. Must only be called on the thread owning the socket.
+        """
+        while self._queue:
+            self.socket.send_multipart(self._queue.popleft())
+
+    def snapshot(self, msg: Message, port: int):
+        """
+        Message handler for Snapshot requests. Replies with the whole catalog, the version it is at, and the port
+        the feed is published on.
+        """
+        _, snapshot = self.catalog.lookup()
+        msg.send(command=commands['Snapshot'], body=snapshot.extended(PORT.pack(port)))
+
+
+def read_snapshot(msg: Message) -> Tuple[int, Dict[str, Dict[str, Any]], int]:
+    """
+    Unpacks a Snapshot reply.
+
+    Returns
+    -------
+    Tuple[int, Dict[str, Dict[str, Any]], int]
+        The catalog version, the catalog, and the port its feed is published on.
+    """
+    if msg.command != commands['Snapshot'] or len(msg.body) != 3:
+        raise ValueError(f"Not a catalog snapshot: {msg.payload}")
+
+    return VERSION.unpack(msg.body[1])[0], msg.payload, PORT.unpack(msg.body[2])[0]
+
+
+class Replica():
+    """
+    A local copy of a published catalog. Deltas are taken off of the subscriber whenever the replica is updated,
+    so reading it never waits on the network.
+
+    The subscriber must be subscribed before the first sync. Deltas published while the snapshot is being fetched
+    wait on the subscriber and the ones the snapshot already has are skipped. If a delta or heartbeat shows one
+    was missed the replica throws itself away and syncs again.
+
+    Attributes
+    ----------
+    subscriber : zmq.Socket
+        A SUB socket connected to the catalog's feed.
+    services : Dict[str, Dict[str, Any]]
+        The replicated catalog.
+    version : int
+        The catalog version the replica is up to. None before the first sync.
+    resyncs : int
+        The number of times a missed delta forced a new snapshot.
+    """
+
+    def __init__(self, subscriber: zmq.Socket, snapshot: Callable[[], Tuple[int, Dict[str, Dict[str, Any]]]],
+                 logger=None):
+        self.subscriber = subscriber
+        self.fetch_snapshot = snapshot
+        self.services: Dict[str, Dict[str, Any]] = {}
+        self.version: int = None
+        self.resyncs = 0
+
+        if logger is not None:
+            self.logger: logging.Logger = logger
+        else:
+            self.logger: logging.Logger = logging.getLogger(__name__)
+
+    def sync(self):
+        """
+        Replaces the replica with a fresh snapshot.
+        """
+        self.version, self.services = self.fetch_snapshot()
+        self.logger.debug(f"Catalog replica synced at version {self.version}.")
+
+    def update(self) -> int:
+        """
+        Applies every delta waiting on the subscriber.
+
+        Returns
+        -------
+        int
+            The number of deltas applied.
+        """
+        if self.version is None:
+            self.sync()
+
+        applied = 0
+
+        while True:
+            try:
+                frames = self.subscriber.recv_multipart(zmq.NOBLOCK)
+            except zmq.Again:
+                break
+
+            applied += self.apply(frames)
+
+        return applied
+
+    def apply(self, frames: List[bytes]) -> bool:
+        """
+        Applies one message from the feed.
+
+        Returns
+        -------
+        bool
+            Whether the replica changed.
+        """
+        msg = Message(self.subscriber, self.logger)
+        msg.load(frames[1:])
+
+        if not msg.valid or len(msg.body) != 2:
+            return False
+
+        version = VERSION.unpack(msg.body[1])[0]
+
+        if msg.command == commands['Heartbeat']:
+            if version > self.version:
+                self.resync(version)
+                return True
+            return False
+
+        if version <= self.version:
+            # Already in the snapshot.
+            return False
+
+        if version != self.version + 1:
+            self.resync(version)
+            return True
+
+        name = frames[0].decode('utf-8')
+        info = msg.payload
+        if info is None:
+            self.services.pop(name, None)
+        else:
+            self.services[name] = info
+
+        self.version = version
+        return True
+
+    def resync(self, version: int):
+        self.logger.warning(f"Catalog replica at version {self.version} missed deltas up to {version}. Resyncing.")
+        self.resyncs += 1
+        self.sync()
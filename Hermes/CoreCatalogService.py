@@ -2,20 +2,25 @@
 
 # %%
 # System modules
-import json
 import logging
 import socket
+import threading
 from typing import Dict, List, Type, Any
 
 # Third party modules
 import zmq
 
 # Relative imports
-from Hermes.Message import Message
-from Hermes.Timer import Heartbeater
+from Hermes.Message import Message, Compression
+from Hermes.Timer import TimingWheel
 from Hermes.Reactor import Reactor
+from Hermes.AsyncReactor import AsyncReactor
 from Hermes.DBP import commands
 from Hermes.Logger import Logger
+from Hermes.Catalog import Catalog, replica_key
+from Hermes.Clone import CatalogFeed, Replica, read_snapshot
+from Hermes.Journal import Journal
+from Hermes.BinaryStar import BinaryStar, PASSIVE, STANDBY
 
 # %%
 
@@ -31,12 +36,37 @@ class CoreCatalogService():
         A human readable string for identification and log labeling purposes.
     log_level : int, default=logging.WARNING
         The level at which to start display logs generated by the broker
-    liveliness : int
-        The interval in which to expect/send heartbeats from/to services.
-    retries : int
-        The number of attempts to try and reconnect to a service that has not sent a heartbeat.
+    liveliness : int, default=1000
+        The interval in which to expect/send heartbeats from/to services, in milliseconds. Services may register
+        their own.
+    retries : int, default=3
+        The number of heartbeats a service may miss before it is evicted from the catalog. Services may register
+        their own.
+    liveness : TimingWheel
+        When each registered service is evicted unless it heartbeats first.
+    compress_threshold : int, default=None
+        Replies with bodies of at least this many bytes are compressed. Off by default.
+    asynchronous : bool, default=False
+        Runs the interface on an AsyncReactor instead of the threaded Reactor.
+    cache_lookups : bool, default=True
+        Answers repeated client lookups from a cache of encoded replies, cleared whenever the catalog changes.
+    catalog : Catalog
+        Holds the registered services and their encoded lookup replies.
+    feed : CatalogFeed
+        Publishes every change to the catalog on the publisher socket so clients can keep a replica of it.
+    journal : str, default=None
+        A directory to keep the catalog in on disk. A catalog restarted with the same directory comes back with
+        every service it had. Kept in memory only when None.
+    peer : str, default=None
+        The address of the other half of a primary/backup pair's state socket, e.g. tcp://10.0.0.2:5004. Runs
+        on its own when None.
+    primary : bool, default=True
+        Whether this is the primary of the pair.
+    star : BinaryStar
+        Decides which of the pair serves. Only the serving catalog sends the beacon and answers requests, the
+        other keeps a replica of its catalog to take over with. None when running on its own.
     services : Dict[str: Dict[str, Any]]
-        Holds all of the currently registered services information. The information is another dictionary
+        Holds all of the currently registered services information. The catalog's services, for reading only. The information is another dictionary
         of the following form:
         {
             ip_addr:    str,
@@ -55,11 +85,22 @@ class CoreCatalogService():
         Terminate the eventloop and closes the context.
     """
 
-    def __init__(self, name="CoreCatalogService", log_level=logging.WARNING, liveliness=1000):
+    def __init__(self, name="CoreCatalogService", log_level=logging.WARNING, liveliness=1000, retries=3,
+                 compress_threshold: int = None, asynchronous=False, cache_lookups=True, peer: str = None,
+                 primary=True, ha_bind='tcp://*:5003', ha_heartbeat=1.0, journal: str = None):
 
         self.name = name
         self.logger = Logger(self.name, log_level).logger
 
+        self.liveliness: int = liveliness
+        self.retries: int = retries
+
+        # Sweeping only the ticks that have passed keeps roll call cheap no matter how many services there are.
+        self.liveness = TimingWheel(tick=.05, slots=1024)
+
+        # Catalog dumps get large quickly. Compress anything over the threshold on the way out.
+        compression = Compression(compress_threshold) if compress_threshold is not None else None
+
         #################################### Beacon Port #####################################
         # Create UDP socket
         self.beacon = socket.socket(
@@ -72,13 +113,16 @@ class CoreCatalogService():
 
         # TODO: Pull socket, handler, and timer information from a config file
         sockets = {
-            'router': zmq.ROUTER
+            'router': zmq.ROUTER,
+            'publisher': zmq.PUB
         }
 
         handlers = {
             commands['Info_Req']: self.client_handler,
             commands['Registration']: self.service_registration,
-            commands['Update']: self.service_update
+            commands['Update']: self.service_update,
+            commands['Snapshot']: self.snapshot_handler,
+            commands['Heartbeat']: self.heartbeat_handler
         }
 
         timers = {
@@ -88,25 +132,75 @@ class CoreCatalogService():
                 'args': [],
                 'kwargs': {'port': 5245, 'broadcast_addr': '255.255.255.255'}
             },
+            # Roll call only costs as much as the services it evicts, so it can run often.
             'peer_check': {
-                'interval': .5,
+                'interval': .1,
                 'callback': self.robot_rollcall,
                 'args': [],
                 'kwargs': {}
+            },
+            'catalog_feed': {
+                'interval': 1,
+                'callback': self.feed_heartbeat,
+                'args': [],
+                'kwargs': {}
             }
         }
 
-        self.loop = Reactor(
+        # The catalog handlers never block so they run just as well on the asyncio loop.
+        reactor = AsyncReactor if asynchronous else Reactor
+
+        self.loop = reactor(
             name=f'{self.name}_interface',
             socs=sockets,
             msg_handlers=handlers,
             log_level=log_level,
-            timers=timers
+            timers=timers,
+            compression=compression
         )
 
+        # Lookups only read the catalog so their replies can be reused until it changes.
+        if cache_lookups:
+            self.loop.cache_replies(commands['Info_Req'], ttl=None)
+
         # External service registration storage
-        # TODO: Move this data structure to some external, persistant, database/cache/file
-        self.services = dict()
+        self.catalog = Catalog(compression=compression)
+        self.services = self.catalog.services
+        self.feed = CatalogFeed(self.loop.sockets['publisher'], self.catalog, logger=self.logger,
+                                call_soon=self.loop.call_soon)
+
+        self.journal: Journal = None
+        if journal is not None:
+            self.recover(journal)
+
+        # Primary/backup pairing. The standing by catalog follows the serving one's feed.
+        self.star: BinaryStar = None
+        self.replica: Replica = None
+        self._peer_catalog: zmq.Socket = None
+        self._ha_lock = threading.Lock()
+
+        if peer is not None:
+            self.star = BinaryStar(primary, ha_bind, peer, heartbeat=ha_heartbeat, logger=self.logger)
+            self.star.status = self.ha_status
+            self.star.on_active.append(self.take_over)
+            self.star.on_passive.append(self.stand_by)
+            self.loop.add_timer('binary_star', ha_heartbeat, self.ha_tick)
+
+    def recover(self, path: str):
+        """
+        Loads the catalog kept in a directory and keeps every change from now on there too.
+        """
+        self.journal = Journal(path, source=self.catalog.copy, logger=self.logger)
+        version, services = self.journal.recover()
+        self.catalog.restore(services, version)
+        self.feed.version = version
+
+        # Nobody has heartbeated to this catalog yet. Give everyone a full timeout to find it.
+        for name in services:
+            self.liveness.touch(name, self.timeout(name))
+
+        self.catalog.listeners.append(self.journal.append)
+        self.journal.start()
 
     def client_handler(self, msg: Message):
         """
@@ -115,20 +209,79 @@ class CoreCatalogService():
         Parameters
         ----------
         msg : BrokerMessage
-            The passed along message received from the interface socket
+            The passed along message received from the interface socket. The body is either a service name, empty
+            for the whole catalog, or {'name': str, 'since': int} to only get a reply if what was asked for has
+            changed since the given catalog version. A name with several instances registered is answered with
+            every instance, keyed name@instance. Queries are {'where': dict, 'fields': list} and are
+            answered with only the matching services and the asked for fields, see Catalog.query. A query's
+            'since' is checked against the whole catalog's version.
         """
-        body = bytes.decode(msg.body[0], 'utf-8')
-        if body != '':
-            if body in self.services:
-                msg.send(command=commands['Info_Rep'],
-                         body={body: self.services[body]})
-            else:
-                msg.send(
-                    command=commands['Info_Rep'],
-                    body={'Error': f"No Registered Service With the Name {body}"})
+        if self.standing_by(msg):
+            return
+
+        request = msg.payload
+        since = None
+        if isinstance(request, dict) and ('where' in request or 'fields' in request):
+            self.query_handler(msg, request)
+            return
+
+        if isinstance(request, dict):
+            name = request.get('name', '')
+            since = request.get('since')
         else:
-            msg.send(command=commands['Info_Rep'],
-                     body=self.services)
+            name = request
+
+        try:
+            if since is not None and self.catalog.modified(name) <= since:
+                msg.send(command=commands['Unchanged'], body=self.catalog.modified(name))
+                return
+
+            _, reply = self.catalog.lookup(name)
+
+        except KeyError:
+            # A service scaled out to several instances is answered with all of them.
+            if name in self.catalog.indexes['service']:
+                self.query_handler(msg, {'where': {'service': name}, 'since': since})
+                return
+
+            msg.send(
+                command=commands['Info_Rep'],
+                body={'Error': f"No Registered Service With the Name {name}"})
+            return
+
+        msg.send(command=commands['Info_Rep'], body=reply)
+
+    def query_handler(self, msg: Message, request: Dict[str, Any]):
+        where, fields, since = request.get('where') or {}, request.get('fields'), request.get('since')
+        if not isinstance(where, dict) or not (fields is None or isinstance(fields, list)):
+            msg.send(
+                command=commands['Info_Rep'],
+                body={'Error': "Queries need a dict of predicates and a list of fields."})
+            return
+
+        if since is not None and self.catalog.version <= since:
+            msg.send(command=commands['Unchanged'], body=self.catalog.version)
+            return
+
+        _, reply = self.catalog.query(where, fields)
+        msg.send(command=commands['Info_Rep'], body=reply)
+
+    def snapshot_handler(self, msg: Message):
+        """
+        Handles snapshot requests from clients bootstrapping a replica of the catalog.
+
+        Parameters
+        ----------
+        msg : BrokerMessage
+            The passed along message received from the interface socket
+        """
+        if self.standing_by(msg):
+            return
+
+        self.feed.snapshot(msg, self.loop.interfaces['publisher']['port'])
+
+    def feed_heartbeat(self):
+        self.feed.heartbeat()
 
     def service_registration(self, msg: Message):
         """
@@ -137,29 +290,51 @@ class CoreCatalogService():
         Parameters
         ----------
         msg : BrokerMessage
-            The passed along message received from the interface socket
+            The passed along message received from the interface socket. The body is one service's information,
+            or a list of them to register many at once. Lists are answered with Approved and a list of
+            {'name': str, 'ok': bool, 'error': str} results in the same order.
         """
-        approved = True
+        if self.standing_by(msg):
+            return
+
+        records = msg.payload
+        if isinstance(records, list):
+            results = [self._register(record) for record in records]
+            self.loop.invalidate()
+            msg.send(command=commands['Approved'], body=results)
+            return
+
+        result = self._register(records)
+        if result['ok']:
+            self.loop.invalidate()
+            msg.send(command=commands['Approved'])
+        else:
+            msg.send(command=commands['Denied'], body=result['error'])
 
+    def _register(self, info: Any) -> Dict[str, Any]:
         # TODO: Check to make sure info has all the appropriate information
         # TODO: Resolve name conflicts.
-        # TODO: Figure out some other way to load json payloads in message class
-        info = json.loads(msg.body[0].decode('utf-8'))
-        if approved:
-            name = info['name']
-            # removes duplicate name entry in nested dict
-            del info["name"]
-
-            self.services[name] = info
-            self.logger.info(
-                f"New Service Registered: {name}")
-            self.logger.debug(
-                f"Service Registration Information\n:\t{self.services[name]}")
+        if not isinstance(info, dict) or not isinstance(info.get('name'), str):
+            return {'name': None, 'ok': False, 'error': "Error: Registrations need a name."}
 
-            msg.send(command=commands['Approved'])
+        # removes duplicate name entry in nested dict
+        info = dict(info)
+        name = info.pop('name')
 
-        else:
-            msg.send(command=commands['Denied'])
+        # Instances of the same service are kept side by side instead of replacing one another.
+        instance = info.pop('instance', None)
+        if instance is not None:
+            info['service'] = name
+            name = replica_key(name, instance)
+
+        self.catalog.register(name, info)
+        self.liveness.touch(name, self.timeout(name))
+        self.logger.info(
+            f"New Service Registered: {name}")
+        self.logger.debug(
+            f"Service Registration Information\n:\t{info}")
+
+        return {'name': name, 'ok': True}
 
     def service_update(self, msg: Message):
         """
@@ -168,35 +343,243 @@ class CoreCatalogService():
         Parameters
         ----------
         msg : BrokerMessage
-            The passed along message received from the interface socket
+            The passed along message received from the interface socket. The body is one service's changes with
+            its name, or a list of them. Lists are answered with Acknowledged and a list of results as for
+            registrations.
         """
-        info = json.loads(msg.body[0].decode('utf-8'))
-        name = info['name']
-        del info["name"]
+        if self.standing_by(msg):
+            return
+
+        records = msg.payload
+        if isinstance(records, list):
+            results = [self._update(record) for record in records]
+            self.loop.invalidate()
+            msg.send(command=commands['Acknowledged'], body=results)
+            return
+
+        result = self._update(records)
+        if result['ok']:
+            self.loop.invalidate()
+            msg.send(command=commands['Acknowledged'])
+        else:
+            msg.send(command=commands['Denied'], body=result['error'])
+
+    def _update(self, info: Any) -> Dict[str, Any]:
+        if not isinstance(info, dict) or not isinstance(info.get('name'), str):
+            return {'name': None, 'ok': False, 'error': "Error: Updates need a name."}
+
+        info = dict(info)
+        name = info.pop('name')
 
-        # Incase of multiple update, every value is iterated over.
-        for k, v in info.items():
-            self.services[name][k] = v
+        try:
+            self.catalog.update(name, info)
+        except KeyError:
+            return {'name': name, 'ok': False, 'error': f"Error: No Registered Service With the Name {name}"}
 
+        self.liveness.touch(name, self.timeout(name))
         self.logger.info(f"Service Configs Update: {info}")
-        msg.send(command=commands['Acknowledged'])
+
+        return {'name': name, 'ok': True}
+
+    def standing_by(self, msg: Message) -> bool:
+        """
+        Turns a request away if this is the half of a pair which is standing by.
+        """
+        if self.star is None or self.star.request():
+            return False
+
+        msg.send(command=commands['Denied'], body=STANDBY)
+        return True
+
+    def ha_status(self):
+        return {
+            'version': self.catalog.version,
+            'router': self.loop.interfaces['router']['port'],
+            'feed': self.loop.interfaces['publisher']['port']
+        }
+
+    def ha_tick(self):
+        """
+        Trades states with the peer and, while standing by, catches the replica up with the peer's catalog.
+        """
+        self.star.tick()
+
+        if self.star.state == PASSIVE:
+            self.follow()
+
+    def follow(self):
+        """
+        Applies whatever the serving peer has published since the last heartbeat.
+        """
+        info = self.star.peer_info
+        if 'feed' not in info:
+            return
+
+        with self._ha_lock:
+            if self.replica is None:
+                subscriber = self.star.ctx.socket(zmq.SUB)
+                subscriber.setsockopt(zmq.SUBSCRIBE, b'')
+                subscriber.connect(f"tcp://{self.star.peer_host}:{info['feed']}")
+                self.replica = Replica(subscriber, self.peer_snapshot, self.logger)
+
+            try:
+                self.replica.update()
+            except TimeoutError:
+                self.logger.warning("Peer did not send a snapshot. Trying again next heartbeat.")
+
+    def peer_snapshot(self):
+        """
+        Asks the serving peer for its whole catalog.
+        """
+        if self._peer_catalog is None:
+            self._peer_catalog = self.star.ctx.socket(zmq.REQ)
+            self._peer_catalog.connect(f"tcp://{self.star.peer_host}:{self.star.peer_info['router']}")
+
+        msg = Message(self._peer_catalog, self.logger)
+        msg.send(command=commands['Snapshot'])
+
+        if not self._peer_catalog.poll(int(self.star.heartbeat * 1000)):
+            self._peer_catalog.close(linger=0)
+            self._peer_catalog = None
+            raise TimeoutError("Peer did not answer the snapshot request.")
+
+        msg.recv()
+        version, services, _ = read_snapshot(msg)
+        return version, services
+
+    def take_over(self):
+        """
+        Starts serving with the catalog replicated from the peer.
+        """
+        with self._ha_lock:
+            if self.replica is not None and self.replica.version is not None:
+                self.catalog.restore(self.replica.services, self.replica.version)
+                self.feed.version = self.catalog.version
+
+            self._unfollow()
+
+        # Restoring does not go through the listeners, so the journal starts over from the restored catalog.
+        if self.journal is not None:
+            self.journal.compact()
+
+        # Nobody has been heartbeating to this half. Give everyone a full timeout to find it.
+        for name in list(self.services):
+            self.liveness.touch(name, self.timeout(name))
+
+        self.loop.invalidate()
+        self.logger.warning(f"Serving the catalog at version {self.catalog.version}.")
+
+    def stand_by(self):
+        """
+        Stops serving. The catalog is replaced with the peer's if this one has to take over again.
+        """
+        self.loop.invalidate()
+        self.logger.warning("Standing by.")
+
+    def _unfollow(self):
+        if self.replica is not None:
+            self.replica.subscriber.close(linger=0)
+            self.replica = None
+
+        if self._peer_catalog is not None:
+            self._peer_catalog.close(linger=0)
+            self._peer_catalog = None
 
     def broadcast(self, port=5245, broadcast_addr=None):
+        # Requesters only look for the catalog that is serving.
+        if self.star is not None and not self.star.serving:
+            return
+
 
         msg = bytes(
             f'SHALOM {self.loop.interfaces["router"]["port"]}', 'utf-8')
         # TODO: Send with multicast...not broadcast.
         self.beacon.sendto(msg, (broadcast_addr, port))
 
+    def heartbeat_handler(self, msg: Message):
+        """
+        Handles heartbeats from services. Nothing is sent back unless the catalog does not know the service, in
+        which case it is told to register again.
+
+        Parameters
+        ----------
+        msg : BrokerMessage
+            The passed along message received from the interface socket. The body is the service's name, or a
+            list of names from an agent heartbeating for several services. Lists are always answered, with
+            Acknowledged and the names the catalog does not know.
+        """
+        if self.standing_by(msg):
+            return
+
+        name = msg.payload
+        if isinstance(name, list):
+            unknown = []
+            for each in name:
+                if each in self.catalog:
+                    self.liveness.touch(each, self.timeout(each))
+                else:
+                    unknown.append(each)
+
+            msg.send(command=commands['Acknowledged'], body=unknown)
+            return
+
+        if name not in self.catalog:
+            msg.send(command=commands['Denied'], body=f"Error: No Registered Service With the Name {name}")
+            return
+
+        self.liveness.touch(name, self.timeout(name))
+
+    def timeout(self, name: str) -> float:
+        """
+        Seconds a service may go without heartbeating before it is evicted.
+        """
+        info = self.services.get(name, {})
+        return info.get('liveliness', self.liveliness) * info.get('retries', self.retries) / 1000
+
     def robot_rollcall(self, *args, **kwargs):
-        pass
+        """
+        Evicts every service which has missed too many heartbeats. Evictions go out on the feed like any other
+        removal.
+        """
+        if self.star is not None and not self.star.serving:
+            return
+
+        evicted = 0
+        for name in self.liveness.expired():
+            try:
+                self.catalog.remove(name)
+            except KeyError:
+                # Gone by the time it expired.
+                continue
+
+            evicted += 1
+            self.logger.warning(f"Service {name} stopped heartbeating. Evicted.")
+
+        if evicted:
+            self.loop.invalidate()
 
     def start(self):
-        self.loop.start(display_incoming=True)
+        try:
+            self.loop.start(display_incoming=True)
+        finally:
+            self.close()
 
     def stop(self):
         self.loop.stop()
 
+    def close(self):
+        """
+        Closes the sockets used to pair with a peer and writes out whatever the journal has queued. Call once
+        the loop has stopped.
+        """
+        if self.journal is not None:
+            self.journal.close()
+
+        if self.star is not None:
+            with self._ha_lock:
+                self._unfollow()
+            self.star.close()
+
 
 # %%
 if __name__ == "__main__":
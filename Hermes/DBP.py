@@ -1,6 +1,5 @@
 #!/usr/bin/env python3
 
-# TODO: Add methods for users to add custom commands to this known list for message verification
 commands = {
     'Info_Req': b'u_U',
     'Info_Rep': b'o_O',
@@ -14,7 +13,13 @@ commands = {
     'Exit': b'<\\3',
     'Handler': b'^o^',
     'Pong': b'pong',
-    'Ping': b'ping'
+    'Ping': b'ping',
+    'Fetch': b'>_>',
+    'Chunk': b'<_<',
+    'Stats': b'%_%',
+    'Unchanged': b'-_-',
+    'Snapshot': b'=_=',
+    'Delta': b'+_+'
 }
 
 command_checks = {
@@ -28,5 +33,69 @@ command_checks = {
     b'<3': 'Heartbeat',
     b'</3': 'Disconnect',
     b'<\\3': 'Exit',
-    b'^o^': 'Handler'
+    b'^o^': 'Handler',
+    b'>_>': 'Fetch',
+    b'<_<': 'Chunk',
+    b'%_%': 'Stats',
+    b'-_-': 'Unchanged',
+    b'=_=': 'Snapshot',
+    b'+_+': 'Delta'
 }
+
+# Wire opcodes carried in the binary message header. Zero is reserved for messages without a command.
+# NOTE: Never renumber these. Nodes running different versions of Hermes still need to understand each other.
+opcodes = {
+    b'': 0,
+    b'u_U': 1,
+    b'o_O': 2,
+    b'UwU': 3,
+    b'OwO': 4,
+    b'OmO': 5,
+    b'UoU': 6,
+    b'u.u': 7,
+    b'<3': 8,
+    b'</3': 9,
+    b'<\\3': 10,
+    b'^o^': 11,
+    b'pong': 12,
+    b'ping': 13,
+    b'>_>': 14,
+    b'<_<': 15,
+    b'%_%': 16,
+    b'-_-': 17,
+    b'=_=': 18,
+    b'+_+': 19
+}
+
+opcode_commands = {opcode: command for command, opcode in opcodes.items()}
+
+
+def register_command(name: str, command: bytes) -> int:
+    """
+    Adds a custom command to the known list so it can be put in a message header.
+
+    Parameters
+    ----------
+    name : str
+        A human readable name for the command.
+    command : bytes
+        The command bytes handlers will be registered with.
+
+    Returns
+    -------
+    int
+        The opcode the command will be sent with.
+    """
+    if command in opcodes:
+        return opcodes[command]
+
+    opcode = max(opcode_commands) + 1
+    if opcode > 255:
+        raise ValueError("No opcodes left for new commands.")
+
+    commands[name] = command
+    command_checks[command] = name
+    opcodes[command] = opcode
+    opcode_commands[opcode] = command
+
+    return opcode
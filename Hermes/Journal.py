@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+
+# System modules
+import os
+import struct
+import logging
+import threading
+from typing import Dict, List, Any, Callable, Tuple
+
+# Third party modules
+import msgpack
+
+# Each log record is its length followed by the msgpack encoded [name, info, version].
+RECORD = struct.Struct('!I')
+
+SNAPSHOT_FILE = 'catalog.snapshot'
+LOG_FILE = 'catalog.log'
+
+
+class Journal():
+    """
+    Keeps a copy of the catalog on disk so a restarted catalog comes back with every registration instead of
+    waiting for the whole fleet to register again. Every change is appended to a log, and once the log holds
+    compact_every records the whole catalog is written out as a snapshot and the log is started over, so
+    recovering never replays more than that many records.
+
+    Changes are handed over as catalog listeners and written out by a background thread every flush_interval
+    seconds, all of them with one fsync, so requests never wait on the disk. Whatever was changed in the last
+    flush_interval before a crash is lost, and services registered then find out from their next heartbeat.
+
+    Attributes
+    ----------
+    path : str
+        The directory holding the snapshot and the log.
+    source : Callable[[], Tuple[int, Dict[str, Dict[str, Any]]]]
+        Returns the catalog's version and a copy of its services, for snapshots. Usually Catalog.copy.
+    flush_interval : float, default=0.05
+        Seconds between writes to the log.
+    compact_every : int, default=10000
+        How many records the log may hold before it is folded into a new snapshot.
+    logged : int
+        Records in the log since the last snapshot.
+    """
+
+    def __init__(self, path: str, source: Callable[[], Tuple[int, Dict[str, Dict[str, Any]]]] = None,
+                 flush_interval=0.05, compact_every=10000, logger=None):
+        self.path = path
+        self.source = source
+        self.flush_interval = flush_interval
+        self.compact_every = compact_every
+        self.logged = 0
+
+        if logger is not None:
+            self.logger: logging.Logger = logger
+        else:
+            self.logger: logging.Logger = logging.getLogger(__name__)
+
+        os.makedirs(path, exist_ok=True)
+        self._log = None
+
+        # Changes waiting for the next write, and a lock so only one thread writes at a time
+        self._pending: List[Tuple[str, Dict[str, Any], int]] = []
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+
+        self._stopped = threading.Event()
+        self._writer: threading.Thread = None
+
+    @property
+    def snapshot_path(self) -> str:
+        return os.path.join(self.path, SNAPSHOT_FILE)
+
+    @property
+    def log_path(self) -> str:
+        return os.path.join(self.path, LOG_FILE)
+
+    def recover(self) -> Tuple[int, Dict[str, Dict[str, Any]]]:
+        """
+        Reads the snapshot and replays the log over it. A record cut short by a crash ends the log and is cut
+        off so new records follow the last whole one. Call before anything is appended.
+
+        Returns
+        -------
+        Tuple[int, Dict[str, Dict[str, Any]]]
+            The version and services of the catalog as last written, or (0, {}) if nothing was.
+        """
+        version, services = 0, {}
+
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, 'rb') as snapshot:
+                version, services = msgpack.unpackb(snapshot.read(), raw=False)
+
+        self.logged = 0
+        end = 0
+
+        if os.path.exists(self.log_path):
+            with open(self.log_path, 'rb') as log:
+                data = log.read()
+
+            while end + RECORD.size <= len(data):
+                size, = RECORD.unpack_from(data, end)
+                if end + RECORD.size + size > len(data):
+                    break
+
+                try:
+                    name, info, record_version = msgpack.unpackb(
+                        data[end + RECORD.size:end + RECORD.size + size], raw=False)
+                except (ValueError, msgpack.UnpackException):
+                    break
+
+                end += RECORD.size + size
+                self.logged += 1
+
+                # Anything the snapshot already holds was logged before it was taken.
+                if record_version <= version:
+                    continue
+
+                if info is None:
+                    services.pop(name, None)
+                else:
+                    services[name] = info
+                version = record_version
+
+            if end < len(data):
+                self.logger.warning(f"Dropped {len(data) - end} bytes of a torn record from the catalog log.")
+                with open(self.log_path, 'r+b') as log:
+                    log.truncate(end)
+
+        self.logger.info(f"Recovered {len(services)} services at version {version} replaying {self.logged} records.")
+        return version, services
+
+    def append(self, name: str, info: Dict[str, Any], version: int):
+        """
+        Queues a change for the next write. Meant to be a catalog listener, so it never touches the disk.
+        """
+        record = (name, dict(info) if info is not None else None, version)
+        with self._lock:
+            self._pending.append(record)
+
+    def flush(self) -> int:
+        """
+        Writes every queued change to the log with one fsync, then compacts the log if it has grown too long.
+
+        Returns
+        -------
+        int
+            The number of records written.
+        """
+        with self._io_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+
+            if pending:
+                if self._log is None:
+                    self._log = open(self.log_path, 'ab')
+
+                chunks = []
+                for record in pending:
+                    packed = msgpack.packb(record, use_bin_type=True)
+                    chunks.append(RECORD.pack(len(packed)))
+                    chunks.append(packed)
+
+                self._log.write(b''.join(chunks))
+                self._log.flush()
+                os.fsync(self._log.fileno())
+                self.logged += len(pending)
+
+            if self.logged >= self.compact_every and self.source is not None:
+                self._compact()
+
+        return len(pending)
+
+    def compact(self):
+        """
+        Writes out the whole catalog as a snapshot and starts the log over. Anything queued but not written yet
+        is already in the snapshot, and is skipped when recovering.
+        """
+        with self._io_lock:
+            self._compact()
+
+    def _compact(self):
+        version, services = self.source()
+
+        # Write the new snapshot beside the old one, then swap it in, so a crash leaves one or the other.
+        temporary = self.snapshot_path + '.tmp'
+        with open(temporary, 'wb') as snapshot:
+            snapshot.write(msgpack.packb([version, services], use_bin_type=True))
+            snapshot.flush()
+            os.fsync(snapshot.fileno())
+        os.replace(temporary, self.snapshot_path)
+        self._sync_directory()
+
+        # Every record written so far is at or below the snapshot's version.
+        if self._log is not None:
+            self._log.close()
+        self._log = open(self.log_path, 'wb')
+        os.fsync(self._log.fileno())
+
+        self.logger.info(f"Compacted {self.logged} log records into a snapshot at version {version}.")
+        self.logged = 0
+
+    def _sync_directory(self):
+        # The rename only lasts once the directory is synced. Not every platform can open directories.
+        try:
+            directory = os.open(self.path, os.O_RDONLY)
+        except OSError:
+            return
+
+        try:
+            os.fsync(directory)
+        except OSError:
+            pass
+        finally:
+            os.close(directory)
+
+    def start(self):
+        """
+        Writes queued changes every flush_interval seconds on a background thread until closed.
+        """
+        self._stopped.clear()
+        self._writer = threading.Thread(target=self._write, name='catalog_journal', daemon=True)
+        self._writer.start()
+
+    def _write(self):
+        while not self._stopped.wait(self.flush_interval):
+            try:
+                self.flush()
+            except OSError:
+                self.logger.exception("Could not write to the catalog log.")
+
+    def close(self):
+        """
+        Stops the writer and writes whatever is still queued.
+        """
+        self._stopped.set()
+        if self._writer is not None:
+            self._writer.join()
+            self._writer = None
+
+        self.flush()
+
+        with self._io_lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
@@ -2,25 +2,447 @@
 
 # System modules
 import json
+import asyncio
 import time
 import struct
+import itertools
+import threading
+import zlib
 import logging
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Deque, Iterable, Tuple, Callable
+from collections import deque
 
 # Third party modules
 import zmq
-from Hermes.DBP import command_checks, commands
+import msgpack
+from Hermes.DBP import command_checks, commands, opcodes, opcode_commands
 from Hermes.zhelpers import dump
 
 # NOTE: This is an example of including zeromq sockets within the wrapper as opposed to how Heartbeats deal with events.
 # Refer to the Clone patter KVMsg for reference
 
 
+class Codec():
+    """
+    Base class for message body serializations. Each codec is identified on the wire by a single byte marker
+    frame which precedes the body so receivers can decode a message without knowing how it was sent.
+
+    Attributes
+    ----------
+    marker : bytes
+        A one byte identifier for the codec. Must be unique amongst all registered codecs.
+    name : str
+        A human readable name for the codec.
+    """
+    marker: bytes = None
+    name: str = None
+
+    def encode(self, body: Any) -> bytes:
+        raise NotImplementedError
+
+    def decode(self, frame: bytes) -> Any:
+        raise NotImplementedError
+
+
+class RawCodec(Codec):
+    """
+    Passes buffers through untouched. Strings are utf-8 encoded but everything comes back out as bytes.
+    """
+    marker = b'\x00'
+    name = 'raw'
+
+    def encode(self, body: Any) -> bytes:
+        if type(body) == str:
+            return bytes(body, 'utf-8')
+
+        # Buffers go out as they are so slices of large objects are never copied here.
+        if isinstance(body, (bytes, bytearray, memoryview)):
+            return body
+
+        # bytes() would quietly turn an int into that many zero bytes.
+        raise TypeError(f"The raw codec sends bytes-like objects and strings, not {type(body).__name__}.")
+
+    def decode(self, frame: bytes) -> bytes:
+        # Zero-copy messages hand over a memoryview which is passed along as is.
+        return frame
+
+
+class MsgPackCodec(Codec):
+    """
+    The default Hermes serialization.
+    """
+    marker = b'\x01'
+    name = 'msgpack'
+
+    def encode(self, body: Any) -> bytes:
+        return msgpack.packb(body, use_bin_type=True)
+
+    def decode(self, frame: bytes) -> Any:
+        return msgpack.unpackb(frame, raw=False)
+
+
+class JSONCodec(Codec):
+    """
+    Kept around for nodes that need human readable payloads on the wire.
+    """
+    marker = b'\x02'
+    name = 'json'
+
+    def encode(self, body: Any) -> bytes:
+        return bytes(json.dumps(body), 'utf-8')
+
+    def decode(self, frame: bytes) -> Any:
+        return json.loads(bytes(frame).decode('utf-8'))
+
+
+# Holds every known codec with its wire marker as the key.
+codecs: Dict[bytes, Codec] = {}
+
+# Every message starts with one fixed layout header frame:
+#   version (u8) | opcode (u8) | flags (u16) | time sent in epoch ns (u64) | sequence (u32)
+# The low bits of flags hold the marker of the codec the body was serialized with, the next four the marker of
+# the compressor it was squeezed with (zero for uncompressed bodies).
+PROTOCOL_VERSION = 1
+HEADER = struct.Struct('!BBHQI')
+CODEC_MASK = 0x000F
+COMPRESSOR_SHIFT = 4
+COMPRESSOR_MASK = 0x00F0
+
+# The most a compressed body may inflate to. Anything bigger is treated as an invalid envelope.
+MAX_BODY = 64 * 1024 * 1024
+
+_CODEC_MARKERS = [bytes((marker,)) for marker in range(CODEC_MASK + 1)]
+
+# Shared by every message sent from this process. next() on a count is atomic under the GIL.
+_sequence = itertools.count(1)
+
+# The number of frames ahead of the header for each kind of envelope, without any routing stack.
+ENVELOPE_FRAMES = {zmq.ROUTER: 2, zmq.DEALER: 1}
+
+# The most routing frames, such as request ids or proxy hops, a ROUTER envelope may stack between the sender's
+# identity and the delimiter.
+MAX_ROUTE = 4
+
+
+def register_codec(codec: Codec):
+    """
+    Adds a codec to the list of known codecs so that messages marked with it can be sent and decoded.
+
+    Parameters
+    ----------
+    codec : Codec
+        An instance of a Codec subclass with a unique, single byte marker.
+    """
+    if codec.marker is None or len(codec.marker) != 1 or codec.marker[0] > CODEC_MASK:
+        raise ValueError(f"Codec markers must be a single byte no larger than {CODEC_MASK}.")
+
+    if codec.marker in codecs and type(codecs[codec.marker]) != type(codec):
+        raise ValueError(
+            f"Codec marker {codec.marker} is already used by {codecs[codec.marker].name}.")
+
+    codecs[codec.marker] = codec
+
+
+for _codec in (RawCodec(), MsgPackCodec(), JSONCodec()):
+    register_codec(_codec)
+
+DEFAULT_CODEC = MsgPackCodec.marker
+
+
+class CompressionStats():
+    """
+    Running totals for a single compressor, used to tune the compression threshold.
+
+    Attributes
+    ----------
+    compressed : int
+        Bodies sent compressed.
+    skipped : int
+        Bodies over the threshold which did not get any smaller and were sent as they were.
+    bytes_in : int
+        Size of every body the compressor was tried on.
+    bytes_out : int
+        Size of those bodies as sent.
+    compress_ns : int
+        CPU time spent compressing.
+    decompressed : int
+        Bodies received compressed.
+    decompress_ns : int
+        CPU time spent decompressing.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.compressed = 0
+        self.skipped = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.compress_ns = 0
+        self.decompressed = 0
+        self.decompress_ns = 0
+
+    @property
+    def saved(self) -> int:
+        """
+        Bytes kept off of the wire.
+        """
+        return self.bytes_in - self.bytes_out
+
+    def record_compress(self, size_in: int, size_out: int, elapsed_ns: int, used: bool):
+        with self._lock:
+            if used:
+                self.compressed += 1
+            else:
+                self.skipped += 1
+            self.bytes_in += size_in
+            self.bytes_out += size_out if used else size_in
+            self.compress_ns += elapsed_ns
+
+    def record_decompress(self, elapsed_ns: int):
+        with self._lock:
+            self.decompressed += 1
+            self.decompress_ns += elapsed_ns
+
+    def as_dict(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'compressed': self.compressed,
+                'skipped': self.skipped,
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out,
+                'saved': self.bytes_in - self.bytes_out,
+                'compress_ns': self.compress_ns,
+                'decompressed': self.decompressed,
+                'decompress_ns': self.decompress_ns
+            }
+
+
+class Compressor():
+    """
+    Base class for body compression. Compressed bodies are marked in the header flags so receivers can
+    decompress them before they are decoded.
+
+    Attributes
+    ----------
+    marker : int
+        An identifier between 1 and 15 for the compressor. Zero means uncompressed.
+    name : str
+        A human readable name for the compressor.
+    stats : CompressionStats
+        Counters for everything this compressor has done in this process.
+    """
+    marker: int = None
+    name: str = None
+
+    def __init__(self):
+        self.stats = CompressionStats()
+
+    def compress(self, data: bytes) -> bytes:
+        raise NotImplementedError
+
+    def decompress(self, data: bytes, max_size: int = MAX_BODY) -> bytes:
+        """
+        Raises ValueError when the data is corrupt or would inflate to more than max_size bytes.
+        """
+        raise NotImplementedError
+
+
+class ZlibCompressor(Compressor):
+    """
+    Standard library deflate. Level 1 gets most of the savings on JSON like catalog data for a fraction of the CPU.
+    """
+    marker = 1
+    name = 'zlib'
+
+    def __init__(self, level=1):
+        super().__init__()
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        return zlib.compress(data, self.level)
+
+    def decompress(self, data: bytes, max_size: int = MAX_BODY) -> bytes:
+        decompressor = zlib.decompressobj()
+        try:
+            decompressed = decompressor.decompress(data, max_size)
+        except zlib.error as error:
+            raise ValueError(f"Corrupt zlib body: {error}") from None
+
+        if decompressor.unconsumed_tail:
+            raise ValueError(f"Compressed body inflates past {max_size} bytes.")
+        if not decompressor.eof:
+            raise ValueError("Truncated zlib body.")
+
+        return decompressed
+
+
+# Holds every known compressor with its header marker as the key.
+compressors: Dict[int, Compressor] = {}
+
+def register_compressor(compressor: Compressor):
+    """
+    Adds a compressor to the list of known compressors so that bodies can be compressed and decompressed with it.
+
+    Parameters
+    ----------
+    compressor : Compressor
+        An instance of a Compressor subclass with a unique marker between 1 and 15.
+    """
+    if compressor.marker is None or not 0 < compressor.marker <= COMPRESSOR_MASK >> COMPRESSOR_SHIFT:
+        raise ValueError("Compressor markers must be between 1 and 15.")
+
+    if compressor.marker in compressors and type(compressors[compressor.marker]) != type(compressor):
+        raise ValueError(
+            f"Compressor marker {compressor.marker} is already used by {compressors[compressor.marker].name}.")
+
+    compressors[compressor.marker] = compressor
+
+
+class Compression():
+    """
+    When and how a node compresses the bodies it sends. Nodes and reactors hand theirs to every Message they
+    make, the same way a codec is picked per send, so one node turning compression on leaves the rest of the
+    process alone. Bodies which do not shrink are sent as they were.
+
+    Attributes
+    ----------
+    threshold : int
+        The smallest encoded body, in bytes, worth compressing.
+    compressor : Compressor
+        The registered compressor to use.
+    """
+    __slots__ = ('threshold', 'compressor')
+
+    def __init__(self, threshold: int, compressor: int = ZlibCompressor.marker):
+        if compressor not in compressors:
+            raise ValueError(f"Unknown compressor {compressor}.")
+
+        self.threshold = threshold
+        self.compressor = compressors[compressor]
+
+
+register_compressor(ZlibCompressor())
+
+# Stand in for a payload which has not been decoded yet. None is a valid payload.
+_UNDECODED = object()
+
+
+def _compress(compressor: Compressor, data: bytes) -> bytes:
+    """
+    Compresses a body and records the cost. Returns None when compressing did not make it any smaller.
+    """
+    started = time.thread_time_ns()
+    compressed = compressor.compress(data)
+    elapsed = time.thread_time_ns() - started
+
+    used = len(compressed) < len(data)
+    compressor.stats.record_compress(len(data), len(compressed), elapsed, used)
+
+    return compressed if used else None
+
+
+def _decompress(compressor: Compressor, data: bytes) -> bytes:
+    started = time.thread_time_ns()
+    decompressed = compressor.decompress(data)
+    compressor.stats.record_decompress(time.thread_time_ns() - started)
+
+    return decompressed
+
+
+def _to_bytes(frame) -> bytes:
+    """
+    Small header frames are needed as hashable bytes regardless of how they were received.
+    """
+    if isinstance(frame, zmq.Frame):
+        return frame.bytes
+
+    return frame
+
+
+def _to_buffer(frame) -> memoryview:
+    """
+    Exposes a received frame without copying it. Frames received with copy=True are already bytes.
+    """
+    if isinstance(frame, zmq.Frame):
+        return frame.buffer
+
+    return frame
+
+
+def _encode(body: Any, codec: bytes, compression: Compression = None) -> Tuple[int, List[bytes]]:
+    """
+    Serializes a body and compresses it if it is over the threshold. Returns the header flags and the frames.
+    """
+    flags = codec[0]
+
+    # Raw bodies may be split over several frames to avoid joining buffers together.
+    if codec == RawCodec.marker and isinstance(body, (list, tuple)):
+        return flags, [codecs[codec].encode(part) for part in body]
+
+    encoded = [codecs[codec].encode(body)]
+
+    if compression is not None and len(encoded[0]) >= compression.threshold:
+        compressed = _compress(compression.compressor, encoded[0])
+        if compressed is not None:
+            encoded[0] = compressed
+            flags |= compression.compressor.marker << COMPRESSOR_SHIFT
+
+    return flags, encoded
+
+
+class Encoded():
+    """
+    A body which has already been serialized, and compressed if it was large enough. Sending one skips straight
+    to the header, so a reply that goes out many times only has to be encoded once.
+
+    Attributes
+    ----------
+    flags : int
+        The header flags saying how the body was encoded.
+    frames : List[bytes]
+        The body frames. Frames past the first are sent as they are.
+    """
+    __slots__ = ('flags', 'frames')
+
+    def __init__(self, flags: int, frames: List[bytes]):
+        self.flags = flags
+        self.frames = frames
+
+    def __len__(self) -> int:
+        return sum(len(frame) for frame in self.frames)
+
+    def extended(self, *frames: bytes) -> 'Encoded':
+        """
+        The same body with more frames after it. The original is left as it is.
+        """
+        return Encoded(self.flags, self.frames + list(frames))
+
+
+def encode(body: Any, codec: bytes = DEFAULT_CODEC, compression: Compression = None) -> Encoded:
+    """
+    Encodes a body ahead of time for Message.send.
+
+    Parameters
+    ----------
+    body : Any
+        The payload to encode.
+    codec : bytes, default=DEFAULT_CODEC
+        The marker of the codec with which to serialize the body.
+    compression : Compression, default=None
+        How to compress the body. Left uncompressed when None.
+
+    Returns
+    -------
+    Encoded
+    """
+    return Encoded(*_encode(body, codec, compression))
+
+
 class Message():
     """
     A class to handel all broker related messaging including asserting formats, sending, and receiving.
-    Requires a socket to pull messages off of and is capable of handeling JSON, buffers(arrays), strings
-    , pickles, and custom serializations.
+    Requires a socket to pull messages off of and is capable of handeling msgpack, JSON, raw buffers, and custom
+    serializations through the registered codecs.
 
     Attributes
     ----------
@@ -31,124 +453,414 @@ class Message():
     outgoing : List[str]
         The outgoing multi part message with the first frame containing the address or the requestor
         and a blank delimiter frame.
+    pending : List[List[bytes]]
+        Replies built with queue which have not been flushed yet.
+    outlet : Callable[[List[bytes]], Any], default=None
+        When set, outgoing frames are handed to this instead of the socket. Reactors use it so handlers running
+        on worker threads never touch a socket owned by the loop thread.
+    route : List[bytes]
+        Routing frames the sender stacked between its identity and the delimiter, such as the request id of a
+        pipelining client. Sent back ahead of every reply. None when there are none.
     valid : bool
         Used to determine if the incoming message adheres to the formating protocol
+    copy : bool, default=True
+        When False, frames are received and sent without copying and the body is a list of memoryviews
+        into zmq's buffers.
+    time : int
+        When the incoming message was sent, in nanoseconds since the epoch.
+    seq : int
+        The sequence number the sender stamped the incoming message with.
+    flags : int
+        The flags field of the incoming header.
+    codec : bytes
+        The marker of the codec used to serialize the incoming body.
+    payload : Any
+        The decoded body of the incoming message. Decoded once upon first access.
+    compression : Compression, default=None
+        How outgoing bodies are compressed. Never when None.
     """
+    # Messages are made for every request that comes through a Reactor so keep them small.
+    __slots__ = ('valid', 'socket', 'copy', 'body', 'incoming', 'incoming_raw', 'command', 'return_addr', 'route',
+                 'outgoing', 'pending', 'outlet', 'time', 'seq', 'flags', 'codec', '_payload', 'logger',
+                 'compression')
 
-    def __init__(self, socket: zmq.Socket, logger=None):
+    def __init__(self, socket: zmq.Socket, logger=None, copy=True, compression: Compression = None):
         self.valid: bool = True
         self.socket: zmq.Socket = socket
+        self.copy: bool = copy
+        self.compression: Compression = compression
 
         self.body: Any = None
         self.incoming: List[bytes] = None
+        self.incoming_raw: List[bytes] = None
         self.command: bytes = None
         self.return_addr: bytes = None
+        self.route: List[bytes] = None
         self.outgoing: List[bytes] = []
-        self.time: float = None
+        self.pending: List[List[bytes]] = None
+        self.outlet: Callable[[List[bytes]], Any] = None
+        self.time: int = None
+        self.seq: int = None
+        self.flags: int = None
+        self.codec: bytes = None
+        self._payload: Any = _UNDECODED
 
         if logger is not None:
             self.logger: logging.Logger = logger
         else:
             self.logger: logging.Logger = logging.getLogger(__name__)
 
-    def recv(self, display=False):
+    def reset(self):
+        """
+        Clears out everything from the last message so the object can be handed out again by a MessagePool.
+        The outgoing list is emptied in place to keep its storage around.
+        """
+        self.valid = True
+        self.body = None
+        self.incoming = None
+        self.incoming_raw = None
+        self.command = None
+        self.return_addr = None
+        self.route = None
+        self.outgoing.clear()
+        self.pending = None
+        self.outlet = None
+        self.time = None
+        self.seq = None
+        self.flags = None
+        self.codec = None
+        self._payload = _UNDECODED
+
+    def recv(self, display=False, block=True):
         """
         Receives the first multipart message on behalf of the polled socket, formats the outgoing
         attribute's message header, and caches the payload.
 
+        When the message was made with copy=False, frames are left in zmq's buffers and the body is
+        exposed as memoryviews over them rather than bytes.
+
         Parameters
         ----------
+        display : bool, default=False
+            A flag for displaying the incoming message frames to the console as they arrive
+        block : bool, default=True
+            When False, raises zmq.Again instead of waiting if there is nothing to receive.
         """
-        self.incoming = self.socket.recv_multipart()
-        self.incoming_raw = self.incoming.copy()  # For debugging
+        frames = self.socket.recv_multipart(0 if block else zmq.NOBLOCK, copy=self.copy)
+        self.load(frames, display=display)
 
-        # Req, Rep, and Dealer sockets already do this part. Routers must do it manually
-        if self.socket.socket_type == zmq.ROUTER:
-            # Caches the return address of the requestor
-            self.return_addr = self.incoming.pop(0)
+    def load(self, frames: List[Any], display=False):
+        """
+        Parses an already received multipart message. The header is read by index so the frame list is
+        never copied or mutated.
+
+        Parameters
+        ----------
+        frames : List[Union[bytes, zmq.Frame]]
+            The frames of a multipart message as returned by recv_multipart.
+        display : bool, default=False
+            A flag for displaying the incoming message frames to the console
+        """
+        self.incoming = frames
 
-            # Checks for blank delimiter
-            delimiter = self.incoming.pop(0)
-            if delimiter != b'':
+        # Only hold on to the untouched envelope when someone might look at it.
+        if display or self.logger.isEnabledFor(logging.DEBUG):
+            self.incoming_raw = list(frames)
+
+        index = 0
+
+        # Req and Rep sockets already do this part. Routers and Dealers must do it manually
+        envelope = self.envelope
+        if envelope == zmq.ROUTER:
+            index = 2
+            if len(frames) < 2:
                 self.valid = False
+            else:
+                # Caches the return address of the requestor
+                self.return_addr = _to_bytes(frames[0])
+
+                # Anything between the address and the blank delimiter is a routing stack to send back.
+                delimiter = 1
+                while len(frames[delimiter]) != 0 and delimiter <= MAX_ROUTE and delimiter + 1 < len(frames):
+                    delimiter += 1
+
+                if len(frames[delimiter]) != 0:
+                    self.valid = False
+                elif delimiter > 1:
+                    self.route = [_to_bytes(frame) for frame in frames[1:delimiter]]
+
+                index = delimiter + 1
+
+        elif envelope == zmq.DEALER:
+            if len(frames) < 1 or len(frames[0]) != 0:
+                self.valid = False
+
+            index = 1
+
+        if len(frames) - index >= 2 and len(frames[index]) == HEADER.size:
+            version, opcode, self.flags, self.time, self.seq = HEADER.unpack(_to_buffer(frames[index]))
 
-        if len(self.incoming) >= 3:
             # Command validity is left up to the service.
-            self.command = self.incoming.pop(0)
-            self.time = struct.unpack('f', self.incoming.pop(0))[0]
-            self.body = self.incoming
+            self.command = opcode_commands.get(opcode)
+            self.codec = _CODEC_MARKERS[self.flags & CODEC_MASK]
+            self.body = [_to_buffer(frame) for frame in frames[index + 1:]]
+
+            compressor = (self.flags & COMPRESSOR_MASK) >> COMPRESSOR_SHIFT
+            if compressor and self.body:
+                if compressor in compressors:
+                    try:
+                        self.body[0] = _decompress(compressors[compressor], self.body[0])
+                    except (zlib.error, ValueError) as error:
+                        self.logger.warning(f"Could not decompress body: {error}")
+                        self.valid = False
+                else:
+                    self.logger.warning(f"Unknown compressor {compressor}.")
+                    self.valid = False
+
+            if version != PROTOCOL_VERSION:
+                self.logger.warning(f"Unsupported protocol version {version}.")
+                self.valid = False
+
+            elif self.command is None:
+                self.logger.warning(f"Unknown opcode {opcode}.")
+                self.valid = False
+
+            elif self.codec not in codecs:
+                self.logger.warning(f"Unknown codec marker {self.codec}.")
+                self.valid = False
 
         else:
             self.valid = False
 
         if not self.valid:
             self.logger.info("Incoming message invalid. Disregarding...")
-            self.send(invalid=True)
+
+            # Only sockets answering requests can tell the sender. Anywhere else a reply would be unsolicited.
+            if envelope == zmq.REP or (envelope == zmq.ROUTER and self.return_addr is not None):
+                self.send(invalid=True)
 
         if display:
             self.display_envelope(raw=True, message=self.incoming_raw)
 
-    def send(self, command='', body='', display=False, invalid=False):
+    @property
+    def envelope(self) -> int:
+        """
+        The socket type whose envelope messages are read and written with. Normally the type of the socket
+        itself.
+        """
+        return self.socket.socket_type
+
+    @property
+    def envelope_frames(self) -> int:
+        """
+        The number of frames ahead of the header of this message, routing stack included.
+        """
+        frames = ENVELOPE_FRAMES.get(self.envelope, 0)
+        if self.route is not None:
+            frames += len(self.route)
+
+        return frames
+
+    @property
+    def payload(self) -> Any:
+        """
+        The incoming body decoded with the codec it was marked with. Decoding only happens on first access.
+        Only the first body frame is decoded, any others are left in body.
+        """
+        if self._payload is _UNDECODED:
+            if self.body is None or len(self.body) == 0:
+                return None
+
+            self._payload = codecs[self.codec].decode(self.body[0])
+
+        return self._payload
+
+    def send(self, command='', body='', display=False, invalid=False, codec: bytes = DEFAULT_CODEC):
         """
         Sends the current multipart outgoing message attribute on behalf of the polled
         socket.
 
         Parameters
         ----------
-        command: str
-            The command with which to send the message with.
+        command: bytes
+            The command with which to send the message with. Must be one of the DBP commands.
         body: Any
-            The payload for which the message will hold.
+            The payload for which the message will hold. An Encoded body is sent as it is.
         display : bool
             A flag for displaying outgoing message frames to the console as it sends
+        codec : bytes, default=DEFAULT_CODEC
+            The marker of the codec with which to serialize the body.
         """
-
-        # Outgoing message header formating. ORDER MATTERS
-        if self.socket.socket_type == zmq.ROUTER:
-            self.add_frame(self.return_addr)
-            self.add_frame('')
-
-        self.add_frame(command)
-        self.add_frame(time.time())
-
         if invalid:
-            self.add_frame("Error: Invalid Message Envelope.")
-        else:
-            self.add_frame(body)
+            body = "Error: Invalid Message Envelope."
+
+        # Whatever was sent last is already on the wire.
+        self.outgoing.clear()
+        self.compose(self.outgoing, command, body, codec)
 
         if display:
             self.display_envelope(raw=True, message=self.outgoing)
 
         self.logger.debug("Putting message on outgoing queue.")
-        self.socket.send_multipart(self.outgoing)
+        if self.outlet is not None:
+            return self.outlet(self.outgoing)
+
+        return self.socket.send_multipart(self.outgoing, copy=self.copy)
+
+    def queue(self, command='', body='', codec: bytes = DEFAULT_CODEC):
+        """
+        Builds a reply and holds on to it until flush is called. Meant for handlers which produce many replies
+        to the same requestor so they can all be put on the socket in one go.
+
+        Parameters
+        ----------
+        command: bytes
+            The command with which to send the message with. Must be one of the DBP commands.
+        body: Any
+            The payload for which the message will hold.
+        codec : bytes, default=DEFAULT_CODEC
+            The marker of the codec with which to serialize the body.
+        """
+        if self.pending is None:
+            self.pending = []
+
+        self.pending.append(self.compose([], command, body, codec))
+
+    def flush(self, display=False) -> int:
+        """
+        Sends every queued reply back to back.
+
+        Parameters
+        ----------
+        display : bool
+            A flag for displaying outgoing message frames to the console as it sends
+
+        Returns
+        -------
+        int
+            The number of messages sent.
+        """
+        if not self.pending:
+            return 0
+
+        batch, self.pending = self.pending, None
+
+        for frames in batch:
+            if display:
+                self.display_envelope(raw=True, message=frames)
+
+            if self.outlet is not None:
+                self.outlet(frames)
+            else:
+                self.socket.send_multipart(frames, copy=self.copy)
+
+        self.logger.debug(f"Flushed {len(batch)} messages to the outgoing queue.")
+        return len(batch)
+
+    def send_batch(self, replies: Iterable[Tuple[bytes, Any]], display=False, codec: bytes = DEFAULT_CODEC) -> int:
+        """
+        Queues and flushes a number of (command, body) replies at once.
+
+        Returns
+        -------
+        int
+            The number of messages sent.
+        """
+        for command, body in replies:
+            self.queue(command, body, codec)
+
+        return self.flush(display=display)
 
-    def add_frame(self, body):
+    def compose(self, frames: List[bytes], command, body, codec: bytes = DEFAULT_CODEC) -> List[bytes]:
         """
-        Converts objects to zmq frame(s) and appends it/them to the multipart outgoing message attribute.
+        Appends the envelope, header, and encoded body of an outgoing message to a frame list.
 
         Parameters
         ----------
-        body : Any
-            This is the message to append to the outgoing message attribute.
+        frames : List[bytes]
+            The list to build the message in.
+        command: bytes
+            The command with which to send the message with. Must be one of the DBP commands.
+        body: Any
+            The payload for which the message will hold. With the raw codec a list or tuple of buffers is sent
+            as one frame each.
+        codec : bytes, default=DEFAULT_CODEC
+            The marker of the codec with which to serialize the body.
+
+        Returns
+        -------
+        List[bytes]
+            The same frame list that was passed in.
         """
-        # TODO: Allow for positional placement parameters
-        # TODO: Implement with msgpack.
-        # TODO: Standardize body as json
+        if type(command) == str:
+            command = bytes(command, 'utf-8')
+
+        if command not in opcodes:
+            raise ValueError(
+                f"Unknown command {command}. Add it with DBP.register_command before sending.")
+
+        # Outgoing message header formating. ORDER MATTERS
+        self.address(frames)
 
-        if type(body) == bytes:
-            self.outgoing.append(body)
+        if isinstance(body, Encoded):
+            flags, encoded = body.flags, body.frames
+        else:
+            flags, encoded = _encode(body, codec, self.compression)
+
+        frames.append(HEADER.pack(
+            PROTOCOL_VERSION,
+            opcodes[command],
+            flags,
+            time.time_ns(),
+            next(_sequence) & 0xFFFFFFFF))
+        frames.extend(encoded)
+
+        return frames
 
-        elif type(body) == str:
-            self.outgoing.append(bytes(body, 'utf-8'))
+    def address(self, frames: List[bytes]) -> List[bytes]:
+        """
+        Appends the envelope that gets a message back to the sender of this one.
+        """
+        envelope = self.envelope
+        if envelope == zmq.ROUTER:
+            frames.append(self.return_addr)
+            if self.route is not None:
+                frames.extend(self.route)
+            frames.append(b'')
+
+        elif envelope == zmq.DEALER:
+            frames.append(b'')
+
+        return frames
+
+    def replay(self, replies: List[List[bytes]]) -> int:
+        """
+        Sends replies recorded while answering an earlier request to the sender of this one. Bodies go out as
+        they were encoded the first time, only the envelope and the header's time and sequence number are new.
+
+        Parameters
+        ----------
+        replies : List[List[bytes]]
+            The header and body frames of each reply, without their envelopes.
+
+        Returns
+        -------
+        int
+            The number of replies sent.
+        """
+        for reply in replies:
+            version, opcode, flags, _, _ = HEADER.unpack(reply[0])
 
-        elif type(body) == dict:
-            self.outgoing.append(bytes(json.dumps(body), 'utf-8'))
+            frames = self.address([])
+            frames.append(HEADER.pack(version, opcode, flags, time.time_ns(), next(_sequence) & 0xFFFFFFFF))
+            frames.extend(reply[1:])
 
-        elif type(body) == float:
-            self.outgoing.append(struct.pack('f', body))
+            if self.outlet is not None:
+                self.outlet(frames)
+            else:
+                self.socket.send_multipart(frames, copy=self.copy)
 
-        elif type(body) == int:
-            self.outgoing.append(struct.pack('i', body))
+        return len(replies)
 
     def display_envelope(self, raw=True, message: List[bytes] = None):
         """
@@ -167,4 +879,156 @@ class Message():
 
         else:
             print(
-                f"Message Frames: \n\tReturn Address:\t{self.return_addr}\n\tTime Sent:\t{self.time}\n\tCommand:\t{self.command}\n\tBody:\t\t{self.body}")
+                f"Message Frames: \n\tReturn Address:\t{self.return_addr}\n\tTime Sent:\t{self.time}\n\tSequence:\t{self.seq}\n\tCommand:\t{self.command}\n\tCodec:\t\t{self.codec}\n\tBody:\t\t{self.payload}")
+
+
+class AsyncMessage(Message):
+    """
+    A Message for zmq.asyncio sockets. recv must be awaited, send and flush return awaitables which may be
+    ignored by handlers that do not care when the message actually leaves.
+    """
+    __slots__ = ()
+
+    def reset(self):
+        # The last outgoing list may still be waiting on the socket, so it is let go of rather than cleared.
+        self.outgoing = []
+        super().reset()
+
+    async def recv(self, display=False, block=True):
+        """
+        Receives the next multipart message on behalf of the socket. See Message.recv.
+        """
+        frames = await self.socket.recv_multipart(0 if block else zmq.NOBLOCK, copy=self.copy)
+        self.load(frames, display=display)
+
+    def send(self, command='', body='', display=False, invalid=False, codec: bytes = DEFAULT_CODEC):
+        """
+        Sends a message on behalf of the socket. See Message.send.
+
+        Returns
+        -------
+        asyncio.Future
+            Resolves once zmq has taken the message.
+        """
+        if invalid:
+            body = "Error: Invalid Message Envelope."
+
+        # Sends may be held by zmq.asyncio until the socket is writable so each one gets its own frame list.
+        self.outgoing = self.compose([], command, body, codec)
+
+        if display:
+            self.display_envelope(raw=True, message=self.outgoing)
+
+        if self.outlet is not None:
+            return self.outlet(self.outgoing)
+
+        return self.socket.send_multipart(self.outgoing, copy=self.copy)
+
+    def flush(self, display=False) -> asyncio.Future:
+        """
+        Sends every queued reply back to back. See Message.flush.
+
+        Returns
+        -------
+        asyncio.Future
+            Resolves to the number of messages sent once zmq has taken all of them.
+        """
+        batch, self.pending = self.pending or [], None
+        sends = []
+
+        for frames in batch:
+            if display:
+                self.display_envelope(raw=True, message=frames)
+
+            if self.outlet is not None:
+                sent = self.outlet(frames)
+            else:
+                sent = self.socket.send_multipart(frames, copy=self.copy)
+
+            # Outlets which do not send on the socket have nothing to wait on.
+            if asyncio.isfuture(sent):
+                sends.append(sent)
+
+        async def sent():
+            await asyncio.gather(*sends)
+            return len(batch)
+
+        return asyncio.ensure_future(sent())
+
+    def send_batch(self, replies: Iterable[Tuple[bytes, Any]], display=False,
+                   codec: bytes = DEFAULT_CODEC) -> asyncio.Future:
+        for command, body in replies:
+            self.queue(command, body, codec)
+
+        return self.flush(display=display)
+
+
+class MessagePool():
+    """
+    A free list of Message objects bound to a single socket. Reactors hand these out for every incoming
+    message and take them back once the handler is done, so the hot loop stops allocating a new object and
+    frame lists for each request.
+
+    A released message must no longer be used by whoever released it.
+
+    Attributes
+    ----------
+    socket : zmq.Socket
+        The socket every pooled message will receive from and send through.
+    size : int, default=64
+        The most idle messages to hold on to. Anything released past this is left to the garbage collector.
+    message_class : type, default=Message
+        The kind of message to build.
+    compression : Compression, default=None
+        How the pooled messages compress what they send.
+    created : int
+        How many messages the pool has had to build.
+    reused : int
+        How many times an idle message was handed back out.
+    """
+
+    def __init__(self, socket: zmq.Socket, logger=None, copy=True, size=64, message_class=None,
+                 compression: Compression = None):
+        self.socket: zmq.Socket = socket
+        self.logger = logger
+        self.copy: bool = copy
+        self.compression: Compression = compression
+        self.size: int = size
+        self.message_class = message_class if message_class is not None else Message
+
+        self.created: int = 0
+        self.reused: int = 0
+
+        # deque appends and pops are atomic so handlers may release from worker threads.
+        self._free: Deque[Message] = deque()
+
+    def acquire(self) -> Message:
+        """
+        Gets an idle message or makes a new one if there are none.
+
+        Returns
+        -------
+        Message
+        """
+        try:
+            msg = self._free.pop()
+            self.reused += 1
+
+        except IndexError:
+            msg = self.message_class(self.socket, self.logger, copy=self.copy, compression=self.compression)
+            self.created += 1
+
+        return msg
+
+    def release(self, msg: Message):
+        """
+        Returns a message to the pool once it is no longer needed.
+
+        Parameters
+        ----------
+        msg : Message
+            A message previously given out by acquire.
+        """
+        if len(self._free) < self.size:
+            msg.reset()
+            self._free.append(msg)
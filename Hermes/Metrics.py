@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+
+# System modules
+import threading
+from typing import Dict, List, Any
+
+# Relative imports
+from Hermes.DBP import command_checks
+
+################################################# RESOURCES ##########################################################
+# HDR histograms: http://hdrhistogram.org/
+#######################################################################################################################
+
+# Each power of two is split into 2 ** SUB_BITS buckets, which keeps every bucket within 12.5% of its values.
+SUB_BITS = 3
+SUB_BUCKETS = 1 << SUB_BITS
+BUCKETS = (64 - SUB_BITS + 1) * SUB_BUCKETS
+
+
+def bucket_index(value: int) -> int:
+    """
+    The bucket a non-negative integer falls in. Values under 2 * SUB_BUCKETS get a bucket each.
+    """
+    shift = value.bit_length() - SUB_BITS - 1
+    if shift <= 0:
+        return value
+
+    return shift * SUB_BUCKETS + (value >> shift)
+
+
+def bucket_floor(index: int) -> int:
+    """
+    The smallest value which falls in a bucket.
+    """
+    shift = index // SUB_BUCKETS - 1
+    if shift <= 0:
+        return index
+
+    return (index - shift * SUB_BUCKETS) << shift
+
+
+class Histogram():
+    """
+    A log bucketed histogram of non-negative integers, such as durations in nanoseconds. Recording is a couple of
+    integer operations and a list increment, and memory stays fixed no matter how many values are recorded.
+
+    Attributes
+    ----------
+    count : int
+    total : int
+    max : int
+    counts : List[int]
+        The number of values in each bucket.
+    """
+    __slots__ = ('count', 'total', 'max', 'counts')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self.counts: List[int] = [0] * BUCKETS
+
+    def record(self, value: int):
+        if value < 0:
+            value = 0
+
+        self.counts[bucket_index(value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: 'Histogram'):
+        """
+        Adds another histogram's values to this one.
+        """
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        for index, count in enumerate(other.counts):
+            if count:
+                self.counts[index] += count
+
+    def percentile(self, percent: float) -> int:
+        """
+        An upper bound on the given percentile, accurate to the width of its bucket.
+        """
+        if self.count == 0:
+            return 0
+
+        rank = max(1, round(self.count * percent / 100))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bucket_floor(index + 1) - 1, self.max)
+
+        return self.max
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            'count': self.count,
+            'mean': self.total // self.count if self.count else 0,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'max': self.max,
+            # Pairs of bucket floor and count, since not every codec allows integer keys
+            'buckets': [[bucket_floor(index), count] for index, count in enumerate(self.counts) if count]
+        }
+
+
+class CommandMetrics():
+    """
+    Counters for one command.
+
+    Attributes
+    ----------
+    received : int
+        Messages taken off of a socket.
+    handled : int
+        Messages a handler has finished with, whether it failed or not.
+    errors : int
+        Handlers which raised.
+    rejected : int
+        Messages turned away for having no handler or being malformed.
+    cached : int
+        Messages answered from a reply cache without running the handler.
+    queue_wait : Histogram
+        Nanoseconds between a message being handed to the executor and its handler starting.
+    latency : Histogram
+        Nanoseconds spent in the handler.
+    """
+    __slots__ = ('received', 'handled', 'errors', 'rejected', 'cached', 'queue_wait', 'latency')
+
+    def __init__(self):
+        self.received = 0
+        self.handled = 0
+        self.errors = 0
+        self.rejected = 0
+        self.cached = 0
+        self.queue_wait = Histogram()
+        self.latency = Histogram()
+
+    def merge(self, other: 'CommandMetrics'):
+        self.received += other.received
+        self.handled += other.handled
+        self.errors += other.errors
+        self.rejected += other.rejected
+        self.cached += other.cached
+        self.queue_wait.merge(other.queue_wait)
+        self.latency.merge(other.latency)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'received': self.received,
+            'handled': self.handled,
+            'errors': self.errors,
+            'rejected': self.rejected,
+            'cached': self.cached,
+            'queue_wait_ns': self.queue_wait.as_dict(),
+            'latency_ns': self.latency.as_dict()
+        }
+
+
+class Metrics():
+    """
+    Per command counters for a Reactor. Every thread records into its own set of counters so the loop and the
+    workers never wait on each other. A lock is only taken the first time a thread records anything and when a
+    snapshot is taken, which sums every thread's counters together.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards: List[Dict[bytes, CommandMetrics]] = []
+        self._lock = threading.Lock()
+
+    def command(self, command: bytes) -> CommandMetrics:
+        """
+        The calling thread's counters for a command.
+        """
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append(shard)
+
+        metrics = shard.get(command)
+        if metrics is None:
+            metrics = shard[command] = CommandMetrics()
+
+        return metrics
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Every thread's counters summed together, keyed by command name. Counts being recorded while the snapshot
+        is taken may or may not be included.
+
+        Returns
+        -------
+        Dict[str, Dict[str, Any]]
+        """
+        totals: Dict[bytes, CommandMetrics] = {}
+
+        with self._lock:
+            shards = list(self._shards)
+
+        for shard in shards:
+            for command, metrics in list(shard.items()):
+                total = totals.get(command)
+                if total is None:
+                    total = totals[command] = CommandMetrics()
+                total.merge(metrics)
+
+        return {self.name(command): metrics.as_dict() for command, metrics in totals.items()}
+
+    @staticmethod
+    def name(command: bytes) -> str:
+        if command is None:
+            return 'invalid'
+
+        return command_checks.get(command, command.decode('utf-8', 'replace'))
@@ -2,7 +2,7 @@
 
 # System modules
 import logging
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from abc import ABC
 from uuid import uuid4
 import socket
@@ -12,6 +12,7 @@ import zmq
 
 # Relative imports
 from Hermes.Logger import Logger
+from Hermes.Message import Message, Compression
 
 
 class Node(ABC):
@@ -36,10 +37,16 @@ class Node(ABC):
     update : bool, default=False
         A flag to signify that the node needs to send a message to the broke with the new
         values.
+    compression : Compression, default=None
+        How the bodies of messages this node makes are compressed. Never when None.
     """
+    # The type of context sockets are made from. Overridden by nodes running on asyncio.
+    context_class = zmq.Context
 
-    def __init__(self, name=uuid4().hex, ip="127.0.0.1", port=5246, log_level=logging.WARNING):
+    def __init__(self, name=uuid4().hex, ip="127.0.0.1", port=5246, log_level=logging.WARNING,
+                 compression: Compression = None):
         self.name = name
+        self.compression: Compression = compression
         self.port = port
 
         # TODO: Find a way to get the actual IP address
@@ -47,10 +54,12 @@ class Node(ABC):
         self.addr = f"tcp://{ip}:{port}"
         self.update = False
 
-        self.ctx = zmq.Context()
+        self.ctx = self.context_class()
         self.poller = zmq.Poller()
         # to hold all created sockets with associated names
         self.sockets: Dict[str, zmq.Socket] = dict()
+        # to look sockets back up by name when the poller reports on them
+        self.socket_names: Dict[zmq.Socket, str] = dict()
         # to hold socket information on poll-in type sockets
         self.interfaces: Dict[str, Any] = dict()
 
@@ -119,6 +128,7 @@ class Node(ABC):
                     self.logger.debug(f"Error Code: {e}")
                     self.update = True
 
+        self.socket_names[self.sockets[name]] = name
         self.poller.register(self.sockets[name], flags=zmq.POLLIN)
 
     def discover(self, port: int = 5245, timeout=10) -> List[bytes]:
@@ -146,17 +156,25 @@ class Node(ABC):
 
         return None
 
-    def close_socket(self, name: str):
+    def close_socket(self, name: str, linger: int = None):
         """
-        Closes a socket and removes it from the sockets list.
+        Closes a socket and removes it from the sockets list and the poller.
 
         Parameters
         ----------
         name : str
             The name of the socket to close.
+        linger : int, default=None
+            Milliseconds to keep trying to send anything still queued. None waits for all of it, so sockets
+            connected to peers that have gone away should be closed with 0.
         """
-        self.sockets[name].close()
-        del self.sockets[name]
+        sock = self.sockets.pop(name)
+        del self.socket_names[sock]
+
+        if sock in self.poller:
+            self.poller.unregister(sock)
+
+        sock.close(linger=linger)
 
         # Delete if the socket was an interface
         if name in self.interfaces.keys():
@@ -164,6 +182,39 @@ class Node(ABC):
 
         self.logger.info(f"Removed Socket: {name}")
 
+    def request(self, name: str, command: bytes, body: Any = '', timeout: int = None) -> Optional[Message]:
+        """
+        Sends a request on a REQ socket and waits for the reply. A REQ socket still waiting on a reply cannot
+        be used again, so it is closed if the reply does not come in time.
+
+        Parameters
+        ----------
+        name : str
+            The name of the socket.
+        command : bytes
+            The command to send.
+        body : Any
+            The payload to send.
+        timeout : int, default=None
+            Milliseconds to wait for the reply. None waits forever.
+
+        Returns
+        -------
+        Message
+            The reply, or None if it did not come in time.
+        """
+        sock = self.sockets[name]
+        msg = Message(sock, self.logger, compression=self.compression)
+        msg.send(command=command, body=body)
+
+        if timeout is not None and not sock.poll(timeout):
+            self.logger.warning(f"No reply on {name} after {timeout}ms.")
+            self.close_socket(name, linger=0)
+            return None
+
+        msg.recv()
+        return msg
+
     def close_ctx(self):
         """
         Closes all of the sockets instances then destroys the context.
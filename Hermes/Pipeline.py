@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+
+# System modules
+import time
+import heapq
+import struct
+import asyncio
+import logging
+import itertools
+import threading
+from concurrent.futures import Future
+from typing import Dict, List, Any, Tuple
+
+# Third party modules
+import zmq
+
+# Relative imports
+from Hermes.Message import Message
+from Hermes.Reactor import ReturnPipe
+
+# Every request is sent as [request id, b'', header, body...]. Routers stack the id between the sender's identity
+# and the delimiter and send it back ahead of the reply.
+REQUEST_ID = struct.Struct('!Q')
+
+# Answered requests the deadline heap may hold on to beyond twice the ones still waiting.
+PRUNE_AFTER = 64
+
+
+class PipelinedMessage(Message):
+    """
+    A message on one of a Pipeline's DEALER sockets. Its request id goes ahead of the usual DEALER envelope.
+    """
+    __slots__ = ('request_id',)
+
+    # Composed on the caller's thread, away from the socket it goes out on.
+    envelope = zmq.DEALER
+
+    def __init__(self, socket: zmq.Socket, request_id: bytes = None, logger=None):
+        super().__init__(socket, logger)
+        self.request_id: bytes = request_id
+
+    def load(self, frames: List[Any], display=False):
+        self.request_id = bytes(frames[0]) if frames else None
+        super().load(frames[1:], display=display)
+
+    def address(self, frames: List[bytes]) -> List[bytes]:
+        frames.append(self.request_id)
+        return super().address(frames)
+
+
+class Pipeline():
+    """
+    Requests to any number of endpoints with as many in flight at once as wanted. Unlike a REQ socket, which
+    has to wait for each reply before sending again, requests go out over one DEALER socket per endpoint, each
+    tagged with its own id, and replies are matched back up by id in whatever order they come.
+
+    The sockets belong to a background thread. request may be called from any thread and hands back a future
+    which is resolved with the reply Message, or fails with TimeoutError if the reply does not come in time.
+
+    Attributes
+    ----------
+    timeout : int, default=5000
+        Milliseconds to wait for a reply when a request does not give its own timeout.
+    in_flight : int
+        Requests sent which are still waiting on a reply.
+    """
+
+    def __init__(self, timeout=5000, ctx: zmq.Context = None, logger=None, name='pipeline'):
+        self.timeout = timeout
+        self.name = name
+
+        if logger is not None:
+            self.logger: logging.Logger = logger
+        else:
+            self.logger: logging.Logger = logging.getLogger(__name__)
+
+        self._own_ctx = ctx is None
+        self.ctx = ctx if ctx is not None else zmq.Context()
+
+        # Requests are handed to the thread owning the sockets over a pipe, routed by endpoint.
+        self.pipe = ReturnPipe(self.ctx, name)
+        self.poller = zmq.Poller()
+        self.poller.register(self.pipe.pull, zmq.POLLIN)
+        self.dealers: Dict[str, zmq.Socket] = {}
+
+        # Request id to its future, and a heap of (deadline, request id) for timing them out. Both are shared
+        # with the callers' threads and only touched under the lock.
+        self._pending: Dict[bytes, Future] = {}
+        self._deadlines: List[Tuple[float, bytes]] = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=f'{name}_io', daemon=True)
+        self._thread.start()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._pending)
+
+    def request(self, addr: str, command: bytes, body: Any = '', timeout: int = None) -> Future:
+        """
+        Sends a request without waiting for the reply.
+
+        Parameters
+        ----------
+        addr : str
+            The address of the endpoint's ROUTER socket.
+        command : bytes
+            The command to send.
+        body : Any
+            The payload to send.
+        timeout : int, default=None
+            Milliseconds to wait for the reply. Defaults to the pipeline's timeout.
+
+        Returns
+        -------
+        Future
+            Resolved with the reply Message.
+        """
+        future = Future()
+        request_id = REQUEST_ID.pack(next(self._ids))
+        deadline = time.monotonic() + (timeout if timeout is not None else self.timeout) / 1000
+
+        frames = PipelinedMessage(None, request_id, self.logger).compose([], command, body)
+
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("The pipeline is closed.")
+
+            # Registered before sending so a quick reply always finds it.
+            self._pending[request_id] = future
+            heapq.heappush(self._deadlines, (deadline, request_id))
+            self.pipe.send(addr.encode('utf-8'), frames)
+
+        return future
+
+    def arequest(self, addr: str, command: bytes, body: Any = '', timeout: int = None) -> asyncio.Future:
+        """
+        The same as request but awaitable from a running asyncio loop.
+        """
+        return asyncio.wrap_future(self.request(addr, command, body, timeout))
+
+    def _run(self):
+        try:
+            while not self._closed:
+                for socket, _ in self.poller.poll(self._poll_timeout()):
+                    if socket is self.pipe.pull:
+                        self._send()
+                    else:
+                        self._receive(socket)
+
+                self._expire()
+
+        finally:
+            for dealer in self.dealers.values():
+                dealer.close(linger=0)
+
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                self._deadlines = []
+            for future in pending.values():
+                _settle(future, error=RuntimeError("The pipeline was closed."))
+
+    def _poll_timeout(self) -> int:
+        with self._lock:
+            deadline = self._next_deadline()
+
+        if deadline is None:
+            return None
+
+        return max(0, int((deadline - time.monotonic()) * 1000) + 1)
+
+    def _next_deadline(self) -> float:
+        """
+        The deadline of the oldest request still waiting on a reply. Answered requests at the top of the heap
+        are dropped on the way. Must be called with the lock held.
+        """
+        while self._deadlines and self._deadlines[0][1] not in self._pending:
+            heapq.heappop(self._deadlines)
+
+        return self._deadlines[0][0] if self._deadlines else None
+
+    def _send(self):
+        while True:
+            try:
+                frames = self.pipe.pull.recv_multipart(zmq.NOBLOCK)
+            except zmq.Again:
+                return
+
+            # Empty routes only wake the thread up.
+            if not frames[0]:
+                continue
+
+            addr = frames[0].decode('utf-8')
+            dealer = self.dealers.get(addr)
+            if dealer is None:
+                dealer = self.dealers[addr] = self.ctx.socket(zmq.DEALER)
+                dealer.connect(addr)
+                self.poller.register(dealer, zmq.POLLIN)
+
+            dealer.send_multipart(frames[1:])
+
+    def _receive(self, dealer: zmq.Socket):
+        while True:
+            try:
+                frames = dealer.recv_multipart(zmq.NOBLOCK)
+            except zmq.Again:
+                return
+
+            msg = PipelinedMessage(dealer, logger=self.logger)
+            msg.load(frames)
+
+            with self._lock:
+                future = self._pending.pop(msg.request_id, None)
+
+                # Answered requests are only taken off the heap when they reach the top, so it is rebuilt
+                # whenever they come to outnumber the ones still waiting.
+                if len(self._deadlines) > 2 * len(self._pending) + PRUNE_AFTER:
+                    self._deadlines = [entry for entry in self._deadlines if entry[1] in self._pending]
+                    heapq.heapify(self._deadlines)
+
+            if future is None:
+                self.logger.debug("Dropped a reply to a request which already timed out.")
+                continue
+
+            _settle(future, msg)
+
+    def _expire(self):
+        now = time.monotonic()
+        expired = []
+
+        with self._lock:
+            while self._deadlines and self._deadlines[0][0] <= now:
+                _, request_id = heapq.heappop(self._deadlines)
+                future = self._pending.pop(request_id, None)
+
+                # Already answered
+                if future is not None:
+                    expired.append((request_id, future))
+
+        for request_id, future in expired:
+            _settle(future, error=TimeoutError(f"No reply to request {REQUEST_ID.unpack(request_id)[0]}."))
+
+    def close(self):
+        """
+        Stops the background thread and fails any requests still waiting on replies.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self.pipe.wake()
+
+        self._thread.join()
+        self.pipe.pull.close(linger=0)
+
+        if self._own_ctx:
+            self.ctx.destroy(linger=0)
+
+
+def _settle(future: Future, result: Any = None, error: Exception = None):
+    """
+    Resolves a request's future unless whoever made it has cancelled it, such as by wrapping an arequest in
+    asyncio.wait_for. Resolving a cancelled future would raise and take the IO thread down.
+    """
+    if not future.set_running_or_notify_cancel():
+        return
+
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
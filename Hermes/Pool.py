@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+
+# System modules
+import time
+from collections import OrderedDict
+from typing import Callable
+
+# Third party modules
+import zmq
+
+
+class ConnectionPool():
+    """
+    Sockets to remote endpoints kept open between requests, one per address, so talking to a service again skips
+    the connect. The pool is bounded: the socket used longest ago is closed to make room for a new endpoint, and
+    sockets left unused for longer than idle seconds are closed the next time the pool is used.
+
+    Sockets are made and closed through the node so they are always in its sockets dict and poller, or in
+    neither. The node may close a pooled socket itself, such as a REQ socket that timed out, and the pool opens
+    a fresh one the next time the address is asked for.
+
+    Attributes
+    ----------
+    node : Node
+        The node whose sockets are pooled.
+    socket_type : int, default=zmq.REQ
+        The type of socket to open to each endpoint.
+    max_size : int, default=16
+        The most sockets to keep open at once.
+    idle : float, default=60.0
+        Seconds a socket may go unused before it is closed. None keeps them until they are pushed out.
+    opened : int
+        Sockets opened over the pool's life. Reuse shows as requests going up while this does not.
+    """
+
+    def __init__(self, node, socket_type=zmq.REQ, max_size=16, idle=60.0, prefix='pool',
+                 clock: Callable[[], float] = time.monotonic):
+        if max_size < 1:
+            raise ValueError("Connection pools need room for at least one socket.")
+
+        self.node = node
+        self.socket_type = socket_type
+        self.max_size = max_size
+        self.idle = idle
+        self.prefix = prefix
+        self.clock = clock
+        self.opened = 0
+
+        # Address to when it was last used, oldest first
+        self._used: 'OrderedDict[str, float]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._used)
+
+    def __contains__(self, addr: str) -> bool:
+        return addr in self._used and self.name(addr) in self.node.sockets
+
+    def name(self, addr: str) -> str:
+        """
+        The name the socket to an address goes by in the node's sockets.
+        """
+        return f'{self.prefix}->{addr}'
+
+    def connect(self, addr: str) -> str:
+        """
+        Gets the socket to an address, opening one if there is none.
+
+        Returns
+        -------
+        str
+            The socket's name, for Node.request and friends.
+        """
+        self.reap()
+
+        name = self.name(addr)
+        if addr in self._used and name in self.node.sockets:
+            self._used[addr] = self.clock()
+            self._used.move_to_end(addr)
+            return name
+
+        # The node closed it, or it was never opened.
+        self._used.pop(addr, None)
+        while len(self._used) >= self.max_size:
+            oldest = next(iter(self._used))
+            self.node.logger.debug(f"Connection pool is full. Closing {oldest}.")
+            self.discard(oldest)
+
+        self.node.new_socket(name, self.socket_type, addr)
+        self._used[addr] = self.clock()
+        self.opened += 1
+
+        return name
+
+    def discard(self, addr: str):
+        """
+        Closes the socket to an address, such as after its endpoint stopped answering.
+        """
+        self._used.pop(addr, None)
+
+        name = self.name(addr)
+        if name in self.node.sockets:
+            self.node.close_socket(name, linger=0)
+
+    def reap(self) -> int:
+        """
+        Closes every socket which has gone unused for too long.
+
+        Returns
+        -------
+        int
+            The number of sockets closed.
+        """
+        if self.idle is None:
+            return 0
+
+        reaped = 0
+        cutoff = self.clock() - self.idle
+
+        # Oldest first, so stop at the first one still in use.
+        while self._used:
+            addr, used = next(iter(self._used.items()))
+            if used > cutoff:
+                break
+
+            self.discard(addr)
+            reaped += 1
+
+        return reaped
+
+    def close(self):
+        """
+        Closes every pooled socket.
+        """
+        for addr in list(self._used):
+            self.discard(addr)
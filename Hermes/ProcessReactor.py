@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+
+# System modules
+import os
+import signal
+import logging
+import tempfile
+import multiprocessing
+from collections import deque
+from functools import partial
+from typing import Dict, List, Any, Callable, Deque, Set, Tuple
+from uuid import uuid4
+
+# Third party modules
+import zmq
+
+# Relative imports
+from Hermes.Reactor import Reactor
+from Hermes.Message import Message, Compression, HEADER, ENVELOPE_FRAMES
+from Hermes.DBP import commands, opcodes, opcode_commands
+
+################################################# RESOURCES ##########################################################
+# Least recently used routing: http://zguide.zeromq.org/page:all#A-Load-Balancing-Message-Broker
+#######################################################################################################################
+
+# Single frame messages from workers to the front end. Anything longer is a reply to relay.
+READY = b'\x01'
+STOP = b'\x00'
+
+
+class WorkerMessage(Message):
+    """
+    A request handed to a worker process. It reaches the worker's DEALER still wrapped in the envelope of the
+    front end socket it came in on, so it is read and answered as if it were on that socket.
+    """
+    __slots__ = ('envelope',)
+
+    def __init__(self, socket: zmq.Socket, envelope: int, logger=None, copy=True, compression: Compression = None):
+        super().__init__(socket, logger, copy=copy, compression=compression)
+        self.envelope: int = envelope
+
+
+def _reply(socket: zmq.Socket, route: bytes, frames: List[bytes]):
+    socket.send(route, zmq.SNDMORE)
+    socket.send_multipart(frames, copy=False)
+
+
+def work(address: str, identity: bytes, handlers: Dict[bytes, Callable[..., Message]], envelopes: Dict[bytes, int],
+         logger: logging.Logger, compression: Compression = None):
+    """
+    The loop each worker process runs. Takes one request at a time from the front end, hands it to its handler,
+    and tells the front end it is ready for another once the handler returns.
+
+    Parameters
+    ----------
+    address : str
+        The front end's backend endpoint.
+    identity : bytes
+        The name the front end knows this worker by.
+    handlers : Dict[bytes, Callable]
+        The message handlers to run, keyed by command.
+    envelopes : Dict[bytes, int]
+        The socket type of each front end socket, keyed by route.
+    logger : logging.Logger
+    compression : Compression, default=None
+        How replies are compressed.
+    """
+    # Interrupts go to the front end, which decides when its workers stop.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    ctx = zmq.Context()
+    socket = ctx.socket(zmq.DEALER)
+    socket.setsockopt(zmq.IDENTITY, identity)
+    socket.connect(address)
+    socket.send(READY)
+
+    try:
+        while True:
+            frames = socket.recv_multipart(copy=False)
+            if len(frames) == 1:
+                break
+
+            route = frames[0].bytes
+            msg = WorkerMessage(socket, envelopes[route], logger, compression=compression)
+            msg.outlet = partial(_reply, socket, route)
+            msg.load(frames[1:])
+
+            if msg.valid:
+                handler = handlers.get(msg.command)
+                if handler is None:
+                    msg.send(
+                        command=commands['Denied'],
+                        body="Error: Invalid command type. Please register command callback with the server.")
+                else:
+                    try:
+                        handler(msg)
+                    except Exception:
+                        logger.exception(f"Handler for {msg.command} failed.")
+
+            socket.send(READY)
+
+    finally:
+        ctx.destroy(linger=1000)
+
+
+class ProcessReactor(Reactor):
+    """
+    A Reactor which runs its message handlers in a pool of worker processes instead of threads so CPU bound
+    handlers are not held to one core by the GIL. The front end sockets are still polled here, but requests are
+    passed along untouched to whichever worker has been waiting the longest and the workers' replies are relayed
+    back out the socket the request came in on.
+
+    Workers are forked when the reactor starts so handlers are declared the same way as on a Reactor, closures and
+    all. Anything a handler changes is only changed in the worker that ran it. For the same reason the front end
+    can only count the messages it passes along, not time the handlers, and reply caches are not used.
+
+    Attributes
+    ----------
+    processes : int, default=os.cpu_count()
+        The number of worker processes.
+    backend : zmq.Socket
+        The ROUTER the workers connect to over ipc.
+    ready : Deque[bytes]
+        The identities of idle workers, least recently used first.
+    joined : Set[bytes]
+        The identities of every worker which has reported in.
+    assigned : Dict[bytes, Tuple[bytes, List[zmq.Frame]]]
+        The route and frames of the request each busy worker is handling. Requests held by a worker which dies
+        are answered with Denied and the worker is replaced.
+    replaced : int
+        The number of workers which died and were forked again.
+    """
+    # Commands handled by the front end itself rather than a worker.
+    local_commands = {commands['Exit'], commands['Stats']}
+
+    def __init__(self, socs: Dict[str, zmq.Socket], timers: Dict[str, Dict[str, Any]] = None, msg_handlers: Dict[bytes, Callable[..., Message]] = None, name=f'{uuid4().hex}_process_reactor', log_level=logging.WARN, batch_size=64, processes: int = None, lanes: Dict[str, Dict[str, int]] = None, compression: Compression = None):
+        super().__init__(socs, timers=timers, msg_handlers=msg_handlers, name=name, log_level=log_level,
+                         batch_size=batch_size, lanes=lanes, compression=compression)
+
+        self.processes: int = processes if processes is not None else os.cpu_count()
+        self.ready: Deque[bytes] = deque()
+        self.children: Dict[bytes, multiprocessing.Process] = {}
+        self.joined: Set[bytes] = set()
+        self.assigned: Dict[bytes, Tuple[bytes, List[zmq.Frame]]] = {}
+        self.replaced: int = 0
+        self._worker_args: Tuple = None
+        self._forked: int = 0
+
+        # ipc paths are capped at around 100 characters so the reactor name is left out.
+        self.backend_addr = f'ipc://{tempfile.gettempdir()}/hermes-{uuid4().hex}.ipc'
+        self.backend: zmq.Socket = self.ctx.socket(zmq.ROUTER)
+        self.backend.bind(self.backend_addr)
+        self.poller.register(self.backend, flags=zmq.POLLIN)
+        self.readers[self.backend] = self.collect
+
+        self._local_opcodes = {opcodes[command] for command in self.local_commands}
+
+    def start(self, display_incoming=False):
+        """
+        Forks the workers and then runs the front end until it is stopped.
+        """
+        self.spawn()
+        super().start(display_incoming=display_incoming)
+
+    def spawn(self):
+        """
+        Starts the worker processes. They announce themselves to the front end once they are connected.
+        """
+        handlers = {command: handler for command, handler in self.msg_handlers.items()
+                    if command not in self.local_commands}
+        envelopes = {bytes(name, 'utf-8'): socket.socket_type for name, socket in self.sockets.items()}
+        self._worker_args = (handlers, envelopes)
+
+        for _ in range(self.processes):
+            self.fork()
+
+        self.logger.info(f"Started {self.processes} workers.")
+
+    def fork(self) -> bytes:
+        """
+        Starts one worker process and watches for it exiting.
+
+        Returns
+        -------
+        bytes
+            The identity of the new worker.
+        """
+        handlers, envelopes = self._worker_args
+        identity = uuid4().bytes
+        process = multiprocessing.get_context('fork').Process(
+            target=work,
+            args=(self.backend_addr, identity, handlers, envelopes, self.logger, self.compression),
+            name=f'{self.name}_worker_{self._forked}',
+            daemon=True)
+        process.start()
+
+        self._forked += 1
+        self.children[identity] = process
+
+        # The sentinel becomes readable once the process has exited, so the poller notices deaths right away.
+        self.poller.register(process.sentinel, zmq.POLLIN)
+        self.readers[process.sentinel] = partial(self.replace, identity)
+
+        return identity
+
+    def replace(self, identity: bytes):
+        """
+        Cleans up after a worker which exited, fails the request it was handling, and forks another in its place.
+        """
+        process = self.children.pop(identity)
+        self.poller.unregister(process.sentinel)
+        del self.readers[process.sentinel]
+        process.join()
+
+        self.joined.discard(identity)
+        if identity in self.ready:
+            self.ready.remove(identity)
+
+        self.logger.error(f"Worker {process.name} exited with {process.exitcode}.")
+
+        # Anything it finished before exiting goes out first so the request is not answered twice.
+        self.collect(limit=None)
+        assigned = self.assigned.pop(identity, None)
+        if assigned is not None:
+            route, frames = assigned
+            msg = self.message_class(self.routes[route], self.logger, compression=self.compression)
+            msg.load(frames)
+            if msg.valid:
+                msg.send(command=commands['Denied'], body="Error: The worker handling the request died.")
+
+        if self.continue_loop:
+            self.fork()
+            self.replaced += 1
+
+    def drain(self, soc_name: str, executor=None, display_incoming=False) -> int:
+        """
+        Passes up to the socket's quota of requests on to idle workers without decoding them. Reading stops
+        once every worker is busy and starts again when one reports back.
+
+        Parameters
+        ----------
+        soc_name : str
+            The name of the socket with messages waiting.
+        executor : ThreadPoolExecutor
+            Unused. Kept so the front end can be driven like a Reactor.
+        display_incoming : bool, default=False
+            A flag for displaying messages handled by the front end itself.
+
+        Returns
+        -------
+        int
+            The number of messages taken off of the socket.
+        """
+        socket = self.sockets[soc_name]
+        route = bytes(soc_name, 'utf-8')
+        header = ENVELOPE_FRAMES.get(socket.socket_type, 0)
+        lane = self.lanes[soc_name]
+        received = 0
+
+        while received < lane.quota:
+            if not self.ready:
+                self.pause()
+                break
+
+            try:
+                frames = socket.recv_multipart(zmq.NOBLOCK, copy=False)
+            except zmq.Again:
+                break
+
+            received += 1
+
+            if len(frames) > header and len(frames[header]) == HEADER.size:
+                opcode = frames[header].buffer[1]
+                self.metrics.command(opcode_commands.get(opcode)).received += 1
+
+                if opcode in self._local_opcodes:
+                    msg = self.message_class(socket, self.logger, compression=self.compression)
+                    msg.load(frames, display=display_incoming)
+                    if msg.valid:
+                        self.msg_handlers[msg.command](msg)
+                    continue
+
+            identity = self.ready.popleft()
+            self.assigned[identity] = (route, frames)
+            self.backend.send(identity, zmq.SNDMORE)
+            self.backend.send(route, zmq.SNDMORE)
+            self.backend.send_multipart(frames, copy=False)
+
+        lane.record(received)
+        return received
+
+    def collect(self, limit: int = None):
+        """
+        Relays the workers' replies out to the requesters and puts workers which have finished back in line.
+
+        Parameters
+        ----------
+        limit : int, default=batch_size
+            The most messages to take off of the backend before going back to the poller. None takes everything
+            waiting.
+        """
+        collected = 0
+
+        while limit is None or collected < (limit or self.batch_size):
+            try:
+                frames = self.backend.recv_multipart(zmq.NOBLOCK, copy=False)
+            except zmq.Again:
+                break
+
+            collected += 1
+
+            if len(frames) == 2:
+                identity = frames[0].bytes
+                self.assigned.pop(identity, None)
+                self.ready.append(identity)
+                self.joined.add(identity)
+            else:
+                self.routes[frames[1].bytes].send_multipart(frames[2:], copy=False)
+
+        if self._paused and self.ready:
+            self.resume()
+
+    def shutdown(self):
+        """
+        Tells the workers to stop, relays anything they finished on the way out, and closes everything.
+        """
+        # Workers which never reported in have nothing to finish and would not get the message.
+        for identity, process in self.children.items():
+            if identity in self.joined:
+                self.backend.send_multipart([identity, STOP])
+            else:
+                process.terminate()
+
+        for process in self.children.values():
+            process.join(5)
+            if process.is_alive():
+                self.logger.warning(f"Worker {process.name} did not stop. Terminating.")
+                process.terminate()
+
+        if self.children:
+            self.collect(limit=None)
+
+        for process in self.children.values():
+            self.poller.unregister(process.sentinel)
+            self.readers.pop(process.sentinel, None)
+
+        self.children.clear()
+        self.joined.clear()
+        self.ready.clear()
+        self.assigned.clear()
+        super().shutdown()
+
+
+if __name__ == "__main__":
+    print("Shalom, World!")
+
+    def respond(msg: Message):
+        msg.send(command=commands['Acknowledged'], body=f'Sup from {os.getpid()}.')
+
+    test = ProcessReactor(socs={'router': zmq.ROUTER})
+    test.add_msg_handler(command=b'<3', closure=respond)
+    test.start()
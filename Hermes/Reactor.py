@@ -1,20 +1,136 @@
 #!/usr/bin/env python3
 
 # System modules
+import time
 import logging
 from typing import Dict, List, Any, Callable
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, Future
+from functools import partial
 from uuid import uuid4
 import signal
+import threading
+from collections import deque
 
 # Third party modules
 import zmq
 
 # Relative imports
 from Hermes.Node import Node
-from Hermes.Message import Message
+from Hermes.Message import Message, MessagePool, Compression, compressors
+from Hermes.Metrics import Metrics
+from Hermes.Cache import ReplyCache, Recorder
 from Hermes.DBP import commands, command_checks
-from Hermes.Timer import ProgramKilled, PeriodicEvent, signal_handler
+from Hermes.Timer import ProgramKilled, TimerQueue, ScheduledTimer, FIXED_RATE, FIXED_DELAY, signal_handler
+
+
+class ReturnPipe():
+    """
+    Carries replies built on worker threads back to the loop thread. ZMQ sockets are not thread safe, so instead
+    of handlers sending on the sockets the loop is polling, each worker thread pushes its replies over its own
+    inproc PUSH socket to a PULL socket the loop polls and relays from.
+
+    Every message on the pipe starts with a route frame naming the socket the rest of the frames go out on. An
+    empty route carries nothing and only wakes the loop up.
+
+    Attributes
+    ----------
+    address : str
+        The inproc endpoint of the pipe.
+    pull : zmq.Socket
+        The loop thread's end of the pipe.
+    """
+
+    def __init__(self, ctx: zmq.Context, name: str):
+        self.address = f'inproc://{name}-{uuid4().hex}-return'
+        self.pull: zmq.Socket = ctx.socket(zmq.PULL)
+        self.pull.bind(self.address)
+
+        self._ctx = ctx
+        self._local = threading.local()
+
+    def _push(self) -> zmq.Socket:
+        """
+        The calling thread's end of the pipe. Made the first time a thread uses it.
+        """
+        push = getattr(self._local, 'push', None)
+        if push is None:
+            push = self._ctx.socket(zmq.PUSH)
+            push.connect(self.address)
+            self._local.push = push
+
+        return push
+
+    def send(self, route: bytes, frames: List[bytes]):
+        """
+        Pushes a multipart message for the loop to send on the socket named by route.
+        """
+        push = self._push()
+        push.send(route, zmq.SNDMORE)
+        push.send_multipart(frames, copy=False)
+
+    def wake(self):
+        """
+        Gets the loop's attention without sending anything.
+        """
+        self._push().send(b'')
+
+
+class Lane():
+    """
+    How a Reactor schedules one of its sockets, and how that has gone so far. Every time the poller wakes up, the
+    ready sockets are worked through from the highest priority down and each is read from at most quota times, so
+    a flood on a bulk socket can only hold control traffic up by one quota's worth of messages.
+
+    ZMQ does not say how many messages are queued on a socket, so depth is the number taken off of it the last
+    time it was serviced and backlogged counts the times the quota ran out before the socket did.
+
+    Attributes
+    ----------
+    name : str
+    priority : int
+        Higher priority sockets are read first.
+    quota : int
+        The most messages to take off of the socket per wake up.
+    serviced : int
+        Wake ups in which the socket was read from.
+    received : int
+        Messages taken off of the socket.
+    depth : int
+        Messages taken off of the socket the last time it was serviced.
+    peak : int
+        The most messages taken off of the socket in one service.
+    backlogged : int
+        Services which ended with the quota used up.
+    """
+    __slots__ = ('name', 'priority', 'quota', 'serviced', 'received', 'depth', 'peak', 'backlogged')
+
+    def __init__(self, name: str, priority=0, quota=64):
+        if quota < 1:
+            raise ValueError("Lanes need a quota of at least one message.")
+
+        self.name = name
+        self.priority = priority
+        self.quota = quota
+        self.serviced = 0
+        self.received = 0
+        self.depth = 0
+        self.peak = 0
+        self.backlogged = 0
+
+    def record(self, received: int):
+        """
+        Counts one service of the socket.
+        """
+        self.serviced += 1
+        self.received += received
+        self.depth = received
+        if received > self.peak:
+            self.peak = received
+        if received >= self.quota:
+            self.backlogged += 1
+
+    def as_dict(self) -> Dict[str, int]:
+        return {slot: getattr(self, slot) for slot in self.__slots__ if slot != 'name'}
 
 
 class Reactor(Node):
@@ -22,27 +138,84 @@ class Reactor(Node):
     A zmq ROUTER extension to provide an eventloop and persistant interface for services. Includes a command registering
     method for users to define new message and callbacks pairs.
     """
+    # The kind of message built for everything received.
+    message_class = Message
 
-    def __init__(self, socs: Dict[str, zmq.Socket], timers: Dict[str, Dict[str, Any]] = None, msg_handlers: Dict[bytes, Callable[..., Message]] = None, name=f'{uuid4().hex}_reactor', log_level=logging.WARN):
-        super().__init__(name=name, log_level=log_level)
+    def __init__(self, socs: Dict[str, zmq.Socket], timers: Dict[str, Dict[str, Any]] = None, msg_handlers: Dict[bytes, Callable[..., Message]] = None, name=f'{uuid4().hex}_reactor', log_level=logging.WARN, zero_copy=False, pool_size=0, batch_size=64, workers=100, max_in_flight=1000, lanes: Dict[str, Dict[str, int]] = None, compression: Compression = None):
+        super().__init__(name=name, log_level=log_level, compression=compression)
 
         self.continue_loop: bool = True
 
+        # Sockets polled alongside the named ones which are read by something other than drain.
+        self.readers: Dict[zmq.Socket, Callable[[], Any]] = {}
+
+        # Work other threads need done on the loop thread, run whenever the return pipe is relayed.
+        self._callbacks: deque = deque()
+
+        # Replies from handlers come back to the loop thread through here. Routes are kept per socket so
+        # nothing has to be built for each message.
+        self.return_pipe: ReturnPipe = self.new_return_pipe()
+        self.outlets: Dict[str, Callable[[List[bytes]], Any]] = {}
+        self.routes: Dict[bytes, zmq.Socket] = {}
+
+        # Threads to run handlers on and the most handlers allowed to be running or waiting to run. Sockets are
+        # not read from while the limit is reached.
+        self.workers: int = workers
+        self.max_in_flight: int = max_in_flight
+        self._slots = threading.BoundedSemaphore(max_in_flight) if max_in_flight is not None else None
+        self._paused: bool = False
+        self._running: bool = False
+        self._loop_thread: threading.Thread = None
+
+        # Held while waking the loop so it cannot close the context under a stop from another thread.
+        self._stopping = threading.Lock()
+
+        # The most messages to take off of one socket before polling again, unless its lane says otherwise
+        self.batch_size: int = batch_size
+
+        # Per socket priorities and quotas. Sockets which are not lanes, like the return pipe, always go first.
+        self.lanes: Dict[str, Lane] = {}
+        self._ranks: Dict[zmq.Socket, int] = {}
+
+        # Receives messages without copying frames out of zmq's buffers
+        self.zero_copy: bool = zero_copy
+
+        # Per socket free lists of messages. Left empty when pool_size is 0.
+        self.pool_size: int = pool_size
+        self.pools: Dict[str, MessagePool] = {}
+
         # Holds the functions for message handlers.
         # TODO: Add wild card options for commands
         self.msg_handlers: Dict[bytes, Callable[..., Message]] = {}
-        self.timers: Dict[str, int] = {}
+
+        # Per command counters and timings, reported in reply to Stats messages
+        self.metrics: Metrics = Metrics()
+
+        # Remembered replies for handlers that only look things up
+        self.caches: Dict[bytes, ReplyCache] = {}
+
+        # Timers run on the loop thread, which sleeps in poll only until the next one is due.
+        self.timers: TimerQueue = TimerQueue()
+        self._executor: ThreadPoolExecutor = None
 
         # Sets up sockets on which to poll over
         if socs is not None:
             for soc_name, soc_type in socs.items():
                 self.new_socket(soc_name, soc_type)
 
+        if lanes is not None:
+            for soc_name, lane in lanes.items():
+                self.set_lane(soc_name, **lane)
+
         # Adds any msg_handlers passed in
         if msg_handlers is not None:
             for cmd, closure in msg_handlers.items():
                 self.add_msg_handler(cmd, closure)
 
+        # Every node can be asked how it is doing
+        if commands['Stats'] not in self.msg_handlers:
+            self.add_msg_handler(commands['Stats'], self.send_stats)
+
         # Initiates timer objects for periodic callbacks
         if timers is not None:
             for timer_name, timer_obj in timers.items():
@@ -51,51 +224,425 @@ class Reactor(Node):
                     timer_obj['interval'],
                     timer_obj['callback'],
                     *timer_obj['args'],
+                    mode=timer_obj.get('mode', FIXED_RATE),
+                    executor=timer_obj.get('executor', False),
                     **timer_obj['kwargs'])
 
+    def new_socket(self, name, type, addr=None, soc_options=None):
+        """
+        Makes a new socket as Node does, gives it a route back from the worker threads, and gives it a
+        message pool if pooling is turned on.
+        """
+        super().new_socket(name, type, addr=addr, soc_options=soc_options)
+
+        if self.return_pipe is not None:
+            route = bytes(name, 'utf-8')
+            self.routes[route] = self.sockets[name]
+            self.outlets[name] = partial(self.return_pipe.send, route)
+
+        self.lanes[name] = Lane(name, quota=self.batch_size)
+        self._rank_lanes()
+
+        if self.pool_size > 0:
+            self.pools[name] = MessagePool(
+                self.sockets[name], self.logger, copy=not self.zero_copy, size=self.pool_size,
+                message_class=self.message_class, compression=self.compression)
+
+    def set_lane(self, name: str, priority: int = None, quota: int = None):
+        """
+        Changes how a socket is scheduled.
+
+        Parameters
+        ----------
+        name : str
+            The name of the socket.
+        priority : int, default=unchanged
+            Ready sockets are read from in order of priority, highest first. Sockets start at 0.
+        quota : int, default=unchanged
+            The most messages to take off of the socket each time it is read from. Sockets start at batch_size.
+        """
+        lane = self.lanes[name]
+        if quota is not None:
+            if quota < 1:
+                raise ValueError("Lanes need a quota of at least one message.")
+            lane.quota = quota
+
+        if priority is not None:
+            lane.priority = priority
+            self._rank_lanes()
+
+    def _rank_lanes(self):
+        # Ties keep the order the sockets were made in.
+        ordered = sorted(self.lanes.values(), key=lambda lane: -lane.priority)
+        self._ranks = {self.sockets[lane.name]: rank for rank, lane in enumerate(ordered)}
+
+    def _rank(self, event) -> int:
+        return self._ranks.get(event[0], -1)
+
+    def lane_stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        The schedule and counters of every socket.
+        """
+        return {name: lane.as_dict() for name, lane in self.lanes.items()}
+
     def start(self, display_incoming=False):
         """
         Begins the eventloop, polls on each registered socket, and passes incoming
         messages off to a child thread.
         """
-        # Used to catch Ctl-C and Ctl-Z signal interupts
-        signal.signal(signal.SIGTERM, signal_handler)
-        signal.signal(signal.SIGINT, signal_handler)
+        # Used to catch Ctl-C and Ctl-Z signal interupts. Signals can only be caught on the main thread.
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, signal_handler)
+            signal.signal(signal.SIGINT, signal_handler)
 
         self.add_msg_handler(commands['Exit'], self.stop)
         self.logger.info("Beginning Reactor...")
 
-        for timer in self.timers.values():
-            timer.start()
+        self._running = True
+        self._loop_thread = threading.current_thread()
+        executor = self._executor = ThreadPoolExecutor(max_workers=self.workers)
+
+        try:
+            while self.continue_loop:
+
+                ####################### Incoming Message ####################
+                # Checks to see if there are events on any created sockets. Gives up in time for the next timer.
+                events = self.poller.poll(self.timers.poll_timeout())
+                if len(events) > 1:
+                    events.sort(key=self._rank)
+
+                for soc_obj, _ in events:
+                    reader = self.readers.get(soc_obj)
+                    if reader is not None:
+                        reader()
+                        continue
+
+                    soc_name = self.socket_names.get(soc_obj)
+                    if soc_name is not None and not self._paused:
+                        self.logger.info(f"Messages on {soc_name}.")
+                        self.drain(soc_name, executor, display_incoming)
+
+                ########################### Timers ##########################
+                self.run_timers()
+
+        except ProgramKilled:
+            self.stop()
+
+        finally:
+            # Whatever the handlers still have to say goes out before the sockets are closed.
+            executor.shutdown(wait=True)
+            self.relay(limit=None)
+            with self._stopping:
+                self._running = False
+            self.shutdown()
+
+    def run_timers(self) -> int:
+        """
+        Runs every timer that is due. Callbacks run on the loop thread unless the timer was added with
+        executor=True, in which case they are handed to the worker threads and a tick is skipped if the last run
+        has not finished.
+
+        Returns
+        -------
+        int
+            The number of timers that were due.
+        """
+        timers = self.timers.due()
+
+        for timer in timers:
+            if not timer.executor:
+                try:
+                    timer()
+                except Exception:
+                    self.logger.exception(f"Timer {timer.name} failed.")
+
+                self.timers.reschedule(timer)
+
+            elif timer.running:
+                self.logger.debug(f"Timer {timer.name} is still running. Skipping a tick.")
+
+            else:
+                timer.running = True
+                future = self._executor.submit(timer)
+                future.add_done_callback(partial(self._timer_finished, timer))
+
+        return len(timers)
+
+    def _timer_finished(self, timer: ScheduledTimer, future: Future):
+        """
+        Called on the worker thread once a timer handed to the executor has run.
+        """
+        timer.running = False
+        if future.exception() is not None:
+            self.logger.error(f"Timer {timer.name} failed: {future.exception()!r}")
+
+        # The loop may be asleep without knowing about the new deadline.
+        if timer.mode == FIXED_DELAY:
+            self.timers.reschedule(timer)
+            self.return_pipe.wake()
+
+    def new_return_pipe(self) -> ReturnPipe:
+        """
+        Makes the pipe worker threads send their replies through.
+        """
+        pipe = ReturnPipe(self.ctx, self.name)
+        self.poller.register(pipe.pull, flags=zmq.POLLIN)
+        self.readers[pipe.pull] = self.relay
+
+        return pipe
+
+    def relay(self, limit: int = None):
+        """
+        Sends the replies worker threads have pushed through the return pipe out on their sockets.
+
+        Parameters
+        ----------
+        limit : int, default=batch_size
+            The most replies to relay before going back to the poller. None relays everything waiting.
+        """
+        pull = self.return_pipe.pull
+        relayed = 0
+
+        while limit is None or relayed < (limit or self.batch_size):
+            try:
+                frames = pull.recv_multipart(zmq.NOBLOCK, copy=False)
+            except zmq.Again:
+                break
+
+            relayed += 1
+            route = frames[0].bytes
+            if route:
+                self.routes[route].send_multipart(frames[1:], copy=False)
+
+        while self._callbacks:
+            callback = self._callbacks.popleft()
+            try:
+                callback()
+            except Exception:
+                self.logger.exception("Loop callback failed.")
+
+        # Handlers only wake the loop while it is paused when they have made room.
+        if self._paused:
+            self.resume()
+
+    def call_soon(self, callback: Callable[[], Any]):
+        """
+        Runs a callback on the loop thread the next time it wakes up, for work on sockets the loop owns. Safe to
+        call from any thread. Callbacks run in the order they were handed over.
+        """
+        self._callbacks.append(callback)
+        self.return_pipe.wake()
+
+    def pause(self):
+        """
+        Stops polling every socket but the return pipe until a handler finishes.
+        """
+        self._paused = True
+        for socket in self.sockets.values():
+            self.poller.modify(socket, 0)
+
+        self.logger.debug("In flight limit reached. Pausing intake.")
+
+    def resume(self):
+        """
+        Goes back to polling every socket.
+        """
+        self._paused = False
+        for socket in self.sockets.values():
+            self.poller.modify(socket, zmq.POLLIN)
+
+        self.logger.debug("Resuming intake.")
+
+    def _acquire_slot(self) -> bool:
+        """
+        Claims room for one more message to be handled, pausing intake if there is none.
+        """
+        if self._slots is None or self._slots.acquire(blocking=False):
+            return True
+
+        self.pause()
+
+        # A handler may have finished between the failed acquire and the pause without waking anyone.
+        if self._slots.acquire(blocking=False):
+            self.resume()
+            return True
+
+        return False
+
+    def _release_slot(self):
+        if self._slots is not None:
+            self._slots.release()
+
+    def _handle(self, handler: Callable[..., Message], msg: Message, queued: int):
+        """
+        Runs a handler on a worker thread and times it.
+
+        Parameters
+        ----------
+        handler : Callable[..., Message]
+        msg : Message
+        queued : int
+            time.perf_counter_ns() from when the message was handed to the executor.
+        """
+        started = time.perf_counter_ns()
+        metrics = self.metrics.command(msg.command)
+        metrics.queue_wait.record(started - queued)
+
+        try:
+            return handler(msg)
+
+        except Exception:
+            metrics.errors += 1
+            raise
+
+        finally:
+            metrics.latency.record(time.perf_counter_ns() - started)
+            metrics.handled += 1
+
+    def _remember(self, cache: ReplyCache, key: bytes, recorder: Recorder, future: Future):
+        """
+        Caches what a handler replied once it has finished, as long as it did not fail.
+        """
+        if not future.cancelled() and future.exception() is None and recorder.replies:
+            cache.put(key, recorder.replies, recorder.generation)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Everything the reactor counts: per command counters and timings, how each socket has been scheduled, how
+        often cached replies were used, and how well compression has been paying off.
+        """
+        return {
+            'name': self.name,
+            'commands': self.metrics.snapshot(),
+            'lanes': self.lane_stats(),
+            'caches': {self.metrics.name(command): cache.as_dict() for command, cache in self.caches.items()},
+            'compression': {compressor.name: compressor.stats.as_dict() for compressor in compressors.values()}
+        }
+
+    def send_stats(self, msg: Message):
+        """
+        Message handler for Stats requests. Replies with a Stats message carrying stats().
+        """
+        msg.send(command=commands['Stats'], body=self.stats())
+
+    def _finished(self, pool: MessagePool, msg: Message, future: Future):
+        """
+        Called on the worker thread once a handler is done with a message.
+        """
+        if future.exception() is not None:
+            self.logger.error(f"Handler for {msg.command} failed: {future.exception()!r}")
+
+        if pool is not None:
+            pool.release(msg)
+
+        self._release_slot()
+        if self._paused:
+            self.return_pipe.wake()
+
+    def drain(self, soc_name: str, executor: ThreadPoolExecutor, display_incoming=False) -> int:
+        """
+        Receives up to the socket's quota of messages off of it without blocking and hands each one off to
+        its handler. Bursts are worked through without going back to the poller for every message.
+
+        Parameters
+        ----------
+        soc_name : str
+            The name of the socket which the poller reported as readable.
+        executor : ThreadPoolExecutor
+            The pool handlers are run in.
+        display_incoming : bool, default=False
+            A flag for displaying incoming message frames to the console
+
+        Returns
+        -------
+        int
+            The number of messages received.
+        """
+        socket = self.sockets[soc_name]
+        pool = self.pools.get(soc_name)
+        outlet = self.outlets[soc_name]
+        lane = self.lanes[soc_name]
+        quota = lane.quota
+        received = 0
+
+        while received < quota and self._acquire_slot():
+            if pool is not None:
+                msg = pool.acquire()
+            else:
+                msg = self.message_class(socket, self.logger, copy=not self.zero_copy, compression=self.compression)
 
-        with ThreadPoolExecutor(max_workers=100) as executor:
             try:
-                while self.continue_loop:
-
-                    ####################### Incoming Message ####################
-                    events = dict(self.poller.poll())
-
-                    # Checks to see if there are events on any created sockets.
-                    for soc_name, soc_obj in self.sockets.items():
-                        if soc_obj in events:
-                            self.logger.info(f"Message on {soc_name}.")
-                            msg = Message(self.sockets[soc_name], self.logger)
-                            msg.recv(display=display_incoming)
-
-                            if msg.command in self.msg_handlers.keys():
-                                self.logger.debug("Passing msg to thread.")
-                                executor.submit(
-                                    self.msg_handlers[msg.command], msg)
-                            else:
-                                # TODO: Add message command for making new command registrations
-                                self.logger.debug(
-                                    f"No message handler with command {msg.command}.")
-                                msg.send(
-                                    "Error: Invalid command type. Please register command callback with the server.")
-            except ProgramKilled:
-                self.stop()
-
-    def add_msg_handler(self, command: bytes, closure: Callable[..., Message]):
+                msg.recv(display=display_incoming, block=False)
+            except zmq.Again:
+                self._release_slot()
+                if pool is not None:
+                    pool.release(msg)
+                break
+            except Exception:
+                # One bad message must not take the loop down with it.
+                self.logger.exception(f"Could not read a message off of {soc_name}.")
+                self._release_slot()
+                if pool is not None:
+                    pool.release(msg)
+                received += 1
+                continue
+
+            received += 1
+            metrics = self.metrics.command(msg.command)
+            metrics.received += 1
+
+            if not msg.valid:
+                # The sender has already been told by Message.recv
+                metrics.rejected += 1
+                self._release_slot()
+                if pool is not None:
+                    pool.release(msg)
+
+            elif msg.command in self.msg_handlers:
+                cache = self.caches.get(msg.command)
+                msg.outlet = outlet
+
+                if cache is not None:
+                    key = cache.key(msg)
+                    replies = cache.get(key)
+
+                    if replies is not None:
+                        # Answered without bothering the executor
+                        msg.outlet = None
+                        msg.replay(replies)
+                        metrics.cached += 1
+                        self._release_slot()
+                        if pool is not None:
+                            pool.release(msg)
+                        continue
+
+                    msg.outlet = Recorder(outlet, msg.envelope_frames, cache.generation)
+
+                self.logger.debug("Passing msg to thread.")
+                future = executor.submit(
+                    self._handle, self.msg_handlers[msg.command], msg, time.perf_counter_ns())
+
+                if cache is not None:
+                    future.add_done_callback(partial(self._remember, cache, key, msg.outlet))
+                future.add_done_callback(partial(self._finished, pool, msg))
+
+            else:
+                metrics.rejected += 1
+                # TODO: Add message command for making new command registrations
+                self.logger.debug(
+                    f"No message handler with command {msg.command}.")
+                msg.send(
+                    command=commands['Denied'],
+                    body="Error: Invalid command type. Please register command callback with the server.")
+
+                self._release_slot()
+                if pool is not None:
+                    pool.release(msg)
+
+        lane.record(received)
+        return received
+
+    def add_msg_handler(self, command: bytes, closure: Callable[..., Message], cache: ReplyCache = None):
         """
         Adds a new message handler function to the list of callback. Messages
         with the command associated with the passed in function will be executed
@@ -107,7 +654,11 @@ class Reactor(Node):
             A command for which to associate a callback function with.
         closure : Callable[..., Message]
             A function which takes a Message as its parameter to handle specific messages.
+        cache : ReplyCache, default=None
+            Remembers the handler's replies. See cache_replies.
         """
+        if cache is not None:
+            self.caches[command] = cache
 
         # if command not in self.standard_commands.values():
         #     self.logger.info(
@@ -119,30 +670,92 @@ class Reactor(Node):
         else:
             print("Command already exists.")
 
-    def add_timer(self, name: str, interval: int, closure: Callable, *args, **kwargs):
+    def cache_replies(self, command: bytes, maxsize=1024, ttl: float = 5.0) -> ReplyCache:
+        """
+        Remembers what a handler replies to each distinct request body. Repeats are answered straight from the
+        loop thread without going through the executor. Only meant for handlers whose replies depend on nothing
+        but the request, or whose owner clears the cache whenever what they depend on changes.
+
+        Parameters
+        ----------
+        command : bytes
+            The command whose replies are cached.
+        maxsize : int, default=1024
+            The most distinct requests to remember.
+        ttl : float, default=5.0
+            Seconds a reply is good for. None keeps it until it is evicted or invalidated.
+
+        Returns
+        -------
+        ReplyCache
+            The cache, for clearing.
+        """
+        cache = self.caches[command] = ReplyCache(maxsize=maxsize, ttl=ttl)
+        return cache
+
+    def invalidate(self, command: bytes = None):
+        """
+        Forgets the cached replies for a command, or for every command when none is given.
+        """
+        caches = self.caches.values() if command is None else [self.caches[command]]
+        for cache in caches:
+            cache.clear()
+
+    def add_timer(self, name: str, interval: float, closure: Callable, *args, mode=FIXED_RATE, executor=False,
+                  **kwargs):
         """
         Adds a timer to watch for outside data generating or internal periodic events. On occurrence, 
         said outside data/internal events will be queued up on the appropriate outgoing socket(s)
+
+        Parameters
+        ----------
+        name : str
+            Replaces any timer already added under this name.
+        interval : float
+            Seconds between runs.
+        closure : Callable
+            Called with the remaining args and kwargs.
+        mode : str, default=FIXED_RATE
+            FIXED_RATE keeps to a schedule, FIXED_DELAY waits a full interval after each run finishes.
+        executor : bool, default=False
+            Runs the closure on the worker threads instead of the loop thread. Use it for anything that blocks.
+
+        Returns
+        -------
+        ScheduledTimer
         """
-        periodic_event = PeriodicEvent(interval, closure, *args, **kwargs)
-        self.timers[name] = periodic_event
+        timer = self.timers.add(name, interval, closure, *args, mode=mode, executor=executor, **kwargs)
         self.logger.info(f"Registered new timer: {name}")
+        return timer
 
     def stop(self, msg: Message = None):
         """
         A special callback function to end the reactors main loop when certain messages
         come in.TODO: Authorize these types of messages.
+
+        Safe to call from a handler. A running loop is woken up and closes everything itself on the way out.
         """
         self.logger.warning(
             "Received exit command, client will stop receiving messages")
         if msg is not None:
-            msg.send("Bye!")
+            msg.send(command=commands['Acknowledged'], body="Bye!")
 
         self.continue_loop = False
-        self.close_ctx()
 
-        for timer in self.timers.values():
-            timer.stop()
+        with self._stopping:
+            running = self._running
+            if running and threading.current_thread() is not self._loop_thread:
+                self.return_pipe.wake()
+
+        if not running:
+            self.shutdown()
+
+    def shutdown(self):
+        """
+        Stops the timers and closes every socket. Only called once the loop is no longer running.
+        """
+        self.timers.clear()
+        self.close_ctx()
 
 
 if __name__ == "__main__":
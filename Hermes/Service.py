@@ -12,35 +12,87 @@ import zmq
 # Relative imports
 from Hermes.Node import Node
 from Hermes.Message import Message
-from Hermes.Timer import Heartbeater, Peer
+from Hermes.Timer import Heartbeater, Peer, FIXED_DELAY
 from Hermes.Beacon import Beacon
 from Hermes.Reactor import Reactor
+from Hermes.AsyncReactor import AsyncReactor
+from Hermes.ProcessReactor import ProcessReactor
+from Hermes.Transfer import ChunkServer
 from Hermes.DBP import commands, command_checks
+from Hermes.BinaryStar import STANDBY
+from Hermes.Agent import RegistrationAgent
+from Hermes.Catalog import replica_key
 
 # %%
 
 
 class Service(Node):
-    def __init__(self, name="Rohan", log_level=logging.WARNING, config_file: str = None):
+    def __init__(self, name="Rohan", log_level=logging.WARNING, config_file: str = None, asynchronous=False,
+                 processes: int = None, bus_timeout=5000, liveliness=1000, retries=3,
+                 agent: RegistrationAgent = None, instance: str = None):
         super().__init__(name=name, log_level=log_level)
 
+        # Several instances of a service may run under the same name as long as each has its own instance id.
+        # The catalog keeps each one as name@instance and clients spread their requests over all of them.
+        self.instance: str = instance
+        self.catalog_key: str = replica_key(name, instance)
+
+        # Services sharing a host can share one connection to the catalog. The agent then registers, updates,
+        # and heartbeats for this service.
+        self.agent: RegistrationAgent = agent
+
+        # Milliseconds to wait on the catalog before looking for it again, in case it has failed over.
+        self.bus_timeout: int = bus_timeout
+        self.bus_addr: str = None
+
+        # Set when registering again after being turned away failed, so the next heartbeat tries again.
+        self._rejoin: bool = False
+
+        # Milliseconds between heartbeats to the catalog, and how many may be missed before it evicts the service
+        self.liveliness: int = liveliness
+        self.retries: int = retries
+
         # TODO: Pull socket and handler information from a config file
         sockets = {
             'router': zmq.ROUTER
         }
 
+        # Files and buffers this service hands out in chunks
+        self.transfers = ChunkServer(self.logger)
+
         handlers = {
             b'ping': self.pong,
+            commands['Fetch']: self.transfers.fetch,
         }
 
-        self.loop = Reactor(
-            name=f'{self.name}_reactor',
-            socs=sockets,
-            msg_handlers=handlers,
-            log_level=log_level
-        )
+        # Coroutine handlers need the asyncio loop. CPU bound handlers can be spread over worker processes
+        # instead. Everything else works on any of them.
+        if processes is not None:
+            self.loop = ProcessReactor(
+                name=f'{self.name}_reactor',
+                socs=sockets,
+                msg_handlers=handlers,
+                log_level=log_level,
+                processes=processes
+            )
+
+        else:
+            reactor = AsyncReactor if asynchronous else Reactor
+
+            self.loop = reactor(
+                name=f'{self.name}_reactor',
+                socs=sockets,
+                msg_handlers=handlers,
+                log_level=log_level
+            )
+
+        # Pongs only ever carry the service's name
+        self.loop.cache_replies(b'ping', ttl=None)
 
-    def connect(self, reconnect=False):
+        # Registering again after a Denied can block on discovery for seconds, so it is kept off of the loop.
+        self.loop.add_timer('heartbeat', liveliness / 1000, self.heartbeat, mode=FIXED_DELAY, executor=True)
+
+    def connect(self, reconnect=False) -> bool:
         """
         Connects the service node to the core catalog service. In the event that the service does not 
         receive a heartbeat after some period of time or it screws up updating an important 
@@ -50,10 +102,25 @@ class Service(Node):
         ----------
         reconnect : bool, default=False
             A flag to determine if a reconnect is being attempted or if its the initial connect
+
+        Returns
+        -------
+        bool
+            False if no catalog beacon was heard.
         """
+        if "service->bus" in self.sockets:
+            self.close_socket("service->bus", linger=0)
+
         # open a socket to the CCS
-        _, ip, port = self.discover()
-        self.new_socket("service->bus", zmq.REQ, addr=f'tcp://{ip}:{port}')
+        rc = self.discover()
+        if rc is None:
+            self.logger.warning("No catalog beacon heard.")
+            return False
+
+        _, ip, port = rc
+        self.bus_addr = f'tcp://{ip}:{port}'
+        self.new_socket("service->bus", zmq.REQ, addr=self.bus_addr)
+        return True
 
         # TODO: Figure out how to do retries with reconnect flag
         # while self.retries != 0:
@@ -63,12 +130,33 @@ class Service(Node):
 
         # self.logger.critical(f"Broker Not Responding, Shutting Down.")
 
+    def bus_request(self, command: bytes, body: Any) -> Message:
+        """
+        Connects to the catalog and sends it a request. If it does not answer, or answers that it is standing by,
+        it is looked for again and asked once more. The catalog's backup already has everything the primary had,
+        so nothing needs sending again after a failover.
+
+        Returns
+        -------
+        Message
+            The reply, or None if no catalog answered.
+        """
+        for reconnect in (False, True):
+            if not self.connect(reconnect=reconnect):
+                continue
+
+            msg = self.request("service->bus", command, body, timeout=self.bus_timeout)
+            if msg is not None and not (msg.command == commands['Denied'] and msg.payload == STANDBY):
+                return msg
+
+            self.logger.warning("Catalog did not answer. Looking for it again.")
+
+        return None
+
     def register(self) -> bool:
         """
         Sends a registration message as defined in the DBP.
         """
-        self.connect()
-
         info = {
             "name":       self.name,
             "interfaces": {
@@ -76,20 +164,35 @@ class Service(Node):
             },
             "reg_time":  time.asctime(),
 
-            # TODO: Fix heartbeat stuff here
-            # "liveliness": self.liveliness,
-            # "retry":      self.retries,
+            "liveliness": self.liveliness,
+            "retries":    self.retries,
             "topics":     None
         }
 
-        msg = Message(socket=self.sockets["service->bus"])
-        msg.send(command=commands['Registration'], body=info)
-        msg.recv(display=True)
+        if self.instance is not None:
+            info["instance"] = self.instance
+
+        if self.agent is not None:
+            approved = self.agent.enroll(info)
+            if approved:
+                self.continue_loop = True
+                self.logger.info("Registration Approved.")
+            return approved
+
+        msg = self.bus_request(commands['Registration'], info)
 
-        if msg.command == commands["Approved"]:
+        if msg is None:
+            self.logger.critical("Catalog not responding.")
+
+        elif msg.command == commands["Approved"]:
             self.continue_loop = True
             self.logger.info("Registration Approved.")
             self.close_socket("service->bus")
+
+            # Heartbeats go one way so they have their own socket to the catalog.
+            if "service->heartbeat" in self.sockets:
+                self.close_socket("service->heartbeat", linger=0)
+            self.new_socket("service->heartbeat", zmq.DEALER, addr=self.bus_addr)
             return True
 
         elif msg.command == commands['Denied']:
@@ -107,17 +210,24 @@ class Service(Node):
         config : dict(config_option: new value)
             A dictionary which will hold the new values.
         """
-        self.connect()
-        msg = Message(socket=self.sockets["service->bus"])
-        msg.send(command=commands["Update"], body=config)
-        msg.recv()
+        config = {'name': self.catalog_key, **config}
+
+        if self.agent is not None:
+            results = self.agent.update_config([config])
+            if results and results[0]['ok']:
+                self.logger.info(f"New Config Value Updated!")
+            else:
+                self.logger.error(f"Config update was not acknowledged.")
+            return
+
+        msg = self.bus_request(commands["Update"], config)
 
-        if msg.command == commands['Acknowledged']:
+        if msg is not None and msg.command == commands['Acknowledged']:
             self.logger.info(f"New Config Value Updated!")
             self.close_socket('service->bus')
         else:
             #TODO: this
-            self.connect(reconnect=True)
+            self.logger.error(f"Config update was not acknowledged.")
 
     def start(self, display_incoming=False):
         """
@@ -128,6 +238,38 @@ class Service(Node):
         else:
             self.logger.critical('Could not start service.')
 
+    def heartbeat(self):
+        """
+        Tells the catalog the service is still alive. The catalog only answers when something is wrong: when it
+        has evicted the service, or when it is standing by and the other half of the pair has taken over. Either
+        way the service registers again with whichever catalog is serving, and keeps trying on later ticks while
+        none can be found. Services with an agent are heartbeated for by it. Runs on a worker thread, and ticks are
+        skipped while a registration is underway.
+        """
+        socket = self.sockets.get("service->heartbeat")
+        if socket is None:
+            if self._rejoin:
+                self.rejoin()
+            return
+
+        if socket.poll(0):
+            msg = Message(socket, self.logger)
+            msg.recv()
+            self.logger.warning(f"Catalog turned away a heartbeat: {msg.payload}. Registering again.")
+
+            self.close_socket("service->heartbeat", linger=0)
+            self.rejoin()
+            return
+
+        Message(socket, self.logger).send(command=commands['Heartbeat'], body=self.catalog_key)
+
+    def rejoin(self):
+        """
+        Registers again, leaving a flag for the next heartbeat to retry if no catalog answered. A Denied is final
+        as the context has been closed.
+        """
+        self._rejoin = not self.register() and not self.ctx.closed
+
     def pong(self, msg: Message):
         """
         Used to see if the service is alive. To Be Replaced with heartbeats....
@@ -1,7 +1,10 @@
 #!/usr/bin/env python3
 
 import time
-from typing import Dict, List
+import heapq
+import itertools
+import threading
+from typing import Dict, List, Set, Callable, Hashable, Iterator, Optional
 
 # NOTE: These objects are examples of handeling events without including zeromq sockets as opposed to how the Message class does things.
 
@@ -19,7 +22,7 @@ def signal_handler(signum, frame):
 
 # https://stackoverflow.com/a/38317060
 
-
+# NOTE: Starts a new thread for every tick. Reactors schedule their timers with a TimerQueue instead.
 class PeriodicEvent():
     def __init__(self, interval, function, *args, **kwargs):
         self._timer = None
@@ -46,6 +49,296 @@ class PeriodicEvent():
         self.is_running = False
 
 
+# Timer modes. Fixed rate timers keep to a schedule set when they were added, fixed delay timers wait a full
+# interval after each run finishes.
+FIXED_RATE = 'rate'
+FIXED_DELAY = 'delay'
+
+
+class ScheduledTimer():
+    """
+    A callback held by a TimerQueue.
+
+    Attributes
+    ----------
+    name : str
+    interval : float
+        Seconds between runs.
+    mode : str
+        FIXED_RATE or FIXED_DELAY.
+    executor : bool
+        Whether the owner should run the callback off of its own thread.
+    deadline : float
+        When the callback is next due, on the queue's clock.
+    running : bool
+        Set while a run handed off to another thread has not finished. Runs are skipped rather than overlapped.
+    """
+    __slots__ = ('name', 'interval', 'function', 'args', 'kwargs', 'mode', 'executor', 'deadline', 'running',
+                 'cancelled')
+
+    def __init__(self, name: str, interval: float, function: Callable, args=(), kwargs=None, mode=FIXED_RATE,
+                 executor=False):
+        if interval <= 0:
+            raise ValueError("Timer intervals must be positive.")
+        if mode not in (FIXED_RATE, FIXED_DELAY):
+            raise ValueError(f"Unknown timer mode {mode}.")
+
+        self.name = name
+        self.interval = interval
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs if kwargs is not None else {}
+        self.mode = mode
+        self.executor = executor
+        self.deadline = 0.0
+        self.running = False
+        self.cancelled = False
+
+    def __call__(self):
+        return self.function(*self.args, **self.kwargs)
+
+
+class TimerQueue():
+    """
+    Keeps timers in a heap ordered by deadline so whoever owns it can sleep exactly until the next one is due, as
+    a Reactor does with its poll timeout, and run every due callback on its own thread. Nothing here starts a
+    thread.
+
+    Fixed rate deadlines advance by whole intervals from when the timer was added so they do not drift. Ticks
+    missed while the owner was busy are skipped rather than run back to back. Fixed delay timers are put back
+    once their run is over.
+
+    Safe to reschedule from other threads. Owners sleeping on timeout() should be woken when that happens.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self._heap = []
+        self._timers: Dict[str, ScheduledTimer] = {}
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._timers)
+
+    def __iter__(self) -> Iterator[ScheduledTimer]:
+        return iter(list(self._timers.values()))
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._timers
+
+    def add(self, name: str, interval: float, function: Callable, *args, mode=FIXED_RATE, executor=False,
+            **kwargs) -> ScheduledTimer:
+        """
+        Schedules a callback to first run one interval from now. Replaces any timer with the same name.
+
+        Parameters
+        ----------
+        name : str
+        interval : float
+            Seconds between runs. Fractions of a millisecond are fine.
+        function : Callable
+            Called with the remaining args and kwargs.
+        mode : str, default=FIXED_RATE
+            FIXED_RATE or FIXED_DELAY.
+        executor : bool, default=False
+            Marks the callback to be run off of the owner's thread.
+
+        Returns
+        -------
+        ScheduledTimer
+        """
+        timer = ScheduledTimer(name, interval, function, args, kwargs, mode=mode, executor=executor)
+
+        with self._lock:
+            old = self._timers.pop(name, None)
+            if old is not None:
+                old.cancelled = True
+
+            self._timers[name] = timer
+            self._push(timer, self.clock() + interval)
+
+        return timer
+
+    def cancel(self, name: str):
+        """
+        Stops a timer. Cancelled timers are dropped from the heap when they come up.
+        """
+        with self._lock:
+            timer = self._timers.pop(name, None)
+            if timer is not None:
+                timer.cancelled = True
+
+    def clear(self):
+        with self._lock:
+            for timer in self._timers.values():
+                timer.cancelled = True
+            self._timers.clear()
+            self._heap.clear()
+
+    def _push(self, timer: ScheduledTimer, deadline: float):
+        timer.deadline = deadline
+        heapq.heappush(self._heap, (deadline, next(self._order), timer))
+
+    def timeout(self) -> Optional[float]:
+        """
+        Seconds until the next timer is due, 0 if one is overdue, or None when there are no timers.
+        """
+        with self._lock:
+            while self._heap and self._heap[0][2].cancelled:
+                heapq.heappop(self._heap)
+
+            if not self._heap:
+                return None
+
+            return max(0.0, self._heap[0][0] - self.clock())
+
+    def poll_timeout(self) -> Optional[int]:
+        """
+        timeout() in whole milliseconds for zmq.Poller.poll. Rounded down, so the last fraction of a millisecond
+        is spent polling without blocking rather than oversleeping.
+        """
+        timeout = self.timeout()
+        return None if timeout is None else int(timeout * 1000)
+
+    def due(self) -> List[ScheduledTimer]:
+        """
+        Takes every timer whose deadline has passed off of the heap. Fixed rate timers are put straight back on
+        for their next tick, fixed delay timers have to be handed to reschedule once they have run.
+        """
+        now = self.clock()
+        ready = []
+
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                _, _, timer = heapq.heappop(self._heap)
+                if timer.cancelled:
+                    continue
+
+                ready.append(timer)
+
+                if timer.mode == FIXED_RATE:
+                    deadline = timer.deadline + timer.interval
+                    if deadline <= now:
+                        deadline += ((now - deadline) // timer.interval + 1) * timer.interval
+                    self._push(timer, deadline)
+
+        return ready
+
+    def reschedule(self, timer: ScheduledTimer):
+        """
+        Puts a fixed delay timer back on the heap one interval from now.
+        """
+        with self._lock:
+            if not timer.cancelled and timer.mode == FIXED_DELAY:
+                self._push(timer, self.clock() + timer.interval)
+
+
+class TimingWheel():
+    """
+    Deadlines for a large number of keys, such as when each registered service is next due to heartbeat. Keys are
+    kept in a ring of buckets, one per tick, by the tick their deadline falls in. Moving a deadline is a couple of
+    set operations and finding what has expired only visits the buckets for the ticks that have gone by, so the
+    cost of a check follows the number of keys expiring rather than the number being tracked.
+
+    Deadlines more than a full turn of the wheel away share buckets with nearer ones and are passed over until
+    their turn comes round.
+
+    Attributes
+    ----------
+    tick : float
+        Seconds covered by each bucket. Keys expire up to a tick late.
+    slots : int
+        The number of buckets. A turn of the wheel is tick * slots seconds.
+    """
+
+    def __init__(self, tick=0.1, slots=512, clock: Callable[[], float] = time.monotonic):
+        if tick <= 0 or slots < 1:
+            raise ValueError("Timing wheels need a positive tick and at least one slot.")
+
+        self.tick = tick
+        self.slots = slots
+        self.clock = clock
+
+        self._buckets: List[Set[Hashable]] = [set() for _ in range(slots)]
+        self._deadlines: Dict[Hashable, float] = {}
+        self._slot: Dict[Hashable, int] = {}
+
+        # The first tick whose bucket has not been swept yet.
+        self._cursor = self._tick_of(clock())
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._deadlines
+
+    def _tick_of(self, when: float) -> int:
+        return int(when // self.tick)
+
+    def touch(self, key: Hashable, timeout: float):
+        """
+        Sets a key to expire timeout seconds from now, adding it if it is new.
+        """
+        deadline = self.clock() + timeout
+
+        with self._lock:
+            slot = self._slot.get(key)
+            if slot is not None:
+                self._buckets[slot].discard(key)
+
+            slot = max(self._tick_of(deadline), self._cursor) % self.slots
+            self._buckets[slot].add(key)
+            self._slot[key] = slot
+            self._deadlines[key] = deadline
+
+    def remove(self, key: Hashable):
+        """
+        Stops tracking a key. Unknown keys are ignored.
+        """
+        with self._lock:
+            slot = self._slot.pop(key, None)
+            if slot is not None:
+                self._buckets[slot].discard(key)
+                del self._deadlines[key]
+
+    def deadline(self, key: Hashable) -> float:
+        return self._deadlines[key]
+
+    def expired(self) -> List[Hashable]:
+        """
+        Takes every key whose deadline has passed off of the wheel.
+
+        Returns
+        -------
+        List[Hashable]
+            The expired keys, in no particular order.
+        """
+        now = self.clock()
+        current = self._tick_of(now)
+        expired = []
+
+        with self._lock:
+            # Each bucket holds everything due in its tick, so no more than a turn's worth is ever swept.
+            for tick in range(max(self._cursor, current - self.slots + 1), current + 1):
+                bucket = self._buckets[tick % self.slots]
+                if not bucket:
+                    continue
+
+                due = [key for key in bucket if self._deadlines[key] <= now]
+                for key in due:
+                    bucket.discard(key)
+                    del self._slot[key]
+                    del self._deadlines[key]
+                expired.extend(due)
+
+            # The current tick may still have keys due later in it, so it is swept again next time.
+            self._cursor = current
+
+        return expired
+
+
 class Peer():
     """
     Struct to hold peer liveliness information and update values
@@ -53,7 +346,7 @@ class Peer():
 
     def __init__(self, liveliness=1000, retries=3):
         self.liveliness: int = liveliness
-        self.retries, self.reset_retries = retries
+        self.retries = self.reset_retries = retries
 
         self.last_recv = time.time()
         self.expect_time = False
@@ -66,7 +359,7 @@ class Peer():
         -------
         bool
         """
-        if self.liveliness + self.last_recv >= time.time():
+        if self.last_recv + self.liveliness / 1000 <= time.time():
             self.expect_time = True
 
         return self.expect_time
@@ -83,18 +376,19 @@ class Peer():
         self.liveliness = new_val
 
     def update_retries(self, new_val):
-        self.reset_retries, self.retries = new_val
+        self.reset_retries = self.retries = new_val
 
 
 class Heartbeater():
     """
-    A timer to keep track on when to send and when to expect heartbeats for nodes.
+    A timer to keep track on when to send and when to expect heartbeats for nodes. Every check looks at every
+    peer, which is fine for a node's handful of peers. The catalog tracks its services with a TimingWheel.
 
     Attributes
     ----------
     tabs : Dict[str, Peer]
         Holds information on all of the peers in which the node is interested in keeping tabs on and send heartbeats to.
-    tardy : List[Peer]
+    tardy : List[str]
         Contains the names of all the peers which have missed their heartbeat interval.
     last_sent : int
         The time stamp the of current nodes last send heartbeat
@@ -103,11 +397,12 @@ class Heartbeater():
     send_time : bool
         A flag to signify whether its time to send a new heartbeat to peers
     """
-    tabs: Dict[str, Peer] = {}
-    tardy: List[Peer] = []
-    last_sent = 0
 
     def __init__(self, liveliness=1000):
+        # Kept per instance. Two heartbeaters in one process must not share peers.
+        self.tabs: Dict[str, Peer] = {}
+        self.tardy: List[str] = []
+        self.last_sent = 0
 
         # Sends a little earlier to give some buffer room for unexpected stalling
         self.liveliness = liveliness - 10
@@ -117,7 +412,7 @@ class Heartbeater():
         """
         Adds a new peer to keep track of
         """
-        self.tabs[peer_name](Peer(peer_liveliness, peer_retries))
+        self.tabs[peer_name] = Peer(peer_liveliness, peer_retries)
 
     def remove_peer(self, peer_name: str):
         """
@@ -145,7 +440,7 @@ class Heartbeater():
         -------
         List[bool, List[Peer]]
         """
-        if self.last_sent + self.liveliness >= time.time():
+        if self.last_sent + self.liveliness / 1000 <= time.time():
             self.send_time = True
 
         for peer_name, peer_obj in self.tabs.items():
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+
+# System modules
+import os
+import mmap
+import struct
+import logging
+import threading
+from typing import Dict, Any, Iterator, Union
+
+# Third party modules
+import zmq
+
+# Relative imports
+from Hermes.Message import Message, RawCodec
+from Hermes.DBP import commands
+
+################################################# RESOURCES ##########################################################
+# Credit based flow control: http://zguide.zeromq.org/page:all#Transferring-Files
+#######################################################################################################################
+
+# Defaults tuned for moving large products between services without stalling either end.
+CHUNK_SIZE = 250000
+CREDIT = 10
+
+# Chunks are sent as two raw frames, the offset they start at and the data itself.
+OFFSET = struct.Struct('!Q')
+
+
+class TransferError(Exception):
+    pass
+
+
+class ChunkServer():
+    """
+    Serves named files and buffers out in chunks to anyone who asks for them with a Fetch message. The server holds
+    no per-transfer state: every request names the resource, the offset, and the number of bytes wanted, so a
+    receiver decides how many chunks are in flight at once.
+
+    Files are memory mapped so a chunk is a slice of the page cache rather than a read into a new buffer.
+
+    Attributes
+    ----------
+    resources : Dict[str, memoryview]
+        The buffers currently being served, keyed by the name receivers ask for them with.
+    """
+
+    def __init__(self, logger=None):
+        self.resources: Dict[str, memoryview] = {}
+        self._maps: Dict[str, mmap.mmap] = {}
+        self._lock = threading.Lock()
+
+        if logger is not None:
+            self.logger: logging.Logger = logger
+        else:
+            self.logger: logging.Logger = logging.getLogger(__name__)
+
+    def add_file(self, name: str, path: Union[str, os.PathLike]):
+        """
+        Memory maps a file and serves it under the given name.
+
+        Parameters
+        ----------
+        name : str
+            The name receivers will fetch the file with.
+        path : str
+            The location of the file on disk.
+        """
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                # Empty files cannot be mapped.
+                self.add_buffer(name, b'')
+                return
+
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        with self._lock:
+            self._drop(name)
+            self._maps[name] = mapped
+            self.resources[name] = memoryview(mapped)
+
+        self.logger.info(f"Serving file {path} as {name}.")
+
+    def add_buffer(self, name: str, buffer: Any):
+        """
+        Serves an object supporting the buffer protocol under the given name.
+
+        Parameters
+        ----------
+        name : str
+            The name receivers will fetch the buffer with.
+        buffer : bytes, bytearray, memoryview, or similar
+            The data to serve. It is not copied so it should not change while being served.
+        """
+        with self._lock:
+            self._drop(name)
+            self.resources[name] = memoryview(buffer).cast('B')
+
+        self.logger.info(f"Serving buffer as {name}.")
+
+    def remove(self, name: str):
+        """
+        Stops serving a resource and unmaps it if it was a file. Chunks of it still being sent are not affected.
+
+        Parameters
+        ----------
+        name : str
+            The name the resource was added with.
+        """
+        with self._lock:
+            self._drop(name)
+
+    def _drop(self, name: str):
+        view = self.resources.pop(name, None)
+        if view is not None:
+            view.release()
+
+        mapped = self._maps.pop(name, None)
+        if mapped is not None:
+            try:
+                mapped.close()
+            except BufferError:
+                # Chunks sent without copying still point into the map. It is unmapped once the last of them is
+                # released, as nothing here holds on to it any more.
+                self.logger.debug(f"Unmapping {name} once the chunks still being sent are released.")
+
+    def fetch(self, msg: Message):
+        """
+        Message handler for Fetch requests. Replies with the offset and the requested slice of a resource, an
+        empty chunk once the offset is past the end, or Denied if the resource is unknown or the offset is
+        negative or the size not positive.
+
+        Parameters
+        ----------
+        msg : Message
+            A Fetch request with a {'name': str, 'offset': int, 'size': int} body.
+        """
+        request = msg.payload
+
+        try:
+            offset = int(request['offset'])
+            size = int(request['size'])
+            if offset < 0 or size <= 0:
+                raise ValueError(f"Bad range {offset}+{size}")
+
+            # Sliced under the lock so the resource cannot be released in between.
+            with self._lock:
+                chunk = self.resources[request['name']][offset:offset + size]
+
+        except (KeyError, TypeError, ValueError):
+            msg.send(command=commands['Denied'], body=f"Error: Cannot fetch {request}.")
+            return
+
+        msg.send(
+            command=commands['Chunk'],
+            body=(OFFSET.pack(offset), chunk),
+            codec=RawCodec.marker)
+
+    def close(self):
+        """
+        Stops serving everything.
+        """
+        with self._lock:
+            for name in list(self.resources):
+                self._drop(name)
+
+
+def fetch_chunks(socket: zmq.Socket, name: str, chunk_size=CHUNK_SIZE, credit=CREDIT, timeout=10000,
+                 copy=False) -> Iterator[memoryview]:
+    """
+    Streams a resource from a ChunkServer, yielding each chunk as it arrives. At most `credit` chunk requests are
+    outstanding at any time, which bounds the memory used on both ends no matter how large the resource is.
+
+    Parameters
+    ----------
+    socket : zmq.Socket
+        A DEALER socket connected to the serving node's router. REQ sockets cannot have more than one request
+        in flight so they cannot be used here.
+    name : str
+        The name of the resource to fetch.
+    chunk_size : int, default=CHUNK_SIZE
+        The most bytes to ask for in one request.
+    credit : int, default=CREDIT
+        The most chunk requests to have in flight at once.
+    timeout : int, default=10000
+        Milliseconds to wait for a chunk before giving up.
+    copy : bool, default=False
+        When False chunks are memoryviews over zmq's receive buffers.
+
+    Yields
+    ------
+    memoryview
+        The next chunk of the resource, in order. Chunks held back while one before them is still in flight
+        count against the credit, so no more than `credit` chunks are ever buffered.
+
+    Raises
+    ------
+    TransferError
+        When the server refuses the request or stops answering.
+    """
+    if socket.socket_type != zmq.DEALER:
+        raise ValueError("Chunked transfers need a DEALER socket.")
+
+    offset = 0        # Where the next request will start
+    position = 0      # Where the next chunk handed to the caller starts
+    end = None        # The size of the resource once a short chunk shows it
+    arrived: Dict[int, memoryview] = {}
+    in_flight = 0
+
+    try:
+        while end is None or position < end:
+            # Spend all available credit before waiting on anything. Chunks held back for ordering still count.
+            while end is None and in_flight + len(arrived) < credit:
+                Message(socket).send(
+                    command=commands['Fetch'],
+                    body={'name': name, 'offset': offset, 'size': chunk_size})
+                offset += chunk_size
+                in_flight += 1
+
+            if not socket.poll(timeout):
+                raise TransferError(f"Timed out waiting for a chunk of {name}.")
+
+            msg = Message(socket, copy=copy)
+            msg.recv()
+            in_flight -= 1
+
+            if not msg.valid or msg.command != commands['Chunk'] or len(msg.body) != 2:
+                raise TransferError(f"Could not fetch {name}: {msg.payload}")
+
+            chunk_offset = OFFSET.unpack(msg.body[0])[0]
+            chunk = msg.body[1]
+
+            # A short chunk marks the end of the resource. Requests past it come back empty.
+            if len(chunk) < chunk_size:
+                chunk_end = chunk_offset + len(chunk)
+                end = chunk_end if end is None else min(end, chunk_end)
+
+            # Handlers may answer out of order so chunks are held until everything before them is here.
+            if len(chunk) > 0:
+                arrived[chunk_offset] = chunk
+
+            while position in arrived:
+                chunk = arrived.pop(position)
+                position += len(chunk)
+                yield chunk
+
+    finally:
+        # Replies to abandoned requests are swallowed so the socket can be used again.
+        while in_flight > 0 and socket.poll(timeout):
+            socket.recv_multipart()
+            in_flight -= 1
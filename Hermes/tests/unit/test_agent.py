@@ -0,0 +1,87 @@
+# Standard imports
+import logging
+import threading
+import unittest
+from unittest import mock
+
+# Relative import
+from Hermes.Agent import RegistrationAgent
+from Hermes.CoreCatalogService import CoreCatalogService
+
+
+class TestRegistrationAgent(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.ccs = CoreCatalogService(log_level=logging.CRITICAL)
+        self.thread = threading.Thread(target=self.ccs.loop.start)
+        self.thread.start()
+
+        port = self.ccs.loop.interfaces['router']['port']
+        self.agent = RegistrationAgent(log_level=logging.CRITICAL, bus_timeout=2000)
+        self.discover = mock.patch.object(self.agent, 'discover', return_value=(b'', '127.0.0.1', port))
+        self.discover.start()
+
+    def tearDown(self) -> None:
+        self.discover.stop()
+        self.agent.stop()
+        self.ccs.stop()
+        self.thread.join(5)
+        self.ccs.beacon.close()
+
+    def requests(self, command: str) -> int:
+        return self.ccs.loop.metrics.snapshot().get(command, {}).get('received', 0)
+
+    def test_concurrent_registrations_share_a_request(self):
+        self.agent.batch_delay = .1
+        results = {}
+
+        def enroll(index):
+            results[index] = self.agent.enroll({'name': f'service_{index}', 'port': 6000 + index}, timeout=5)
+
+        threads = [threading.Thread(target=enroll, args=(index,)) for index in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(results, {index: True for index in range(20)})
+        self.assertEqual(len(self.ccs.services), 20)
+        self.assertLess(self.requests('Registration'), 20)
+
+    def test_same_service_enrolled_twice_in_a_batch(self):
+        self.agent.batch_delay = .1
+        results = []
+
+        def enroll(port):
+            results.append(self.agent.enroll({'name': 'rohan', 'port': port}, timeout=5))
+
+        first = threading.Thread(target=enroll, args=(5246,))
+        first.start()
+        # Joins the batch the first is gathering.
+        threading.Timer(.02, enroll, args=(5247,)).run()
+        first.join(5)
+
+        self.assertEqual(results, [True, True])
+        self.assertEqual(self.requests('Registration'), 1)
+        self.assertEqual(self.agent.services['rohan']['port'], 5247)
+
+    def test_bulk_update_reports_each_change(self):
+        self.assertTrue(self.agent.enroll({'name': 'rohan', 'port': 5246}))
+
+        results = self.agent.update_config([{'name': 'rohan', 'port': 6000}, {'name': 'mordor', 'port': 1}])
+        self.assertEqual([result['ok'] for result in results], [True, False])
+        self.assertEqual(self.ccs.services['rohan']['port'], 6000)
+        self.assertEqual(self.agent.services['rohan']['port'], 6000)
+
+    def test_forgotten_services_are_registered_again(self):
+        self.assertTrue(self.agent.enroll({'name': 'rohan', 'port': 5246}))
+        self.assertEqual(self.agent.heartbeat(), [])
+
+        self.ccs.catalog.remove('rohan')
+        self.assertEqual(self.agent.heartbeat(), ['rohan'])
+        self.assertIn('rohan', self.ccs.services)
+        self.assertEqual(self.requests('Heartbeat'), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
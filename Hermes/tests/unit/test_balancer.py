@@ -0,0 +1,67 @@
+# Standard imports
+import random
+import unittest
+
+# Relative import
+from Hermes.Balancer import Balancer
+
+
+class TestBalancer(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.now = 0.0
+        self.balancer = Balancer(eject_after=2, eject_for=10, clock=lambda: self.now, rng=random.Random(7))
+
+    def request(self, addr, seconds, ok=True):
+        started = self.balancer.begin(addr)
+        self.now += seconds
+        self.balancer.end(addr, started, ok=ok)
+
+    def test_faster_and_less_loaded_replicas_are_preferred(self):
+        self.request('fast', .01)
+        self.request('slow', .1)
+        self.assertEqual({self.balancer.choose(['fast', 'slow']) for _ in range(20)}, {'fast'})
+
+        # Enough requests piled up on the fast one make the slow one cheaper.
+        for _ in range(10):
+            self.balancer.begin('fast')
+        self.assertEqual(self.balancer.choose(['fast', 'slow']), 'slow')
+
+    def test_load_is_spread(self):
+        addrs = ['a', 'b', 'c', 'd']
+        for addr in addrs:
+            self.request(addr, .01)
+
+        chosen = {addr: 0 for addr in addrs}
+        for _ in range(400):
+            addr = self.balancer.choose(addrs)
+            chosen[addr] += 1
+            self.balancer.begin(addr)
+
+        # Every replica ends up with about a quarter of the outstanding requests.
+        for count in chosen.values():
+            self.assertAlmostEqual(count, 100, delta=5)
+
+    def test_failing_replicas_are_ejected_and_let_back(self):
+        self.request('bad', 0, ok=False)
+        self.request('bad', 0, ok=False)
+        self.assertEqual(self.balancer.ejected(), ['bad'])
+        self.assertEqual({self.balancer.choose(['bad', 'good']) for _ in range(20)}, {'good'})
+
+        # Better a failing replica than none
+        self.assertEqual(self.balancer.choose(['bad']), 'bad')
+
+        self.now += 10
+        self.assertEqual(self.balancer.ejected(), [])
+
+        # Back on probation, one more failure ejects it for twice as long.
+        self.request('bad', 0, ok=False)
+        self.assertEqual(self.balancer.endpoints['bad'].ejected_until, self.now + 20)
+
+        self.now += 20
+        self.request('bad', .01)
+        self.assertEqual((self.balancer.endpoints['bad'].failures, self.balancer.endpoints['bad'].ejections), (0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+# Standard imports
+import time
+import socket
+import logging
+import threading
+import unittest
+
+# Relative import
+from Hermes.BinaryStar import BinaryStar, PRIMARY, BACKUP, ACTIVE, PASSIVE
+from Hermes.CoreCatalogService import CoreCatalogService
+from Hermes.Message import Message
+from Hermes.DBP import commands
+
+# External imports
+import zmq
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class TestBinaryStar(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.ctx = zmq.Context()
+        self.now = 0.0
+        self.primary = BinaryStar(True, 'inproc://primary', 'inproc://backup', ctx=self.ctx, clock=self.clock)
+        self.backup = BinaryStar(False, 'inproc://backup', 'inproc://primary', ctx=self.ctx, clock=self.clock)
+
+    def tearDown(self) -> None:
+        self.primary.close()
+        self.backup.close()
+        self.ctx.term()
+
+    def clock(self):
+        return self.now
+
+    def exchange(self, *stars):
+        for star in stars:
+            star.tick()
+        time.sleep(.01)
+
+    def test_pair_settles(self):
+        self.assertTrue(self.primary.request())
+        self.assertFalse(self.backup.request())
+
+        self.exchange(self.primary, self.backup, self.primary, self.backup)
+        self.assertEqual((self.primary.state, self.backup.state), (ACTIVE, PASSIVE))
+        self.assertFalse(self.backup.request())
+
+    def test_backup_takes_over_from_a_quiet_primary(self):
+        taken_over = []
+        self.backup.on_active.append(lambda: taken_over.append(True))
+        self.exchange(self.primary, self.backup, self.primary, self.backup)
+
+        self.now += 1.5
+        self.exchange(self.backup)
+        self.assertEqual(self.backup.state, PASSIVE)
+
+        self.now += 1
+        self.exchange(self.backup)
+        self.assertEqual(self.backup.state, ACTIVE)
+        self.assertEqual(taken_over, [True])
+
+    def test_restarted_primary_stands_by(self):
+        self.backup.state = ACTIVE
+        self.exchange(self.backup, self.primary)
+        self.assertEqual(self.primary.state, PASSIVE)
+
+    def test_dual_actives_settle_on_the_newest_catalog(self):
+        self.primary.state = self.backup.state = ACTIVE
+        self.backup.status = lambda: {'version': 10}
+        self.primary.status = lambda: {'version': 3}
+
+        self.exchange(self.primary, self.backup, self.primary)
+        self.assertEqual((self.primary.state, self.backup.state), (PASSIVE, ACTIVE))
+
+
+class TestCatalogPair(unittest.TestCase):
+
+    def setUp(self) -> None:
+        primary, backup = free_port(), free_port()
+
+        self.catalogs = [
+            CoreCatalogService(name='primary', log_level=logging.CRITICAL, ha_heartbeat=.1,
+                               ha_bind=f'tcp://127.0.0.1:{primary}', peer=f'tcp://127.0.0.1:{backup}'),
+            CoreCatalogService(name='backup', log_level=logging.CRITICAL, ha_heartbeat=.1, primary=False,
+                               ha_bind=f'tcp://127.0.0.1:{backup}', peer=f'tcp://127.0.0.1:{primary}')]
+        self.threads = [threading.Thread(target=ccs.loop.start) for ccs in self.catalogs]
+        for thread in self.threads:
+            thread.start()
+
+        self.ctx = zmq.Context()
+
+    def tearDown(self) -> None:
+        for ccs, thread in zip(self.catalogs, self.threads):
+            ccs.stop()
+            thread.join(5)
+            ccs.close()
+            ccs.beacon.close()
+        self.ctx.destroy(linger=0)
+
+    def request(self, ccs, command, body) -> Message:
+        dealer = self.ctx.socket(zmq.DEALER)
+        dealer.connect(f"tcp://127.0.0.1:{ccs.loop.interfaces['router']['port']}")
+        Message(dealer).send(command=command, body=body)
+        self.assertTrue(dealer.poll(2000))
+
+        msg = Message(dealer)
+        msg.recv()
+        dealer.close(linger=0)
+        return msg
+
+    def wait_for(self, condition, timeout=3):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(.05)
+
+    def test_backup_takes_over_with_the_catalog(self):
+        primary, backup = self.catalogs
+        self.wait_for(lambda: (primary.star.state, backup.star.state) == (ACTIVE, PASSIVE))
+
+        self.request(primary, commands['Registration'], {'name': 'rohan', 'port': 5246})
+        self.assertEqual(self.request(backup, commands['Info_Req'], '').command, commands['Denied'])
+        self.wait_for(lambda: backup.replica is not None and 'rohan' in backup.replica.services)
+
+        primary.stop()
+        self.threads[0].join(5)
+        self.wait_for(lambda: backup.star.state == ACTIVE)
+
+        self.assertEqual(self.request(backup, commands['Info_Req'], 'rohan').payload, {'rohan': {'port': 5246}})
+        self.assertEqual(backup.catalog.version, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
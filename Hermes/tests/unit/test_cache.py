@@ -0,0 +1,52 @@
+# Standard imports
+import unittest
+
+# Relative import
+from Hermes.Cache import ReplyCache
+
+
+class FakeClock():
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestReplyCache(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.clock = FakeClock()
+        self.cache = ReplyCache(maxsize=2, ttl=1.0, clock=self.clock)
+
+    def test_least_recently_used_is_evicted(self):
+        self.cache.put(b'a', [[b'A']])
+        self.cache.put(b'b', [[b'B']])
+        self.assertEqual(self.cache.get(b'a'), [[b'A']])
+
+        self.cache.put(b'c', [[b'C']])
+        self.assertIsNone(self.cache.get(b'b'))
+        self.assertEqual(self.cache.get(b'a'), [[b'A']])
+        self.assertEqual(self.cache.evictions, 1)
+
+    def test_entries_expire(self):
+        self.cache.put(b'a', [[b'A']])
+        self.clock.now += 1.0
+        self.assertIsNone(self.cache.get(b'a'))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_stale_replies_are_not_stored(self):
+        generation = self.cache.generation
+        self.cache.clear()
+
+        self.cache.put(b'a', [[b'A']], generation)
+        self.assertIsNone(self.cache.get(b'a'))
+
+        self.cache.put(b'a', [[b'A']], self.cache.generation)
+        self.cache.invalidate(b'a')
+        self.assertIsNone(self.cache.get(b'a'))
+        self.assertEqual(self.cache.as_dict()['misses'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
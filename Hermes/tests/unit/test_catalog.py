@@ -0,0 +1,87 @@
+# Standard imports
+import unittest
+
+# Relative import
+from Hermes.Catalog import Catalog, VERSION
+from Hermes.Message import codecs, DEFAULT_CODEC
+
+
+class TestCatalog(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.catalog = Catalog()
+        self.catalog.register('rohan', {'port': 5246})
+        self.catalog.register('gondor', {'port': 5247})
+
+    def decode(self, encoded):
+        return codecs[DEFAULT_CODEC].decode(encoded.frames[0])
+
+    def test_versions(self):
+        self.assertEqual(self.catalog.version, 2)
+        self.assertEqual(self.catalog.modified('rohan'), 1)
+
+        self.assertEqual(self.catalog.update('rohan', {'port': 6000}), 3)
+        self.assertEqual(self.catalog.modified('rohan'), 3)
+        self.assertEqual(self.catalog.modified('gondor'), 2)
+
+        self.assertEqual(self.catalog.remove('gondor'), 4)
+        with self.assertRaises(KeyError):
+            self.catalog.modified('gondor')
+
+    def test_snapshots_are_encoded_once(self):
+        version, snapshot = self.catalog.lookup()
+        self.assertEqual(version, 2)
+        self.assertEqual(self.decode(snapshot), {'rohan': {'port': 5246}, 'gondor': {'port': 5247}})
+        self.assertEqual(VERSION.unpack(snapshot.frames[1])[0], 2)
+        self.assertIs(self.catalog.lookup()[1], snapshot)
+
+        _, entry = self.catalog.lookup('gondor')
+        self.catalog.update('rohan', {'port': 6000})
+
+        # Only what changed is encoded again.
+        self.assertIsNot(self.catalog.lookup()[1], snapshot)
+        self.assertIs(self.catalog.lookup('gondor')[1], entry)
+        self.assertEqual(self.decode(self.catalog.lookup('rohan')[1]), {'rohan': {'port': 6000}})
+
+    def test_indexes_follow_changes(self):
+        self.catalog.update('rohan', {'topics': ['weather'], 'tags': ['north'],
+                                      'interfaces': {'router': {'ip': '10.0.0.2', 'port': 5246}}})
+        self.catalog.register('gondor', {'topics': ['weather', 'beacons'],
+                                         'interfaces': {'router': {'ip': '10.0.0.3', 'port': 5247}}})
+
+        self.assertEqual(self.catalog.indexes['topic']['weather'], {'rohan', 'gondor'})
+        self.assertEqual(self.catalog.match({'host': '10.0.0.2'}), {'rohan'})
+        self.assertEqual(self.catalog.match({'topic': 'weather', 'tag': 'north'}), {'rohan'})
+        self.assertEqual(self.catalog.match({'topic': ['beacons', 'ravens']}), {'gondor'})
+        self.assertEqual(self.catalog.match({'interface': 'router'}), {'rohan', 'gondor'})
+
+        self.catalog.update('rohan', {'topics': None})
+        self.catalog.remove('gondor')
+        self.assertNotIn('weather', self.catalog.indexes['topic'])
+        self.assertEqual(self.catalog.match({'topic': 'weather'}), set())
+
+        # Fields without an index are checked one service at a time.
+        self.assertEqual(self.catalog.match({'port': 5246}), {'rohan'})
+
+    def test_queries_are_projected(self):
+        self.catalog.update('gondor', {'topics': ['beacons']})
+
+        version, body = self.catalog.query({'topic': 'beacons'}, ['port', 'owner'])
+        self.assertEqual(version, 3)
+        self.assertEqual(self.decode(body), {'gondor': {'port': 5247}})
+        self.assertEqual(self.decode(self.catalog.query()[1]), self.catalog.services)
+
+    def test_restore_rebuilds_indexes(self):
+        self.catalog.restore({'mordor': {'topics': ['rings']}}, 10)
+        self.assertEqual(self.catalog.indexes['topic'], {'rings': {'mordor'}})
+        self.assertEqual(self.catalog.match({}), {'mordor'})
+
+    def test_unknown_service(self):
+        with self.assertRaises(KeyError):
+            self.catalog.lookup('mordor')
+        with self.assertRaises(KeyError):
+            self.catalog.update('mordor', {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+# Standard imports
+import logging
+import threading
+import unittest
+from unittest import mock
+
+# Relative import
+from Hermes.Client import Client
+from Hermes.Message import Message
+from Hermes.DBP import commands
+
+# External imports
+import zmq
+
+
+class TestResolution(unittest.TestCase):
+
+    def setUp(self) -> None:
+        # No catalog to discover. Lookups are stubbed out below.
+        with mock.patch.object(Client, 'discover', return_value=None):
+            self.client = Client(log_level=logging.CRITICAL)
+        self.client.connected = True
+
+        self.catalog = {}
+        self.lookups = 0
+        self.client._info_request = self.info_request
+
+        # A service which answers pings, bound to a port the catalog will hand out.
+        self.service_ctx = zmq.Context()
+        self.service = self.service_ctx.socket(zmq.REP)
+        self.port = self.service.bind_to_random_port('tcp://127.0.0.1')
+        self.thread = threading.Thread(target=self.answer, daemon=True)
+        self.thread.start()
+
+    def tearDown(self) -> None:
+        self.client.ctx.destroy(linger=0)
+        # Terminating wakes the service thread, which closes its own socket.
+        self.service_ctx.term()
+        self.thread.join(1)
+
+    def info_request(self, name='', since=None):
+        self.lookups += 1
+        if name in self.catalog:
+            return {name: self.catalog[name]}
+
+        # Names only registered as instances are answered with all of them.
+        found = {key: info for key, info in self.catalog.items() if info.get('service') == name}
+        return found or None
+
+    def answer(self):
+        try:
+            while True:
+                msg = Message(self.service)
+                msg.recv()
+                msg.send(command=commands['Pong'], body='Hello back!')
+        except zmq.ContextTerminated:
+            self.service.close()
+
+    def register(self, name, port):
+        self.catalog[name] = {'interfaces': {'router': {'ip': '127.0.0.1', 'port': port}}}
+
+    def test_lookups_are_cached(self):
+        self.register('rohan', self.port)
+
+        for _ in range(3):
+            self.assertEqual(self.client.request_from_service(name='rohan'), 'Hello back!')
+
+        self.assertEqual(self.lookups, 1)
+
+        self.client.resolutions['rohan'] = (0, self.client.resolutions['rohan'][1])
+        self.client.resolve('rohan')
+        self.assertEqual(self.lookups, 2)
+
+    def test_unknown_services_are_cached(self):
+        self.assertIsNone(self.client.request_from_service(name='mordor'))
+        self.assertIsNone(self.client.request_from_service(name='mordor'))
+        self.assertEqual(self.lookups, 1)
+
+        self.register('mordor', self.port)
+        self.assertIsNone(self.client.resolve('mordor'))
+        self.assertIsNotNone(self.client.resolve('mordor', refresh=True))
+
+    def test_stale_address_is_looked_up_again(self):
+        # Nothing is listening where the cache says rohan is.
+        dead = self.client.ctx.socket(zmq.ROUTER)
+        dead_port = dead.bind_to_random_port('tcp://127.0.0.1')
+        dead.close(linger=0)
+
+        self.register('rohan', dead_port)
+        self.client.resolve('rohan')
+        self.register('rohan', self.port)
+
+        self.assertEqual(self.client.request_from_service(name='rohan', timeout=200), 'Hello back!')
+        self.assertEqual(self.lookups, 2)
+        self.assertEqual(self.client.resolutions['rohan'][1]['interfaces']['router']['port'], self.port)
+
+    def test_requests_are_spread_over_instances(self):
+        # A second instance of rohan, answering on its own port
+        other = self.service_ctx.socket(zmq.REP)
+        other_port = other.bind_to_random_port('tcp://127.0.0.1')
+        answered = []
+
+        def answer_other():
+            try:
+                while True:
+                    msg = Message(other)
+                    msg.recv()
+                    answered.append(True)
+                    msg.send(command=commands['Pong'], body='Hello back!')
+            except zmq.ContextTerminated:
+                other.close()
+
+        threading.Thread(target=answer_other, daemon=True).start()
+
+        for instance, port in ((1, self.port), (2, other_port)):
+            self.catalog[f'rohan@{instance}'] = {
+                'service': 'rohan', 'interfaces': {'router': {'ip': '127.0.0.1', 'port': port}}}
+
+        for _ in range(20):
+            self.assertEqual(self.client.request_from_service(name='rohan'), 'Hello back!')
+
+        self.assertGreater(len(answered), 0)
+        self.assertLess(len(answered), 20)
+        self.assertEqual(len(self.client.balancer.endpoints), 2)
+        self.assertEqual(self.lookups, 1)
+
+    def test_departed_instances_are_dropped_from_the_balancer(self):
+        for instance in (1, 2):
+            self.catalog[f'rohan@{instance}'] = {
+                'service': 'rohan', 'interfaces': {'router': {'ip': '127.0.0.1', 'port': 7000 + instance}}}
+
+        self.client.choose('rohan')
+        self.client.choose('rohan')
+        self.assertEqual(len(self.client.balancer.endpoints), 2)
+
+        del self.catalog['rohan@2']
+        self.client.choose('rohan', refresh=True)
+        self.assertEqual(list(self.client.balancer.endpoints), ['tcp://127.0.0.1:7001'])
+
+        self.client.forget('rohan')
+        self.assertEqual(self.client.balancer.endpoints, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+# Standard imports
+import time
+import unittest
+
+# Relative import
+from Hermes.Catalog import Catalog
+from Hermes.Clone import CatalogFeed, Replica
+
+# External imports
+import zmq
+
+
+class TestReplica(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.ctx = zmq.Context()
+        self.publisher = self.ctx.socket(zmq.PUB)
+        self.publisher.bind('inproc://catalog-feed')
+        self.subscriber = self.ctx.socket(zmq.SUB)
+        self.subscriber.connect('inproc://catalog-feed')
+        self.subscriber.setsockopt(zmq.SUBSCRIBE, b'')
+
+        self.catalog = Catalog()
+        self.catalog.register('rohan', {'port': 5246})
+        self.feed = CatalogFeed(self.publisher, self.catalog)
+
+        self.snapshots = 0
+        self.replica = Replica(self.subscriber, self.snapshot)
+        self.replica.sync()
+
+    def tearDown(self) -> None:
+        self.ctx.destroy(linger=0)
+
+    def snapshot(self):
+        self.snapshots += 1
+        return self.catalog.version, {name: dict(info) for name, info in self.catalog.services.items()}
+
+    def settle(self):
+        # inproc delivery is not instant once the sockets are in different threads' hands.
+        self.assertTrue(self.subscriber.poll(1000))
+        time.sleep(.01)
+
+    def test_deltas_are_applied_in_order(self):
+        self.catalog.register('gondor', {'port': 5247})
+        self.catalog.update('rohan', {'port': 6000})
+        self.catalog.remove('gondor')
+        self.settle()
+
+        self.assertEqual(self.replica.update(), 3)
+        self.assertEqual(self.replica.services, {'rohan': {'port': 6000}})
+        self.assertEqual(self.replica.version, 4)
+        self.assertEqual(self.snapshots, 1)
+
+    def test_deltas_already_in_the_snapshot_are_skipped(self):
+        self.catalog.register('gondor', {'port': 5247})
+        self.replica.sync()
+        self.settle()
+
+        self.assertEqual(self.replica.update(), 0)
+        self.assertEqual(self.replica.version, 2)
+
+    def test_missed_delta_forces_a_resync(self):
+        self.catalog.listeners.remove(self.feed.publish)
+        self.catalog.register('gondor', {'port': 5247})
+        self.catalog.listeners.append(self.feed.publish)
+        self.catalog.register('mordor', {'port': 5248})
+        self.settle()
+
+        self.replica.update()
+        self.assertEqual(self.replica.resyncs, 1)
+        self.assertEqual(set(self.replica.services), {'rohan', 'gondor', 'mordor'})
+        self.assertEqual(self.replica.version, 3)
+
+    def test_heartbeat_reveals_a_missed_last_delta(self):
+        self.catalog.listeners.remove(self.feed.publish)
+        self.catalog.register('gondor', {'port': 5247})
+        self.feed.version = self.catalog.version
+        self.feed.heartbeat()
+        self.settle()
+
+        self.replica.update()
+        self.assertEqual(self.replica.resyncs, 1)
+        self.assertIn('gondor', self.replica.services)
+
+    def test_deltas_wait_for_the_socket_owner(self):
+        flushes = []
+        self.feed.call_soon = flushes.append
+
+        self.catalog.register('gondor', {'port': 5247})
+        self.catalog.update('rohan', {'port': 6000})
+        self.assertFalse(self.subscriber.poll(50))
+
+        for flush in flushes:
+            flush()
+        self.settle()
+
+        self.assertEqual(self.replica.update(), 2)
+        self.assertEqual(self.replica.version, 3)
+        self.assertEqual(self.replica.resyncs, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
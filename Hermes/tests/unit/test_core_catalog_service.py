@@ -0,0 +1,145 @@
+# Standard imports
+import time
+import logging
+import threading
+import unittest
+
+# Relative import
+from Hermes.CoreCatalogService import CoreCatalogService
+from Hermes.Catalog import VERSION
+from Hermes.Clone import Replica, read_snapshot
+from Hermes.Message import Message
+from Hermes.DBP import commands
+
+# External imports
+import zmq
+
+
+class TestCoreCatalogService(unittest.TestCase):
+
+    def setUp(self) -> None:
+        """
+        Runs a catalog on a background thread with a dealer to talk to it.
+        """
+        self.ccs = CoreCatalogService(log_level=logging.CRITICAL)
+        self.thread = threading.Thread(target=self.ccs.loop.start)
+        self.thread.start()
+
+        self.ctx = zmq.Context()
+        self.dealer = self.ctx.socket(zmq.DEALER)
+        self.dealer.connect(f"tcp://127.0.0.1:{self.ccs.loop.interfaces['router']['port']}")
+
+    def tearDown(self) -> None:
+        self.ccs.stop()
+        self.thread.join(5)
+        self.ctx.destroy(linger=0)
+        self.ccs.beacon.close()
+
+    def request(self, command, body) -> Message:
+        Message(self.dealer).send(command=command, body=body)
+        self.assertTrue(self.dealer.poll(2000))
+
+        msg = Message(self.dealer)
+        msg.recv()
+        return msg
+
+    def test_lookups_carry_the_catalog_version(self):
+        self.assertEqual(self.request(commands['Registration'], {'name': 'rohan', 'port': 5246}).command,
+                         commands['Approved'])
+
+        reply = self.request(commands['Info_Req'], '')
+        self.assertEqual(reply.payload, {'rohan': {'port': 5246}})
+        self.assertEqual(VERSION.unpack(reply.body[1])[0], 1)
+
+        reply = self.request(commands['Info_Req'], 'rohan')
+        self.assertEqual(reply.payload, {'rohan': {'port': 5246}})
+
+        self.assertIn('Error', self.request(commands['Info_Req'], 'mordor').payload)
+
+    def test_unchanged_since(self):
+        self.request(commands['Registration'], {'name': 'rohan', 'port': 5246})
+
+        reply = self.request(commands['Info_Req'], {'name': '', 'since': 1})
+        self.assertEqual(reply.command, commands['Unchanged'])
+        self.assertEqual(reply.payload, 1)
+
+        self.request(commands['Update'], {'name': 'rohan', 'port': 6000})
+        reply = self.request(commands['Info_Req'], {'name': 'rohan', 'since': 1})
+        self.assertEqual(reply.command, commands['Info_Rep'])
+        self.assertEqual(reply.payload, {'rohan': {'port': 6000}})
+        self.assertEqual(VERSION.unpack(reply.body[1])[0], 2)
+
+    def test_queries_filter_and_project(self):
+        self.request(commands['Registration'], [
+            {'name': 'rohan', 'port': 5246, 'topics': ['weather', 'horses']},
+            {'name': 'gondor', 'port': 5247, 'topics': ['beacons']}])
+
+        reply = self.request(commands['Info_Req'], {'where': {'topic': 'horses'}, 'fields': ['port']})
+        self.assertEqual(reply.payload, {'rohan': {'port': 5246}})
+        self.assertEqual(VERSION.unpack(reply.body[1])[0], 2)
+
+        self.request(commands['Update'], {'name': 'gondor', 'topics': ['beacons', 'horses']})
+        reply = self.request(commands['Info_Req'], {'where': {'topic': 'horses'}, 'fields': ['port']})
+        self.assertEqual(reply.payload, {'rohan': {'port': 5246}, 'gondor': {'port': 5247}})
+
+        reply = self.request(commands['Info_Req'], {'where': {'topic': 'horses'}, 'since': 3})
+        self.assertEqual(reply.command, commands['Unchanged'])
+
+    def test_instances_are_kept_side_by_side(self):
+        for instance, port in ((1, 5246), (2, 5247)):
+            self.request(commands['Registration'], {'name': 'rohan', 'instance': instance, 'port': port})
+
+        self.assertEqual(self.request(commands['Info_Req'], 'rohan').payload, {
+            'rohan@1': {'service': 'rohan', 'port': 5246},
+            'rohan@2': {'service': 'rohan', 'port': 5247}})
+
+        self.assertEqual(self.request(commands['Update'], {'name': 'rohan@2', 'port': 6000}).command,
+                         commands['Acknowledged'])
+        self.assertEqual(self.request(commands['Info_Req'], 'rohan@2').payload,
+                         {'rohan@2': {'service': 'rohan', 'port': 6000}})
+
+    def test_snapshot_feeds_a_replica(self):
+        self.request(commands['Registration'], {'name': 'rohan', 'port': 5246})
+
+        version, services, port = read_snapshot(self.request(commands['Snapshot'], ''))
+        self.assertEqual((version, services), (1, {'rohan': {'port': 5246}}))
+        self.assertEqual(port, self.ccs.loop.interfaces['publisher']['port'])
+
+        subscriber = self.ctx.socket(zmq.SUB)
+        subscriber.connect(f"tcp://127.0.0.1:{port}")
+        subscriber.setsockopt(zmq.SUBSCRIBE, b'')
+        replica = Replica(subscriber, lambda: read_snapshot(self.request(commands['Snapshot'], ''))[:2])
+
+        # The feed's heartbeat shows the subscription is through.
+        self.assertTrue(subscriber.poll(3000))
+        replica.update()
+
+        self.request(commands['Update'], {'name': 'rohan', 'port': 6000})
+        self.assertTrue(subscriber.poll(2000))
+        replica.update()
+        self.assertEqual(replica.services, {'rohan': {'port': 6000}})
+        self.assertEqual(replica.version, 2)
+
+    def test_silent_services_are_evicted(self):
+        self.request(commands['Registration'], {'name': 'rohan', 'port': 5246, 'liveliness': 100, 'retries': 2})
+        self.request(commands['Registration'], {'name': 'gondor', 'port': 5247, 'liveliness': 100, 'retries': 2})
+
+        for _ in range(6):
+            Message(self.dealer).send(command=commands['Heartbeat'], body='gondor')
+            time.sleep(.05)
+
+        self.assertEqual(set(self.request(commands['Info_Req'], '').payload), {'gondor'})
+
+        # Heartbeats from services the catalog does not know are turned away.
+        Message(self.dealer).send(command=commands['Heartbeat'], body='rohan')
+        self.assertTrue(self.dealer.poll(2000))
+        msg = Message(self.dealer)
+        msg.recv()
+        self.assertEqual(msg.command, commands['Denied'])
+
+    def test_update_of_unknown_service_is_denied(self):
+        self.assertEqual(self.request(commands['Update'], {'name': 'mordor'}).command, commands['Denied'])
+
+
+if __name__ == '__main__':
+    unittest.main()
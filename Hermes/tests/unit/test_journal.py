@@ -0,0 +1,99 @@
+# Standard imports
+import logging
+import tempfile
+import threading
+import unittest
+
+# Relative import
+from Hermes.Journal import Journal
+from Hermes.Catalog import Catalog
+from Hermes.CoreCatalogService import CoreCatalogService
+
+
+class TestJournal(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.catalog = Catalog()
+        self.journal = self.open()
+
+    def tearDown(self) -> None:
+        self.journal.close()
+        self.directory.cleanup()
+
+    def open(self, compact_every=10000) -> Journal:
+        journal = Journal(self.directory.name, source=self.catalog.copy, compact_every=compact_every)
+        self.catalog.listeners = [journal.append]
+        return journal
+
+    def reopen(self, **kwargs):
+        self.journal.close()
+        self.journal = Journal(self.directory.name, **kwargs)
+        return self.journal.recover()
+
+    def test_log_replays_every_change(self):
+        self.catalog.register('rohan', {'port': 5246})
+        self.catalog.register('gondor', {'port': 5247})
+        self.catalog.update('rohan', {'port': 6000})
+        self.catalog.remove('gondor')
+
+        # One write for everything queued.
+        self.assertEqual(self.journal.flush(), 4)
+        self.assertEqual(self.reopen(), (4, {'rohan': {'port': 6000}}))
+        self.assertEqual(self.journal.logged, 4)
+
+    def test_torn_records_are_cut_off(self):
+        self.catalog.register('rohan', {'port': 5246})
+        self.journal.flush()
+
+        with open(self.journal.log_path, 'ab') as log:
+            log.write(b'\x00\x00\x01\x00torn')
+
+        self.assertEqual(self.reopen(), (1, {'rohan': {'port': 5246}}))
+        with open(self.journal.log_path, 'rb') as log:
+            self.assertNotIn(b'torn', log.read())
+
+    def test_compaction_bounds_the_log(self):
+        self.journal.close()
+        self.journal = self.open(compact_every=10)
+
+        for port in range(25):
+            self.catalog.register('rohan', {'port': port})
+            self.journal.flush()
+
+        # Two snapshots were taken, so only the last five records are left to replay.
+        self.assertEqual(self.reopen(), (25, {'rohan': {'port': 24}}))
+        self.assertEqual(self.journal.logged, 5)
+
+
+class TestDurableCatalog(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def run_catalog(self) -> CoreCatalogService:
+        ccs = CoreCatalogService(log_level=logging.CRITICAL, journal=self.directory.name)
+        self.addCleanup(ccs.beacon.close)
+        return ccs
+
+    def test_restart_keeps_registrations(self):
+        ccs = self.run_catalog()
+        ccs._register({'name': 'rohan', 'port': 5246})
+        ccs._update({'name': 'rohan', 'topics': ['horses']})
+        ccs.close()
+        ccs.loop.stop()
+
+        ccs = self.run_catalog()
+        self.assertEqual(ccs.services, {'rohan': {'port': 5246, 'topics': ['horses']}})
+        self.assertEqual(ccs.catalog.version, 2)
+        self.assertEqual(ccs.catalog.match({'topic': 'horses'}), {'rohan'})
+        self.assertIn('rohan', ccs.liveness)
+        ccs.close()
+        ccs.loop.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
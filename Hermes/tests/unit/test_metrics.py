@@ -0,0 +1,69 @@
+# Standard imports
+import threading
+import unittest
+
+# Relative import
+from Hermes.Metrics import Histogram, Metrics, bucket_index, bucket_floor, BUCKETS
+from Hermes.DBP import commands
+
+
+class TestHistogram(unittest.TestCase):
+
+    def test_buckets_hold_their_values(self):
+        for value in list(range(100)) + [1000, 123456, 10 ** 9, 2 ** 64 - 1]:
+            index = bucket_index(value)
+            self.assertLess(index, BUCKETS)
+            self.assertLessEqual(bucket_floor(index), value)
+            self.assertGreater(bucket_floor(index + 1), value)
+
+    def test_buckets_stay_within_an_eighth(self):
+        for index in range(16, BUCKETS - 1):
+            low, high = bucket_floor(index), bucket_floor(index + 1)
+            self.assertLessEqual((high - low) / low, 0.125)
+
+    def test_percentiles(self):
+        histogram = Histogram()
+        for value in range(1, 1001):
+            histogram.record(value)
+
+        self.assertEqual(histogram.count, 1000)
+        self.assertEqual(histogram.max, 1000)
+        self.assertAlmostEqual(histogram.percentile(50), 500, delta=500 * 0.125)
+        self.assertAlmostEqual(histogram.percentile(99), 990, delta=990 * 0.125)
+        self.assertEqual(histogram.percentile(100), 1000)
+
+    def test_empty(self):
+        self.assertEqual(Histogram().as_dict()['p99'], 0)
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_threads_are_summed(self):
+        metrics = Metrics()
+
+        def record():
+            for _ in range(1000):
+                counters = metrics.command(commands['Ping'])
+                counters.received += 1
+                counters.latency.record(100)
+
+        threads = [threading.Thread(target=record) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot['ping']['received'], 4000)
+        self.assertEqual(snapshot['ping']['latency_ns']['count'], 4000)
+
+    def test_names(self):
+        metrics = Metrics()
+        metrics.command(commands['Registration']).rejected += 1
+        metrics.command(None).rejected += 1
+
+        self.assertEqual(set(metrics.snapshot()), {'Registration', 'invalid'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+# Standard imports
+import time
+import asyncio
+import logging
+import threading
+import unittest
+
+# Relative import
+from Hermes.Reactor import Reactor
+from Hermes.Pipeline import Pipeline
+from Hermes.Message import Message
+from Hermes.DBP import commands
+
+# External imports
+import zmq
+
+
+class TestPipeline(unittest.TestCase):
+
+    def setUp(self) -> None:
+        """
+        Runs a reactor whose handler answers after however many milliseconds it is asked to, so replies come
+        back out of order.
+        """
+        self.reactor = Reactor(
+            socs={'router': zmq.ROUTER},
+            msg_handlers={commands['Ping']: self.echo},
+            log_level=logging.CRITICAL)
+        self.thread = threading.Thread(target=self.reactor.start)
+        self.thread.start()
+
+        self.addr = f"tcp://127.0.0.1:{self.reactor.interfaces['router']['port']}"
+        self.pipeline = Pipeline(timeout=2000)
+
+    def tearDown(self) -> None:
+        self.pipeline.close()
+        self.reactor.stop()
+        self.thread.join(5)
+
+    def echo(self, msg: Message):
+        time.sleep(msg.payload / 1000)
+        msg.send(command=commands['Pong'], body=msg.payload)
+
+    def test_replies_are_matched_to_requests(self):
+        delays = [(n * 7) % 50 for n in range(200)]
+
+        started = time.monotonic()
+        futures = [self.pipeline.request(self.addr, commands['Ping'], delay) for delay in delays]
+        replies = [future.result(5) for future in futures]
+
+        self.assertEqual([reply.payload for reply in replies], delays)
+        self.assertEqual(self.pipeline.in_flight, 0)
+
+        # All of them were in flight at once, not one after the other.
+        self.assertLess(time.monotonic() - started, sum(delays) / 1000)
+
+    def test_requests_time_out_on_their_own(self):
+        slow = self.pipeline.request(self.addr, commands['Ping'], 300, timeout=50)
+        fast = self.pipeline.request(self.addr, commands['Ping'], 0, timeout=1000)
+
+        self.assertEqual(fast.result(2).payload, 0)
+        with self.assertRaises(TimeoutError):
+            slow.result(2)
+
+    def test_answered_requests_leave_the_deadline_heap(self):
+        for _ in range(5):
+            futures = [self.pipeline.request(self.addr, commands['Ping'], 0, timeout=60000) for _ in range(100)]
+            for future in futures:
+                future.result(5)
+
+        # The thread only waits on what is still pending, not on the answered requests' deadlines.
+        self.assertIsNone(self.pipeline._poll_timeout())
+        self.assertLessEqual(len(self.pipeline._deadlines), 100)
+
+    def test_cancelled_requests_do_not_stop_the_pipeline(self):
+        async def give_up():
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(self.pipeline.arequest(self.addr, commands['Ping'], 200), 0.05)
+
+        asyncio.run(give_up())
+        cancelled = self.pipeline.request(self.addr, commands['Ping'], 200, timeout=100)
+        cancelled.cancel()
+
+        # Both replies, or deadlines, come in after the callers gave up on them.
+        time.sleep(0.4)
+        self.assertEqual(self.pipeline.request(self.addr, commands['Ping'], 0).result(2).payload, 0)
+
+    def test_awaitable(self):
+        async def ask():
+            return await self.pipeline.arequest(self.addr, commands['Ping'], 1)
+
+        self.assertEqual(asyncio.run(ask()).payload, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
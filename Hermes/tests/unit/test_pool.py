@@ -0,0 +1,64 @@
+# Standard imports
+import logging
+import unittest
+
+# Relative import
+from Hermes.Node import Node
+from Hermes.Pool import ConnectionPool
+
+# External imports
+import zmq
+
+
+class TestConnectionPool(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.now = 0.0
+        self.node = Node(name='pool', log_level=logging.CRITICAL)
+        self.pool = ConnectionPool(self.node, zmq.REQ, max_size=2, idle=10, clock=lambda: self.now)
+
+    def tearDown(self) -> None:
+        self.pool.close()
+        self.node.close_ctx()
+
+    def assertPolled(self, names):
+        self.assertEqual(set(self.node.sockets), set(names))
+        self.assertEqual(len(self.node.poller.sockets), len(names))
+
+    def test_sockets_are_reused(self):
+        name = self.pool.connect('tcp://127.0.0.1:6001')
+        self.assertEqual(self.pool.connect('tcp://127.0.0.1:6001'), name)
+        self.assertEqual(self.pool.opened, 1)
+        self.assertPolled([name])
+
+    def test_least_recently_used_is_closed_when_full(self):
+        first = self.pool.connect('tcp://127.0.0.1:6001')
+        second = self.pool.connect('tcp://127.0.0.1:6002')
+        self.pool.connect('tcp://127.0.0.1:6001')
+
+        third = self.pool.connect('tcp://127.0.0.1:6003')
+        self.assertNotIn('tcp://127.0.0.1:6002', self.pool)
+        self.assertPolled([first, third])
+        self.assertNotIn(second, self.node.sockets)
+
+    def test_idle_sockets_are_reaped(self):
+        self.pool.connect('tcp://127.0.0.1:6001')
+        self.now = 5
+        kept = self.pool.connect('tcp://127.0.0.1:6002')
+
+        self.now = 12
+        self.assertEqual(self.pool.reap(), 1)
+        self.assertPolled([kept])
+
+    def test_sockets_closed_by_the_node_are_reopened(self):
+        name = self.pool.connect('tcp://127.0.0.1:6001')
+        self.node.close_socket(name, linger=0)
+
+        self.assertNotIn('tcp://127.0.0.1:6001', self.pool)
+        self.assertEqual(self.pool.connect('tcp://127.0.0.1:6001'), name)
+        self.assertEqual(self.pool.opened, 2)
+        self.assertPolled([name])
+
+
+if __name__ == '__main__':
+    unittest.main()
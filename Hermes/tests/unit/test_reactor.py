@@ -0,0 +1,515 @@
+# Standard imports
+import os
+import time
+import asyncio
+import logging
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+# Relative import
+from Hermes.Reactor import Reactor
+from Hermes.AsyncReactor import AsyncReactor
+from Hermes.ProcessReactor import ProcessReactor
+from Hermes.Message import Message, HEADER, PROTOCOL_VERSION
+from Hermes.DBP import commands, opcodes
+
+# External imports
+import zmq
+
+
+class TestReactor(unittest.TestCase):
+
+    def setUp(self) -> None:
+        """
+        Brings up a reactor with a single router interface and a dealer to talk to it with.
+        """
+        self.handled = []
+        self.reactor = Reactor(
+            socs={'router': zmq.ROUTER},
+            msg_handlers={commands['Ping']: self.echo},
+            log_level=logging.CRITICAL,
+            batch_size=4)
+
+        self.ctx = zmq.Context()
+        self.dealer = self.ctx.socket(zmq.DEALER)
+        self.dealer.connect(f"tcp://127.0.0.1:{self.reactor.interfaces['router']['port']}")
+
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    def tearDown(self) -> None:
+        self.executor.shutdown(wait=True)
+        self.ctx.destroy(linger=0)
+        self.reactor.close_ctx()
+
+    def echo(self, msg: Message):
+        self.handled.append(msg.payload)
+        msg.send(command=commands['Pong'], body=msg.payload)
+
+    def request(self, command, body):
+        Message(self.dealer).send(command=command, body=body)
+
+    def reply(self) -> Message:
+        self.assertTrue(self.dealer.poll(1000))
+        msg = Message(self.dealer)
+        msg.recv()
+        return msg
+
+    def wait_for_messages(self):
+        self.assertTrue(self.reactor.sockets['router'].poll(1000))
+
+    def test_drain_is_bounded_by_batch_size(self):
+        for index in range(10):
+            self.request(commands['Ping'], index)
+
+        total = 0
+        while total < 10:
+            self.wait_for_messages()
+            received = self.reactor.drain('router', self.executor)
+            self.assertLessEqual(received, 4)
+            total += received
+
+        self.executor.shutdown(wait=True)
+        self.reactor.relay(limit=None)
+        self.assertEqual(sorted(self.handled), list(range(10)))
+        self.assertEqual(sorted(self.reply().payload for _ in range(10)), list(range(10)))
+
+    def test_drain_stops_when_empty(self):
+        self.assertEqual(self.reactor.drain('router', self.executor), 0)
+
+    def test_unknown_command_is_denied(self):
+        self.request(commands['Update'], {})
+        self.wait_for_messages()
+        self.assertEqual(self.reactor.drain('router', self.executor), 1)
+
+        self.assertEqual(self.reply().command, commands['Denied'])
+
+    def test_send_batch(self):
+        def burst(msg: Message):
+            msg.send_batch((commands['Pong'], index) for index in range(msg.payload))
+
+        self.reactor.msg_handlers[commands['Ping']] = burst
+        self.request(commands['Ping'], 5)
+        self.wait_for_messages()
+        self.reactor.drain('router', self.executor)
+        self.executor.shutdown(wait=True)
+        self.reactor.relay(limit=None)
+
+        self.assertEqual([self.reply().payload for _ in range(5)], list(range(5)))
+
+    def test_cached_replies_skip_the_executor(self):
+        cache = self.reactor.cache_replies(commands['Ping'])
+
+        self.request(commands['Ping'], 'same')
+        self.wait_for_messages()
+        self.reactor.drain('router', self.executor)
+        self.executor.shutdown(wait=True)
+        self.reactor.relay(limit=None)
+        self.assertEqual(self.reply().payload, 'same')
+
+        # The executor is shut down so only the cache can answer this one.
+        self.request(commands['Ping'], 'same')
+        self.wait_for_messages()
+        self.reactor.drain('router', self.executor)
+        reply = self.reply()
+        self.assertEqual(reply.payload, 'same')
+        self.assertEqual(reply.command, commands['Pong'])
+
+        self.assertEqual(self.handled, ['same'])
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(self.reactor.metrics.snapshot()['ping']['cached'], 1)
+
+        self.reactor.invalidate(commands['Ping'])
+        self.assertEqual(len(cache), 0)
+
+    def test_in_flight_limit_pauses_intake(self):
+        self.reactor._slots = threading.BoundedSemaphore(2)
+        release = threading.Event()
+
+        def blocked(msg: Message):
+            release.wait(5)
+            msg.send(command=commands['Pong'], body=msg.payload)
+
+        self.reactor.msg_handlers[commands['Ping']] = blocked
+        self.executor = ThreadPoolExecutor(max_workers=4)
+        for index in range(3):
+            self.request(commands['Ping'], index)
+
+        time.sleep(0.1)
+        self.assertEqual(self.reactor.drain('router', self.executor), 2)
+        self.assertTrue(self.reactor._paused)
+
+        # Finishing the handlers wakes the loop, which goes back to reading.
+        release.set()
+        self.assertTrue(self.reactor.return_pipe.pull.poll(1000))
+        self.executor.shutdown(wait=True)
+        self.reactor.relay(limit=None)
+        self.assertFalse(self.reactor._paused)
+
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.assertEqual(self.reactor.drain('router', self.executor), 1)
+
+
+class TestRunningReactor(unittest.TestCase):
+
+    def setUp(self) -> None:
+        """
+        Runs a reactor on a background thread so handlers reply from its worker threads.
+        """
+        self.reactor = Reactor(
+            socs={'router': zmq.ROUTER},
+            msg_handlers={commands['Ping']: self.echo},
+            log_level=logging.CRITICAL)
+
+        self.thread = threading.Thread(target=self.reactor.start)
+        self.thread.start()
+
+        self.ctx = zmq.Context()
+        self.dealer = self.ctx.socket(zmq.DEALER)
+        self.dealer.connect(f"tcp://127.0.0.1:{self.reactor.interfaces['router']['port']}")
+
+    def tearDown(self) -> None:
+        self.reactor.stop()
+        self.thread.join(5)
+        self.ctx.destroy(linger=0)
+        self.assertFalse(self.thread.is_alive())
+
+    def echo(self, msg: Message):
+        msg.send(command=commands['Pong'], body=msg.payload)
+
+    def replies(self, count):
+        received = []
+        while len(received) < count and self.dealer.poll(3000):
+            msg = Message(self.dealer)
+            msg.recv()
+            received.append(msg)
+        return received
+
+    def test_replies_from_worker_threads(self):
+        for index in range(50):
+            Message(self.dealer).send(command=commands['Ping'], body=index)
+
+        self.assertEqual(sorted(msg.payload for msg in self.replies(50)), list(range(50)))
+
+    def test_stats(self):
+        for index in range(5):
+            Message(self.dealer).send(command=commands['Ping'], body=index)
+        Message(self.dealer).send(command=commands['Update'], body={})
+        self.replies(6)
+
+        Message(self.dealer).send(command=commands['Stats'], body='')
+        reply = self.replies(1)[0]
+        self.assertEqual(reply.command, commands['Stats'])
+
+        stats = reply.payload
+        self.assertEqual(stats['commands']['ping']['handled'], 5)
+        self.assertEqual(stats['commands']['ping']['latency_ns']['count'], 5)
+        self.assertEqual(stats['commands']['Update']['rejected'], 1)
+        # The Stats request itself may not have been counted by the time its handler ran.
+        self.assertGreaterEqual(stats['lanes']['router']['received'], 6)
+
+    def test_timers_run_on_loop_thread(self):
+        ran = threading.Event()
+        threads = []
+
+        def tick():
+            threads.append(threading.current_thread())
+            ran.set()
+
+        # Added while the loop is asleep in poll, so the pipe wakes it to pick up the new deadline.
+        self.reactor.add_timer('tick', 0.01, tick)
+        self.reactor.return_pipe.wake()
+
+        self.assertTrue(ran.wait(2))
+        self.assertIs(threads[0], self.thread)
+
+    def test_callbacks_run_on_loop_thread_in_order(self):
+        ran = threading.Event()
+        calls = []
+
+        def call(index):
+            calls.append((index, threading.current_thread()))
+            if index == 9:
+                ran.set()
+
+        for index in range(10):
+            self.reactor.call_soon(lambda index=index: call(index))
+
+        self.assertTrue(ran.wait(2))
+        self.assertEqual([index for index, _ in calls], list(range(10)))
+        self.assertTrue(all(thread is self.thread for _, thread in calls))
+
+    def test_corrupt_compressed_body_does_not_stop_the_reactor(self):
+        header = HEADER.pack(PROTOCOL_VERSION, opcodes[commands['Ping']], 0x0011, 0, 0)
+        self.dealer.send_multipart([b'', header, b'not zlib'])
+
+        # Answered as an invalid envelope rather than handled.
+        self.assertEqual(self.replies(1)[0].payload, "Error: Invalid Message Envelope.")
+
+        Message(self.dealer).send(command=commands['Ping'], body='still here')
+        self.assertEqual(self.replies(1)[0].payload, 'still here')
+        self.assertTrue(self.thread.is_alive())
+
+    def test_exit_from_a_handler(self):
+        Message(self.dealer).send(command=commands['Exit'], body='')
+
+        self.assertEqual(self.replies(1)[0].command, commands['Acknowledged'])
+        self.thread.join(5)
+        self.assertFalse(self.thread.is_alive())
+
+
+class TestLanes(unittest.TestCase):
+
+    def setUp(self) -> None:
+        """
+        Brings up a reactor with a bulk and a control router, the control one made to go first.
+        """
+        self.reactor = Reactor(
+            socs={'bulk': zmq.ROUTER, 'control': zmq.ROUTER},
+            msg_handlers={commands['Ping']: lambda msg: None},
+            log_level=logging.CRITICAL,
+            lanes={'bulk': {'quota': 3}, 'control': {'priority': 10}})
+
+        self.ctx = zmq.Context()
+        self.dealers = {}
+        for name in ('bulk', 'control'):
+            self.dealers[name] = self.ctx.socket(zmq.DEALER)
+            self.dealers[name].connect(f"tcp://127.0.0.1:{self.reactor.interfaces[name]['port']}")
+
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    def tearDown(self) -> None:
+        self.executor.shutdown(wait=True)
+        self.ctx.destroy(linger=0)
+        self.reactor.close_ctx()
+
+    def flood(self, name, count):
+        for index in range(count):
+            Message(self.dealers[name]).send(command=commands['Ping'], body=index)
+        self.assertTrue(self.reactor.sockets[name].poll(1000))
+
+    def test_control_lane_is_serviced_first(self):
+        self.flood('bulk', 10)
+        self.flood('control', 1)
+
+        events = [event for event in self.reactor.poller.poll(1000)
+                  if event[0] in self.reactor.socket_names]
+        events.sort(key=self.reactor._rank)
+        self.assertEqual([self.reactor.socket_names[soc] for soc, _ in events], ['control', 'bulk'])
+
+    def test_quota_bounds_each_service(self):
+        self.flood('bulk', 10)
+        time.sleep(0.1)
+
+        self.assertEqual(self.reactor.drain('bulk', self.executor), 3)
+        self.assertEqual(self.reactor.drain('bulk', self.executor), 3)
+
+        stats = self.reactor.lane_stats()['bulk']
+        self.assertEqual(stats['serviced'], 2)
+        self.assertEqual(stats['received'], 6)
+        self.assertEqual(stats['depth'], 3)
+        self.assertEqual(stats['backlogged'], 2)
+        self.assertEqual(self.reactor.lane_stats()['control']['quota'], self.reactor.batch_size)
+
+    def test_bad_quota(self):
+        with self.assertRaises(ValueError):
+            self.reactor.set_lane('bulk', quota=0)
+
+
+def whoami(msg: Message):
+    time.sleep(0.05)
+    msg.send(command=commands['Pong'], body=[msg.payload, os.getpid()])
+
+
+def crash(msg: Message):
+    os._exit(1)
+
+
+class TestProcessReactor(unittest.TestCase):
+
+    def setUp(self) -> None:
+        """
+        Runs a process reactor with two workers on a background thread.
+        """
+        self.reactor = ProcessReactor(
+            socs={'router': zmq.ROUTER},
+            msg_handlers={commands['Ping']: whoami, commands['Info_Req']: crash},
+            log_level=logging.CRITICAL,
+            processes=2)
+
+        self.thread = threading.Thread(target=self.reactor.start)
+        self.thread.start()
+
+        self.ctx = zmq.Context()
+        self.dealer = self.ctx.socket(zmq.DEALER)
+        self.dealer.connect(f"tcp://127.0.0.1:{self.reactor.interfaces['router']['port']}")
+
+    def tearDown(self) -> None:
+        Message(self.dealer).send(command=commands['Exit'], body='')
+        self.thread.join(10)
+        self.ctx.destroy(linger=0)
+        self.assertFalse(self.thread.is_alive())
+
+    def replies(self, count):
+        received = []
+        while len(received) < count and self.dealer.poll(5000):
+            msg = Message(self.dealer)
+            msg.recv()
+            if msg.command == commands['Pong']:
+                received.append(msg)
+        return received
+
+    def test_requests_are_spread_over_workers(self):
+        for index in range(20):
+            Message(self.dealer).send(command=commands['Ping'], body=index)
+
+        replies = [msg.payload for msg in self.replies(20)]
+        self.assertEqual(sorted(index for index, _ in replies), list(range(20)))
+
+        pids = {pid for _, pid in replies}
+        self.assertEqual(len(pids), 2)
+        self.assertNotIn(os.getpid(), pids)
+
+    def test_unknown_command_is_denied_by_worker(self):
+        Message(self.dealer).send(command=commands['Update'], body={})
+        self.assertTrue(self.dealer.poll(5000))
+
+        msg = Message(self.dealer)
+        msg.recv()
+        self.assertEqual(msg.command, commands['Denied'])
+
+    def test_dead_worker_is_replaced(self):
+        Message(self.dealer).send(command=commands['Info_Req'], body={})
+        self.assertTrue(self.dealer.poll(5000))
+
+        msg = Message(self.dealer)
+        msg.recv()
+        self.assertEqual(msg.command, commands['Denied'])
+
+        for index in range(20):
+            Message(self.dealer).send(command=commands['Ping'], body=index)
+
+        replies = [msg.payload for msg in self.replies(20)]
+        self.assertEqual(sorted(index for index, _ in replies), list(range(20)))
+        self.assertEqual(len({pid for _, pid in replies}), 2)
+        self.assertEqual(self.reactor.replaced, 1)
+
+
+class TestAsyncReactor(unittest.TestCase):
+
+    def setUp(self) -> None:
+        """
+        Runs an async reactor on a background thread with a coroutine handler that takes its time.
+        """
+        self.ticks = 0
+        self.blocked_on = []
+        self.reactor = AsyncReactor(
+            socs={'router': zmq.ROUTER},
+            msg_handlers={commands['Ping']: self.slow_echo, commands['Info_Req']: self.sync_echo},
+            timers={'tick': {'interval': 0.05, 'callback': self.tick, 'args': [], 'kwargs': {}},
+                    'block': {'interval': 0.05, 'callback': self.block, 'args': [], 'kwargs': {},
+                              'executor': True}},
+            log_level=logging.CRITICAL)
+
+        self.thread = threading.Thread(target=self.reactor.start)
+        self.thread.start()
+
+        self.ctx = zmq.Context()
+        self.dealer = self.ctx.socket(zmq.DEALER)
+        self.dealer.connect(f"tcp://127.0.0.1:{self.reactor.interfaces['router']['port']}")
+
+    def tearDown(self) -> None:
+        self.reactor.stop()
+        self.thread.join(5)
+        self.ctx.destroy(linger=0)
+        self.assertFalse(self.thread.is_alive())
+
+    async def slow_echo(self, msg: Message):
+        await asyncio.sleep(0.2)
+        await msg.send(command=commands['Pong'], body=msg.payload)
+
+    def sync_echo(self, msg: Message):
+        msg.send(command=commands['Info_Rep'], body=msg.payload)
+
+    def tick(self):
+        self.ticks += 1
+
+    def block(self):
+        self.blocked_on.append(threading.current_thread())
+        time.sleep(0.2)
+
+    def replies(self, count):
+        received = []
+        while len(received) < count and self.dealer.poll(3000):
+            msg = Message(self.dealer)
+            msg.recv()
+            received.append(msg)
+        return received
+
+    def test_concurrent_coroutine_handlers(self):
+        started = time.monotonic()
+        for index in range(200):
+            Message(self.dealer).send(command=commands['Ping'], body=index)
+
+        replies = self.replies(200)
+
+        # Run one after the other these would take 40 seconds.
+        self.assertLess(time.monotonic() - started, 3)
+        self.assertEqual(sorted(msg.payload for msg in replies), list(range(200)))
+
+    def test_plain_handlers(self):
+        Message(self.dealer).send(command=commands['Info_Req'], body='Rohan')
+        reply, = self.replies(1)
+        self.assertEqual((reply.command, reply.payload), (commands['Info_Rep'], 'Rohan'))
+
+    def test_timers_run_on_loop(self):
+        time.sleep(0.3)
+        self.assertGreaterEqual(self.ticks, 3)
+
+    def test_blocking_timers_run_off_the_loop(self):
+        time.sleep(0.1)
+
+        started = time.monotonic()
+        Message(self.dealer).send(command=commands['Info_Req'], body='Rohan')
+        self.assertEqual(len(self.replies(1)), 1)
+
+        # The blocking timer sleeps for 0.2 seconds at a time without holding up the socket.
+        self.assertLess(time.monotonic() - started, 0.15)
+        self.assertTrue(self.blocked_on)
+        self.assertNotIn(self.thread, self.blocked_on)
+
+    def test_timers_added_while_running_are_scheduled(self):
+        ticks = []
+        self.reactor.add_timer('late', 0.05, ticks.append, 'late')
+        time.sleep(0.3)
+        self.assertGreaterEqual(len(ticks), 3)
+
+    def test_failed_socket_task_is_restarted(self):
+        command = self.reactor.metrics.command
+        failures = [RuntimeError("boom")]
+
+        def flaky(name):
+            if failures:
+                raise failures.pop()
+            return command(name)
+
+        self.reactor.metrics.command = flaky
+
+        # The first message is lost with the task that failed on it. The replacement answers the second.
+        Message(self.dealer).send(command=commands['Info_Req'], body='lost')
+        Message(self.dealer).send(command=commands['Info_Req'], body='Rohan')
+        reply, = self.replies(1)
+        self.assertEqual(reply.payload, 'Rohan')
+        self.assertTrue(self.thread.is_alive())
+
+    def test_socket_which_keeps_failing_stops_the_reactor(self):
+        def broken(name):
+            raise RuntimeError("boom")
+
+        self.reactor.metrics.command = broken
+
+        for index in range(self.reactor.max_restarts + 1):
+            Message(self.dealer).send(command=commands['Info_Req'], body=index)
+
+        self.thread.join(5)
+        self.assertFalse(self.thread.is_alive())
@@ -0,0 +1,36 @@
+# Standard imports
+import logging
+import unittest
+from unittest import mock
+
+# Relative import
+from Hermes.Service import Service
+
+
+class TestService(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.service = Service(log_level=logging.CRITICAL)
+
+    def tearDown(self) -> None:
+        self.service.loop.close_ctx()
+        self.service.close_ctx()
+
+    def test_register_without_a_catalog(self):
+        with mock.patch.object(self.service, 'discover', return_value=None) as discover:
+            self.assertFalse(self.service.register())
+
+        # Looked for once more in case the catalog was failing over.
+        self.assertEqual(discover.call_count, 2)
+        self.assertNotIn("service->bus", self.service.sockets)
+
+    def test_heartbeat_keeps_trying_to_rejoin(self):
+        self.service._rejoin = True
+
+        with mock.patch.object(self.service, 'discover', return_value=None):
+            self.service.heartbeat()
+        self.assertTrue(self.service._rejoin)
+
+        with mock.patch.object(self.service, 'register', return_value=True):
+            self.service.heartbeat()
+        self.assertFalse(self.service._rejoin)
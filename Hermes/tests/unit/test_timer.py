@@ -0,0 +1,150 @@
+# Standard imports
+import unittest
+
+# Relative import
+from Hermes.Timer import TimerQueue, TimingWheel, Heartbeater, FIXED_RATE, FIXED_DELAY
+
+
+class FakeClock():
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTimerQueue(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.clock = FakeClock()
+        self.queue = TimerQueue(clock=self.clock)
+        self.calls = []
+
+    def test_timeout_tracks_next_deadline(self):
+        self.assertIsNone(self.queue.timeout())
+        self.assertIsNone(self.queue.poll_timeout())
+
+        self.queue.add('slow', 1.0, self.calls.append, 'slow')
+        self.queue.add('fast', 0.0005, self.calls.append, 'fast')
+
+        self.assertAlmostEqual(self.queue.timeout(), 0.0005)
+        # Sub millisecond waits round down so the poller never oversleeps.
+        self.assertEqual(self.queue.poll_timeout(), 0)
+
+    def test_fixed_rate_does_not_drift(self):
+        timer = self.queue.add('tick', 0.5, self.calls.append, 'tick')
+
+        self.clock.now += 0.6
+        self.assertEqual(self.queue.due(), [timer])
+        self.assertAlmostEqual(timer.deadline, 101.0)
+
+        # Ticks missed while busy are skipped instead of run back to back.
+        self.clock.now += 2.2
+        self.assertEqual(len(self.queue.due()), 1)
+        self.assertAlmostEqual(timer.deadline, 103.0)
+        self.assertEqual(self.queue.due(), [])
+
+    def test_fixed_delay_waits_for_reschedule(self):
+        timer = self.queue.add('poll', 0.5, self.calls.append, 'poll', mode=FIXED_DELAY)
+
+        self.clock.now += 0.5
+        self.assertEqual(self.queue.due(), [timer])
+        self.assertIsNone(self.queue.timeout())
+
+        self.clock.now += 0.3
+        self.queue.reschedule(timer)
+        self.assertAlmostEqual(timer.deadline, 101.3)
+
+    def test_cancel_and_replace(self):
+        self.queue.add('tick', 0.5, self.calls.append, 'first')
+        self.queue.add('tick', 0.5, self.calls.append, 'second')
+        self.assertEqual(len(self.queue), 1)
+
+        self.clock.now += 0.5
+        for timer in self.queue.due():
+            timer()
+        self.assertEqual(self.calls, ['second'])
+
+        self.queue.cancel('tick')
+        self.clock.now += 0.5
+        self.assertEqual(self.queue.due(), [])
+        self.assertIsNone(self.queue.timeout())
+
+    def test_bad_timers_are_refused(self):
+        with self.assertRaises(ValueError):
+            self.queue.add('never', 0, print)
+        with self.assertRaises(ValueError):
+            self.queue.add('odd', 1, print, mode='sometimes')
+
+
+
+class TestTimingWheel(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.clock = FakeClock()
+        self.wheel = TimingWheel(tick=0.1, slots=16, clock=self.clock)
+
+    def test_keys_expire_once(self):
+        self.wheel.touch('rohan', 0.3)
+        self.wheel.touch('gondor', 0.6)
+
+        self.clock.now += 0.25
+        self.assertEqual(self.wheel.expired(), [])
+
+        self.clock.now += 0.1
+        self.assertEqual(self.wheel.expired(), ['rohan'])
+        self.assertEqual(self.wheel.expired(), [])
+        self.assertNotIn('rohan', self.wheel)
+        self.assertEqual(len(self.wheel), 1)
+
+    def test_touching_pushes_the_deadline_back(self):
+        self.wheel.touch('rohan', 0.3)
+        self.clock.now += 0.2
+        self.wheel.touch('rohan', 0.3)
+
+        self.clock.now += 0.2
+        self.assertEqual(self.wheel.expired(), [])
+        self.clock.now += 0.15
+        self.assertEqual(self.wheel.expired(), ['rohan'])
+
+    def test_deadlines_past_a_full_turn(self):
+        self.wheel.touch('mordor', 5.0)
+        self.wheel.touch('rohan', 0.5)
+
+        self.clock.now += 1.0
+        self.assertEqual(self.wheel.expired(), ['rohan'])
+
+        # Skipping more than a turn between checks still sweeps every bucket.
+        self.clock.now += 4.05
+        self.assertEqual(self.wheel.expired(), ['mordor'])
+
+    def test_removed_keys_never_expire(self):
+        self.wheel.touch('rohan', 0.1)
+        self.wheel.remove('rohan')
+        self.wheel.remove('gondor')
+
+        self.clock.now += 1
+        self.assertEqual(self.wheel.expired(), [])
+
+    def test_many_keys(self):
+        wheel = TimingWheel(tick=0.05, slots=1024, clock=self.clock)
+        for index in range(10000):
+            wheel.touch(index, 0.5 + (index % 10) * 0.05)
+
+        self.clock.now += 0.52
+        self.assertEqual(sorted(wheel.expired()), list(range(0, 10000, 10)))
+        self.assertEqual(len(wheel), 9000)
+
+
+class TestHeartbeater(unittest.TestCase):
+
+    def test_peers_are_not_shared(self):
+        first, second = Heartbeater(), Heartbeater()
+        first.add_peer('rohan')
+
+        self.assertIn('rohan', first.tabs)
+        self.assertNotIn('rohan', second.tabs)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+# Standard imports
+import os
+import tempfile
+import threading
+import unittest
+
+# Relative import
+from Hermes.Transfer import ChunkServer, TransferError, fetch_chunks
+from Hermes.Message import Message
+from Hermes.DBP import commands
+
+# External imports
+import zmq
+
+
+class TestTransfer(unittest.TestCase):
+
+    def setUp(self) -> None:
+        """
+        Puts a chunk server behind a router and connects a dealer to it.
+        """
+        self.ctx = zmq.Context()
+        self.router = self.ctx.socket(zmq.ROUTER)
+        self.router.bind('inproc://test_transfer')
+        self.dealer = self.ctx.socket(zmq.DEALER)
+        self.dealer.connect('inproc://test_transfer')
+
+        self.server = ChunkServer()
+        self.requests_seen = []
+        self.running = True
+        self.thread = None
+
+    def tearDown(self) -> None:
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+        self.server.close()
+        self.ctx.destroy(linger=0)
+
+    def serve(self, reverse=False):
+        """
+        Answers fetch requests on a background thread. With reverse set, every burst of requests is answered
+        last one first to mimic handlers finishing out of order.
+        """
+        def loop():
+            while self.running:
+                if not self.router.poll(50):
+                    continue
+
+                burst = []
+                while self.router.poll(0):
+                    msg = Message(self.router)
+                    msg.recv()
+                    burst.append(msg)
+
+                self.requests_seen.append(len(burst))
+                for msg in (reversed(burst) if reverse else burst):
+                    self.server.fetch(msg)
+
+        self.thread = threading.Thread(target=loop)
+        self.thread.start()
+
+    def test_fetch_buffer(self):
+        data = os.urandom(10000)
+        self.server.add_buffer('data', data)
+        self.serve()
+
+        chunks = list(fetch_chunks(self.dealer, 'data', chunk_size=1000, credit=3))
+
+        self.assertEqual(b''.join(chunks), data)
+        self.assertEqual(len(chunks), 10)
+
+        # Never more than the granted credit outstanding.
+        self.assertLessEqual(max(self.requests_seen), 3)
+
+    def test_fetch_file_out_of_order(self):
+        data = os.urandom(25000)
+        with tempfile.NamedTemporaryFile(delete=False) as f:
+            f.write(data)
+        self.addCleanup(os.remove, f.name)
+
+        self.server.add_file('file', f.name)
+        self.serve(reverse=True)
+
+        chunks = list(fetch_chunks(self.dealer, 'file', chunk_size=4096, credit=4))
+        self.assertEqual(b''.join(chunks), data)
+
+    def test_fetch_exact_multiple(self):
+        data = os.urandom(4000)
+        self.server.add_buffer('data', data)
+        self.serve()
+
+        self.assertEqual(b''.join(fetch_chunks(self.dealer, 'data', chunk_size=1000, credit=2)), data)
+
+    def test_fetch_unknown(self):
+        self.serve()
+
+        with self.assertRaises(TransferError):
+            list(fetch_chunks(self.dealer, 'nothing', chunk_size=1000, credit=2))
+
+    def test_bad_ranges_are_denied(self):
+        self.server.add_buffer('data', os.urandom(4000))
+
+        for offset, size in ((-1000, 1000), (0, 0), (1000, -10)):
+            Message(self.dealer).send(command=commands['Fetch'], body={'name': 'data', 'offset': offset, 'size': size})
+            msg = Message(self.router)
+            msg.recv()
+            self.server.fetch(msg)
+
+            self.assertTrue(self.dealer.poll(1000))
+            reply = Message(self.dealer)
+            reply.recv()
+            self.assertEqual(reply.command, commands['Denied'])
+
+    def test_remove_file_with_chunks_in_flight(self):
+        data = os.urandom(25000)
+        with tempfile.NamedTemporaryFile(delete=False) as f:
+            f.write(data)
+        self.addCleanup(os.remove, f.name)
+
+        self.server.add_file('file', f.name)
+        Message(self.dealer).send(command=commands['Fetch'], body={'name': 'file', 'offset': 0, 'size': 4096})
+        msg = Message(self.router)
+        msg.recv()
+        self.server.fetch(msg)
+
+        # The chunk still points into the map.
+        self.server.remove('file')
+        self.assertNotIn('file', self.server.resources)
+
+        self.assertTrue(self.dealer.poll(1000))
+        reply = Message(self.dealer)
+        reply.recv()
+        self.assertEqual(bytes(reply.body[1]), data[:4096])
+
+    def test_requires_dealer(self):
+        with self.assertRaises(ValueError):
+            next(fetch_chunks(self.router, 'data'))
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Scale out benchmark for the client side balancer.
+
+Runs a number of instances of a service, each answering one request at a time after a fixed amount of work, and
+keeps a window of requests in flight to them through a Pipeline with a Balancer picking the instance for each.
+The throughput for 1, 2, 4, ... instances is reported, which should go up about linearly with the instances
+until the client itself is the bottleneck. One instance in every four is made three times slower to show the
+balancer steering requests away from it.
+
+Usage (from the repository root): python -m benchmarks.bench_balancer [max instances] [requests] [work ms]
+"""
+
+# System modules
+import sys
+import time
+import logging
+import threading
+from concurrent.futures import wait, FIRST_COMPLETED
+
+# Third party modules
+import zmq
+
+# Relative imports
+from Hermes.Reactor import Reactor
+from Hermes.Pipeline import Pipeline
+from Hermes.Balancer import Balancer
+from Hermes.Message import Message
+from Hermes.DBP import commands
+
+WINDOW = 64
+
+
+def instance(work: float):
+    def handle(msg: Message):
+        time.sleep(work)
+        msg.send(command=commands['Pong'], body=msg.payload)
+
+    reactor = Reactor(socs={'router': zmq.ROUTER}, msg_handlers={commands['Ping']: handle},
+                      log_level=logging.CRITICAL, workers=1)
+    threading.Thread(target=reactor.start, daemon=True).start()
+    return reactor, f"tcp://127.0.0.1:{reactor.interfaces['router']['port']}"
+
+
+def run(instances: int, requests: int, work: float):
+    reactors = [instance(work * (3 if n % 4 == 3 else 1)) for n in range(instances)]
+    addrs = [addr for _, addr in reactors]
+    balancer = Balancer()
+    pipeline = Pipeline(timeout=30000)
+    chosen = {addr: 0 for addr in addrs}
+
+    def send():
+        addr = balancer.choose(addrs)
+        chosen[addr] += 1
+        started = balancer.begin(addr)
+        future = pipeline.request(addr, commands['Ping'], 0)
+        future.add_done_callback(lambda done: balancer.end(addr, started, ok=done.exception() is None))
+        return future
+
+    started = time.perf_counter()
+    in_flight = {send() for _ in range(min(WINDOW, requests))}
+    sent = len(in_flight)
+
+    while in_flight:
+        done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+        for _ in done:
+            if sent < requests:
+                in_flight.add(send())
+                sent += 1
+
+    elapsed = time.perf_counter() - started
+
+    pipeline.close()
+    for reactor, _ in reactors:
+        reactor.stop()
+
+    slow = sum(count for n, count in enumerate(chosen.values()) if n % 4 == 3)
+    return requests / elapsed, slow / requests
+
+
+def main():
+    most = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    work = float(sys.argv[3]) / 1000 if len(sys.argv) > 3 else 0.005
+
+    print(f"{requests} requests, {WINDOW} in flight, {work * 1000:.1f}ms of work each")
+    print(f"{'instances':>10} {'req/s':>10} {'speedup':>8} {'to slow':>8}")
+
+    baseline = None
+    count = 1
+    while count <= most:
+        throughput, slow = run(count, requests, work)
+        baseline = baseline or throughput
+        print(f"{count:>10} {throughput:>10.0f} {throughput / baseline:>7.1f}x {slow:>7.0%}")
+        count *= 2
+
+
+if __name__ == '__main__':
+    main()
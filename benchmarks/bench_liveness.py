@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Liveness check benchmark for the catalog's roll call.
+
+Tracks a number of services heartbeating every 500ms with three retries and runs the check every 100ms, as the
+catalog does. Two ways of finding the services that have gone quiet are compared:
+
+    scan  - a deadline per service and a pass over all of them on every check, as Heartbeater does
+    wheel - a TimingWheel, which only sweeps the buckets for the ticks that passed since the last check
+
+One percent of the services stop heartbeating halfway through. The time per check and per heartbeat is reported
+for each.
+
+Usage (from the repository root): python -m benchmarks.bench_liveness [services] [seconds]
+"""
+
+# System modules
+import sys
+import time
+
+# Relative imports
+from Hermes.Timer import TimingWheel
+
+LIVELINESS = 0.5
+RETRIES = 3
+CHECK = 0.1
+
+
+class Clock():
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Scan():
+    def __init__(self, clock):
+        self.clock = clock
+        self.deadlines = {}
+
+    def touch(self, key, timeout):
+        self.deadlines[key] = self.clock() + timeout
+
+    def expired(self):
+        now = self.clock()
+        due = [key for key, deadline in self.deadlines.items() if deadline <= now]
+        for key in due:
+            del self.deadlines[key]
+        return due
+
+
+def run(tracker, clock: Clock, services: int, seconds: float):
+    timeout = LIVELINESS * RETRIES
+    for key in range(services):
+        tracker.touch(key, timeout)
+
+    # Heartbeats are spread evenly over each interval, so every check window sees the same share of them.
+    per_window = int(services * CHECK / LIVELINESS)
+    dead = set(range(0, services, 100))
+    next_beat = 0
+
+    check_ns = beat_ns = checks = beats = evicted = 0
+    windows = int(seconds / CHECK)
+
+    for window in range(windows):
+        clock.now += CHECK
+
+        started = time.perf_counter_ns()
+        for _ in range(per_window):
+            key = next_beat
+            next_beat = (next_beat + 1) % services
+            if window >= windows // 2 and key in dead:
+                continue
+            tracker.touch(key, timeout)
+            beats += 1
+        beat_ns += time.perf_counter_ns() - started
+
+        started = time.perf_counter_ns()
+        evicted += len(tracker.expired())
+        check_ns += time.perf_counter_ns() - started
+        checks += 1
+
+    return check_ns / checks, beat_ns / max(beats, 1), evicted
+
+
+def main():
+    services = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 10.0
+
+    print(f"{services} services, heartbeat {LIVELINESS * 1000:.0f}ms x {RETRIES}, check every "
+          f"{CHECK * 1000:.0f}ms, {seconds:.0f}s simulated")
+    print(f"{'':>6} {'per check':>12} {'per beat':>10} {'evicted':>8}")
+
+    for name, make in (('scan', Scan), ('wheel', lambda clock: TimingWheel(tick=.05, slots=1024, clock=clock))):
+        clock = Clock()
+        check, beat, evicted = run(make(clock), clock, services, seconds)
+        print(f"{name:>6} {check / 1000:>10.1f}us {beat:>8.0f}ns {evicted:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Allocation benchmark for the Reactor's receive path.
+
+Replays one second of traffic at 50k msg/s through Message.load and measures, with tracemalloc, how many bytes
+of Message state each request costs. Three receive paths are compared:
+
+    legacy  - a dict backed object with the attributes Message carried before it was slotted
+    slotted - a new Message for every request, as Reactor does without a pool
+    pooled  - Messages handed out and taken back by a MessagePool, as Reactor does with pool_size > 0
+
+The in flight numbers hold every message of the burst at once (a backed up executor), the steady state numbers
+keep a bounded window of requests alive and count what had to be allocated to serve all of them.
+
+Usage (from the repository root): python -m benchmarks.bench_message_alloc [rate] [window]
+"""
+
+# System modules
+import gc
+import logging
+import sys
+import time
+import tracemalloc
+from collections import deque
+
+# Third party modules
+import zmq
+
+# Relative imports
+from Hermes.Message import Message, MessagePool, MsgPackCodec, HEADER, PROTOCOL_VERSION
+from Hermes.DBP import commands, opcodes
+
+
+class LegacyMessage():
+    """
+    The attribute layout of a Message before __slots__, kept here only as a point of comparison.
+    """
+
+    def __init__(self, socket, logger=None, copy=True):
+        self.valid = True
+        self.socket = socket
+        self.copy = copy
+
+        self.body = None
+        self.incoming = None
+        self.incoming_raw = None
+        self.command = None
+        self.return_addr = None
+        self.outgoing = []
+        self.time = None
+        self.seq = None
+        self.flags = None
+        self.codec = None
+        self._payload = None
+        self.logger = logger if logger is not None else logging.getLogger(__name__)
+
+    envelope = Message.envelope
+    load = Message.load
+    send = Message.send
+    display_envelope = Message.display_envelope
+
+
+def make_frames():
+    header = HEADER.pack(PROTOCOL_VERSION, opcodes[commands['Info_Req']], MsgPackCodec.marker[0], time.time_ns(), 1)
+    return [b'\x00k\x8bEg', b'', header, MsgPackCodec().encode('Rohan')]
+
+
+def in_flight(factory, socket, frames, rate):
+    """
+    Traced bytes per message while the whole burst is held at once.
+    """
+    gc.collect()
+    tracemalloc.start()
+    held = []
+    for _ in range(rate):
+        msg = factory(socket)
+        msg.load(frames)
+        held.append(msg)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del held
+
+    return current / rate
+
+
+def steady_state(acquire, release, socket, frames, rate, window):
+    """
+    Serves a burst with at most `window` requests alive and returns the bytes allocated per message,
+    measured as the traced peak plus everything that was freed along the way.
+    """
+    gc.collect()
+    tracemalloc.start()
+    base, _ = tracemalloc.get_traced_memory()
+    live = deque()
+    allocated = 0
+
+    for _ in range(rate):
+        msg = acquire(socket)
+        msg.load(frames)
+        live.append(msg)
+
+        if len(live) > window:
+            before, _ = tracemalloc.get_traced_memory()
+            release(live.popleft())
+            after, _ = tracemalloc.get_traced_memory()
+            allocated += before - after
+
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return (allocated + current - base) / rate
+
+
+def main(rate=50000, window=100):
+    ctx = zmq.Context()
+    socket = ctx.socket(zmq.ROUTER)
+    frames = make_frames()
+
+    print(f"Replaying {rate} messages (one second at {rate} msg/s), {window} requests in flight\n")
+    print("In flight footprint (bytes/msg):")
+    print(f"\tlegacy:  {in_flight(LegacyMessage, socket, frames, rate):8.1f}")
+    print(f"\tslotted: {in_flight(Message, socket, frames, rate):8.1f}")
+
+    pool = MessagePool(socket, size=window + 1)
+    print("\nSteady state allocations (bytes/msg):")
+    print(f"\tlegacy:  {steady_state(LegacyMessage, lambda m: None, socket, frames, rate, window):8.1f}")
+    print(f"\tslotted: {steady_state(Message, lambda m: None, socket, frames, rate, window):8.1f}")
+    print(f"\tpooled:  {steady_state(lambda s: pool.acquire(), pool.release, socket, frames, rate, window):8.1f}")
+    print(f"\nPool built {pool.created} messages and reused {pool.reused}.")
+
+    ctx.destroy(linger=0)
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Startup recovery benchmark for the catalog's journal.
+
+Registers a number of services and then sends a stream of updates through a Catalog with a Journal listening,
+the way a running catalog fills its journal. Two things are measured:
+
+    writes   - how long the changes take to reach the disk when every change gets its own fsync, compared
+               to the journal's group writes of everything queued in one flush interval
+    recovery - how long a restarted catalog takes to read its journal back, with the log left to grow forever
+               compared to compacting it every compact_every records
+
+Without compaction recovery replays every change ever made. With it recovery replays at most compact_every
+records on top of one snapshot, so it is bounded by the size of the catalog rather than its age.
+
+Usage (from the repository root): python -m benchmarks.bench_recovery [services] [updates] [compact_every]
+"""
+
+# System modules
+import sys
+import time
+import tempfile
+
+# Relative imports
+from Hermes.Catalog import Catalog
+from Hermes.Journal import Journal
+
+# Changes queued per group write, about what a busy catalog sees in one flush interval
+BATCH = 200
+
+
+def fill(journal: Journal, catalog: Catalog, services: int, updates: int, batch: int) -> float:
+    started = time.perf_counter()
+    changes = 0
+
+    for n in range(services):
+        catalog.register(f'service-{n}', {
+            'interfaces': {'router': {'ip': f'10.0.{n // 256 % 256}.{n % 256}', 'port': 5000 + n % 1000}},
+            'liveliness': 1000, 'retries': 3, 'topics': [f'topic-{n % 50}']})
+        changes += 1
+        if changes % batch == 0:
+            journal.flush()
+
+    for n in range(updates):
+        catalog.update(f'service-{n % services}', {'port': n})
+        changes += 1
+        if changes % batch == 0:
+            journal.flush()
+
+    journal.flush()
+    return time.perf_counter() - started
+
+
+def run(services: int, updates: int, compact_every: int, batch: int):
+    with tempfile.TemporaryDirectory() as path:
+        catalog = Catalog()
+        journal = Journal(path, source=catalog.copy, compact_every=compact_every)
+        catalog.listeners.append(journal.append)
+        written = fill(journal, catalog, services, updates, batch)
+        journal.close()
+
+        recovering = Journal(path)
+        started = time.perf_counter()
+        version, recovered = recovering.recover()
+        recovery = time.perf_counter() - started
+
+        assert version == catalog.version and len(recovered) == services
+        return written, recovery, recovering.logged
+
+
+def main():
+    services = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    updates = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    compact_every = int(sys.argv[3]) if len(sys.argv) > 3 else 10000
+
+    changes = services + updates
+    print(f"{services} services, {updates} updates, compacting every {compact_every} records")
+    print(f"{'':>26} {'per change':>12} {'recovery':>10} {'replayed':>10}")
+
+    # Fsyncing every change is slow enough that a sample of them says as much as all of them would.
+    sample = min(changes, 2000)
+    written, _, _ = run(min(services, sample), sample - min(services, sample), sample + 1, batch=1)
+    print(f"{'fsync per change':>26} {written / sample * 1e6:>10.1f}us {'':>10} {'':>10}")
+
+    for name, every in (('group fsync, no compaction', changes + 1), ('group fsync, compaction', compact_every)):
+        written, recovery, replayed = run(services, updates, every, BATCH)
+        print(f"{name:>26} {written / changes * 1e6:>10.1f}us {recovery * 1000:>8.1f}ms {replayed:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -24,6 +24,7 @@ setup(name='Hermes-lnestelroad',
       ],
       packages=find_packages(),
       install_requires=[
+          'msgpack',
           'netifaces',
           'PyYAML',
           'pyzmq',